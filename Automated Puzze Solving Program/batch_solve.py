@@ -0,0 +1,309 @@
+"""
+Solve many puzzles at once over a pool of worker processes.
+
+From the command line, with one JSON puzzle record per line:
+
+    python batch_solve.py puzzles.jsonl --engine dfs --workers 8 \
+        --timeout 10 > results.jsonl
+
+Each result line holds the index of its puzzle, its status, and its
+solution as the list of moves along the path, or the error that the
+puzzle raised.  MNPuzzles of at
+most 9 cells are fastest with --engine table, given --table 8.dist for
+each goal table built by distance_table.py.
+"""
+import json
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from puzzle_tools import depth_first_solve, breadth_first_solve, \
+    astar_solve, ida_star_solve, bidirectional_solve, best_first_solve, \
+    moves_from_path
+from dancing_links import dlx_solve
+from distance_table import table_solve, load_table, UnsupportedPuzzle
+from sudoku_puzzle import SudokuPuzzle, PropagatingSudokuPuzzle
+from mn_puzzle import MNPuzzle
+from packed_mn_puzzle import PackedMNPuzzle
+from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+from word_ladder_puzzle import WordLadderPuzzle, WordDictionary
+
+# solvers that can be chosen by name
+ENGINES = {"dfs": depth_first_solve, "bfs": breadth_first_solve,
+           "best_first": best_first_solve, "astar": astar_solve,
+           "idastar": ida_star_solve, "bidirectional": bidirectional_solve,
+           "dlx": dlx_solve, "table": table_solve}
+
+SOLVED, UNSOLVABLE, TIMEOUT = "solved", "unsolvable", "timeout"
+# status of a puzzle whose solver raised an exception
+ERROR = "error"
+# status of a puzzle the engine cannot solve, such as a peg puzzle for
+# the table engine
+UNSUPPORTED = "unsupported"
+
+
+class SolveTimeout(Exception):
+    """
+    Raised inside a worker when a puzzle runs out of time.
+    """
+    pass
+
+
+def path_keys(node):
+    """
+    Return the state keys of node's puzzle and of each first child below
+    it, the compact form in which solutions leave the workers.
+
+    @type node: PuzzleNode
+    @rtype: list[object]
+    """
+    return [n.puzzle.state_key() for n in node.iter_path()]
+
+
+def path_moves(node):
+    """
+    Return the moves_from_path of node, the form in which solutions
+    leave the workers, or its path_keys if its puzzles have no
+    legal_moves.
+
+    @type node: PuzzleNode
+    @rtype: list[object]
+    """
+    try:
+        return moves_from_path(node)
+    except NotImplementedError:
+        return path_keys(node)
+
+
+def _alarm(signum, frame):
+    """
+    Signal handler that stops the puzzle being solved.
+    """
+    raise SolveTimeout()
+
+
+def run_with_timeout(function, timeout=None):
+    """
+    Return function(), raising SolveTimeout if it is still running after
+    timeout seconds.  Without timeout, or on platforms without SIGALRM,
+    function runs to the end.
+
+    @type function: () -> object
+    @type timeout: float | None
+    @rtype: object
+    """
+    timed = timeout is not None and hasattr(signal, "SIGALRM")
+    if timed:
+        previous = signal.signal(signal.SIGALRM, _alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return function()
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def solve_one(puzzle, engine="dfs", timeout=None):
+    """
+    Return (status, result) for puzzle solved by engine, where result is
+    the path_moves of the solution if status is SOLVED, a description of
+    the exception if the solver raised one and status is ERROR, and None
+    otherwise.
+
+    engine is a name from ENGINES or a solver function.  If timeout is
+    given, and the platform has SIGALRM, solving stops after timeout
+    seconds.
+
+    @type puzzle: Puzzle
+    @type engine: str | (Puzzle) -> PuzzleNode | None
+    @type timeout: float | None
+    @rtype: (str, list[object] | str | None)
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> solve_one(WordLadderPuzzle("cat", "cot", {"cat", "cot"}), "bfs")
+    ('solved', [('cat', 'cot')])
+    >>> solve_one(WordLadderPuzzle("cat", "cot", {"cat", "cot"}), "dlx")[0]
+    'error'
+    >>> solve_one(WordLadderPuzzle("cat", "cot", {"cat", "cot"}), "table")
+    ('unsupported', None)
+    """
+    solver = ENGINES[engine] if isinstance(engine, str) else engine
+    try:
+        solution = run_with_timeout(lambda: solver(puzzle), timeout)
+        if solution is None:
+            return UNSOLVABLE, None
+        return SOLVED, path_moves(solution)
+    except SolveTimeout:
+        return TIMEOUT, None
+    except UnsupportedPuzzle:
+        return UNSUPPORTED, None
+    except Exception as e:
+        # one bad puzzle must not take its whole chunk down with it
+        return ERROR, "{}: {}".format(type(e).__name__, e)
+
+
+def _solve_chunk(chunk, engine, timeout):
+    """
+    Return (index, status, result) for each (index, puzzle) in chunk.
+
+    @type chunk: list[(int, Puzzle)]
+    @type engine: str | (Puzzle) -> PuzzleNode | None
+    @type timeout: float | None
+    @rtype: list[(int, str, list[object] | str | None)]
+    """
+    return [(i,) + solve_one(puzzle, engine, timeout) for i, puzzle in chunk]
+
+
+def solve_many(puzzles, engine="dfs", workers=None, chunksize=8,
+               timeout=None):
+    """
+    Yield (index, status, result) for each of puzzles, as soon as it is
+    solved, where index is its position in puzzles.
+
+    Puzzles are sent to workers processes (default: one per CPU) in
+    chunks of chunksize, so results arrive in completion order rather
+    than input order.  With workers == 1 everything runs in this
+    process.  engine and timeout are as for solve_one, and timeout
+    applies to each puzzle separately.
+
+    @type puzzles: Iterable[Puzzle]
+    @type engine: str | (Puzzle) -> PuzzleNode | None
+    @type workers: int | None
+    @type chunksize: int
+    @type timeout: float | None
+    @rtype: Iterator[(int, str, list[object] | str | None)]
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> ws = {"cat", "cot", "dot", "dog"}
+    >>> puzzles = [WordLadderPuzzle("cat", "dog", ws),
+    ...            WordLadderPuzzle("cat", "cow", ws)]
+    >>> results = sorted(solve_many(puzzles, "bfs", workers=1))
+    >>> results[0]
+    (0, 'solved', [('cat', 'cot'), ('cot', 'dot'), ('dot', 'dog')])
+    >>> results[1]
+    (1, 'unsolvable', None)
+    """
+    items = list(enumerate(puzzles))
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+    if workers == 1:
+        for chunk in chunks:
+            for result in _solve_chunk(chunk, engine, timeout):
+                yield result
+        return
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(_solve_chunk, chunk, engine, timeout)
+                   for chunk in chunks]
+        for future in as_completed(futures):
+            for result in future.result():
+                yield result
+
+
+def _rows(rows):
+    """
+    Return rows given as strings or lists as a tuple of tuples of str.
+
+    @type rows: list[str] | list[list[str]]
+    @rtype: tuple[tuple[str]]
+    """
+    return tuple(tuple(row) for row in rows)
+
+
+def _default_symbols(n, symbols):
+    """
+    Return the symbols of an nxn Sudoku with symbols given, when its
+    record names none: the digits 1 to n if the givens are such digits,
+    and otherwise the first n capital letters.
+
+    @type n: int
+    @type symbols: list[str]
+    @rtype: str
+
+    >>> _default_symbols(4, ["A"] + ["*"] * 15)
+    'ABCD'
+    >>> _default_symbols(9, ["5"] + ["*"] * 80)
+    '123456789'
+    """
+    digits = "123456789"[:n]
+    if n <= 9 and all(d in digits for d in symbols if d != "*"):
+        return digits
+    return "ABCDEFGHIJKLMNOPQRSTUVWXYZ"[:n]
+
+
+def puzzle_from_record(record):
+    """
+    Return the puzzle described by the dict record, one of:
+
+    {"type": "sudoku", "n": 4, "symbols": "AB*D..." or [...]}
+    {"type": "mn", "from": ["*23", "145"], "to": ["123", "45*"]}
+    {"type": "peg", "grid": ["**.**", "#***#"]}
+    {"type": "word", "from": "same", "to": "cost", "words": "words.txt"}
+
+    Sudoku may add "propagate": true, and mn "packed": true, for the
+    faster representations.  Sudoku symbols not listed in a
+    "symbol_set" default to those of _default_symbols.  Word files are
+    read once each, by WordDictionary.load.
+
+    @type record: dict
+    @rtype: Puzzle
+
+    >>> print(puzzle_from_record({"type": "mn", "from": ["*23", "145"],
+    ...                           "to": ["123", "45*"]}))
+    *23
+    145
+    <BLANKLINE>
+    >>> s = puzzle_from_record({"type": "sudoku", "n": 4,
+    ...                         "symbols": "A" + "*" * 15})
+    >>> sorted(s._symbol_set)
+    ['A', 'B', 'C', 'D']
+    """
+    kind = record["type"]
+    if kind == "sudoku":
+        n, symbols = record["n"], list(record["symbols"])
+        symbol_set = set(record.get("symbol_set") or
+                         _default_symbols(n, symbols))
+        cls = PropagatingSudokuPuzzle if record.get("propagate") \
+            else SudokuPuzzle
+        return cls(n, symbols, symbol_set)
+    elif kind == "mn":
+        puzzle = MNPuzzle(_rows(record["from"]), _rows(record["to"]))
+        if record.get("packed"):
+            return PackedMNPuzzle.from_mn_puzzle(puzzle)
+        return puzzle
+    elif kind == "peg":
+        return GridPegSolitairePuzzle([list(row) for row in record["grid"]],
+                                      {"*", ".", "#"})
+    elif kind == "word":
+        return WordLadderPuzzle(
+            record["from"], record["to"],
+            WordDictionary.load(record.get("words", "words.txt")))
+    raise ValueError("unknown puzzle type {}".format(kind))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(
+        description="Solve a file of puzzles, one JSON record per line.")
+    parser.add_argument("puzzles", help="JSON lines file of puzzles")
+    parser.add_argument("--engine", default="dfs", choices=sorted(ENGINES))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="seconds allowed for each puzzle")
+    parser.add_argument("--table", action="append", default=[],
+                        help="distance table file for the table engine; "
+                             "repeat for each goal")
+    args = parser.parse_args()
+    for table_path in args.table:
+        load_table(table_path)
+    with open(args.puzzles) as f:
+        batch = [puzzle_from_record(json.loads(line))
+                 for line in f if line.strip()]
+    for index, status, result in solve_many(batch, args.engine,
+                                            args.workers, args.chunksize,
+                                            args.timeout):
+        field = "error" if status == ERROR else "moves"
+        sys.stdout.write(json.dumps({"index": index, "status": status,
+                                     field: result}) + "\n")
+        sys.stdout.flush()
@@ -0,0 +1,329 @@
+"""
+A fixed set of puzzles for timing the solvers against each other.
+
+From the command line, to run every engine on every puzzle and keep the
+results:
+
+    python benchmark.py --timeout 10 --output results.json
+
+and to list what got slower, or stopped solving, between two such
+files:
+
+    python benchmark.py --compare old.json new.json
+
+The corpus is the same on every run: MNPuzzles are scrambled by random
+walks from a fixed seed, and the Sudoku, peg and word ladder puzzles
+are written out below.
+"""
+import gc
+import json
+import platform
+import random
+import sys
+import tracemalloc
+from time import perf_counter
+
+from puzzle_tools import inplace_depth_first_solve, inplace_ida_star_solve
+from batch_solve import ENGINES, run_with_timeout, SolveTimeout, SOLVED, \
+    UNSOLVABLE, TIMEOUT, UNSUPPORTED
+from distance_table import UnsupportedPuzzle
+from search_stats import SearchStats
+from sudoku_puzzle import SudokuPuzzle, PropagatingSudokuPuzzle
+from mn_puzzle import MNPuzzle
+from packed_mn_puzzle import PackedMNPuzzle
+from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+from bitboard_peg_solitaire_puzzle import BitboardPegSolitairePuzzle, \
+    english_board
+from word_ladder_puzzle import WordLadderPuzzle, WordDictionary
+
+# every solver the benchmark runs, by name
+BENCHMARK_ENGINES = dict(ENGINES, inplace_dfs=inplace_depth_first_solve,
+                         inplace_idastar=inplace_ida_star_solve)
+
+# engines that only solve one kind of puzzle
+ENGINE_KINDS = {"dlx": "sudoku", "table": "mn"}
+
+# engines that take no stats, so only their time is measured
+UNINSTRUMENTED = {"dlx", "table"}
+
+MN_GOAL = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+
+SUDOKUS = {
+    "sudoku4": (4, "A**D" "*D**" "**C*" "C**B"),
+    "sudoku9_easy": (9, "**3*2*6**" "9**3*5**1" "**18*64**" "**81*29**"
+                        "7*******8" "**67*82**" "**26*95**" "8**2*3**9"
+                        "**5*1*3**"),
+    "sudoku9_4star": (9, "56***7**9" "*7**48*31" "*********" "43*******"
+                         "*8*****9*" "*******26" "*********" "19*36**7*"
+                         "7**1***42"),
+    "sudoku9_hardest": (9, "8********" "**36*****" "*7**9*2**" "*5***7***"
+                           "****457**" "***1***3*" "**1****68" "**85***1*"
+                           "*9****4**")}
+
+PEG_BOARDS = {
+    "peg4x4": ["*.**", "****", "****", "****"],
+    "peg4x5": ["*****", "**.**", "*****", "*****"],
+    "peg5x5": ["*****", "*****", "*****", "**.**", "*****"]}
+
+WORD_PAIRS = [("same", "cost"), ("cold", "warm"), ("head", "tail"),
+              ("ape", "man"), ("love", "hate")]
+
+
+def scrambled_mn(to_grid, depth, rng):
+    """
+    Return the MNPuzzle reached from to_grid by depth random moves of
+    rng, never moving a tile straight back.
+
+    @type to_grid: tuple[tuple[str]]
+    @type depth: int
+    @type rng: random.Random
+    @rtype: MNPuzzle
+
+    >>> p = scrambled_mn(MN_GOAL, 1, random.Random(0))
+    >>> len(p.extensions())
+    3
+    """
+    puzzle, previous = MNPuzzle(to_grid, to_grid), None
+    for _ in range(depth):
+        move = rng.choice([m for m in puzzle.legal_moves()
+                           if m[1] != previous])
+        puzzle.apply(move)
+        previous = move[0]
+    return puzzle
+
+
+def corpus(seed=0, words="words.txt"):
+    """
+    Return the benchmark puzzles as (name, kind, make) triples, the
+    same every time for the same seed, where make() returns a new copy
+    of the puzzle.  words is the word list for the word ladders.
+
+    Puzzles are made afresh for every run, so work their constructors
+    do, such as the propagation of PropagatingSudokuPuzzle, is timed
+    with the engine.
+
+    @type seed: int
+    @type words: str
+    @rtype: list[(str, str, () -> Puzzle)]
+    """
+    rng, puzzles = random.Random(seed), []
+    for depth in (10, 20, 30):
+        grid = scrambled_mn(MN_GOAL, depth, rng).from_grid
+        puzzles.append(("mn3x3_walk{}".format(depth), "mn",
+                        lambda grid=grid: MNPuzzle(grid, MN_GOAL)))
+        puzzles.append(("packed3x3_walk{}".format(depth), "mn",
+                        lambda grid=grid: PackedMNPuzzle.from_mn_puzzle(
+                            MNPuzzle(grid, MN_GOAL))))
+    digits = set("123456789")
+    for name, (n, symbols) in sorted(SUDOKUS.items()):
+        symbol_set = set("ABCD") if n == 4 else digits
+        puzzles.append((name, "sudoku",
+                        lambda n=n, symbols=symbols, symbol_set=symbol_set:
+                        SudokuPuzzle(n, list(symbols), symbol_set)))
+        puzzles.append((name + "_propagating", "sudoku",
+                        lambda n=n, symbols=symbols, symbol_set=symbol_set:
+                        PropagatingSudokuPuzzle(n, list(symbols),
+                                                symbol_set)))
+    for name, rows in sorted(PEG_BOARDS.items()):
+        puzzles.append((name, "peg", lambda rows=rows: _peg_puzzle(rows)))
+        puzzles.append((name + "_bitboard", "peg",
+                        lambda rows=rows:
+                        BitboardPegSolitairePuzzle.from_grid_puzzle(
+                            _peg_puzzle(rows))))
+    puzzles.append(("peg_english_bitboard", "peg", english_board))
+    dictionary = WordDictionary.load(words)
+    for from_word, to_word in WORD_PAIRS:
+        puzzles.append(("word_{}_{}".format(from_word, to_word), "word",
+                        lambda from_word=from_word, to_word=to_word:
+                        WordLadderPuzzle(from_word, to_word, dictionary)))
+    return puzzles
+
+
+def _peg_puzzle(rows):
+    """
+    Return the GridPegSolitairePuzzle with rows, strings of markers.
+
+    @type rows: list[str]
+    @rtype: GridPegSolitairePuzzle
+    """
+    return GridPegSolitairePuzzle([list(row) for row in rows],
+                                  {"*", ".", "#"})
+
+
+def run(make, engine, timeout=None, repeat=3, memory=True):
+    """
+    Return the result of solving the puzzle make() returns with engine,
+    a name in BENCHMARK_ENGINES, as a dict.
+
+    seconds is the best wall time of repeat runs, each making the puzzle
+    afresh and solving it, stopped after timeout seconds.  Solved or
+    unsolvable puzzles are then solved once more with a SearchStats, for
+    the counts and solution depth, and the peak memory if memory is
+    True.
+
+    @type make: () -> Puzzle
+    @type engine: str
+    @type timeout: float | None
+    @type repeat: int
+    @type memory: bool
+    @rtype: dict[str, object]
+
+    >>> ws = {"cat", "cot", "dot", "dog"}
+    >>> result = run(lambda: WordLadderPuzzle("cat", "dog", ws), "bfs",
+    ...              repeat=1, memory=False)
+    >>> result["status"], result["depth"], result["expanded"]
+    ('solved', 3, 3)
+    """
+    solver = BENCHMARK_ENGINES[engine]
+    result = {"status": None, "seconds": None}
+    for _ in range(repeat):
+        gc.collect()
+        started = perf_counter()
+        try:
+            solution = run_with_timeout(lambda: solver(make()), timeout)
+        except SolveTimeout:
+            result["status"] = TIMEOUT
+            return result
+        except (NotImplementedError, UnsupportedPuzzle):
+            # a puzzle without the hooks the engine needs, or one the
+            # table engine has no table for
+            result["status"] = UNSUPPORTED
+            return result
+        seconds = perf_counter() - started
+        if result["seconds"] is None or seconds < result["seconds"]:
+            result["seconds"] = seconds
+    result["status"] = SOLVED if solution is not None else UNSOLVABLE
+    if engine in UNINSTRUMENTED:
+        return result
+    stats, puzzle = SearchStats(trace_memory=memory), make()
+    try:
+        run_with_timeout(lambda: solver(puzzle, stats=stats), timeout)
+    except SolveTimeout:
+        # tracing slowed the search past timeout, so counts are partial
+        result["stats_timeout"] = True
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+    for name in ("generated", "expanded", "duplicates", "max_frontier",
+                 "depth", "peak_memory"):
+        result[name] = getattr(stats, name)
+    return result
+
+
+def run_corpus(puzzles, engines=None, timeout=None, repeat=3, memory=True,
+               log=None):
+    """
+    Return the result of run for every engine in engines (by default all
+    of BENCHMARK_ENGINES) on every (name, kind, make) of puzzles, as
+    corpus returns them, with the puzzle name, kind and engine added.
+    log, if given, is called with each result as it is made.
+
+    @type puzzles: list[(str, str, () -> Puzzle)]
+    @type engines: list[str] | None
+    @type timeout: float | None
+    @type repeat: int
+    @type memory: bool
+    @type log: (dict[str, object]) -> object | None
+    @rtype: list[dict[str, object]]
+    """
+    results = []
+    for name, kind, make in puzzles:
+        for engine in engines or sorted(BENCHMARK_ENGINES):
+            if ENGINE_KINDS.get(engine, kind) != kind:
+                continue
+            result = {"puzzle": name, "kind": kind, "engine": engine}
+            result.update(run(make, engine, timeout, repeat, memory))
+            results.append(result)
+            if log is not None:
+                log(result)
+    return results
+
+
+def compare(old, new, threshold=1.25):
+    """
+    Return the (puzzle, engine, old, new) of each run in results new
+    that took more than threshold times as long as in results old, or
+    stopped being solved; old and new are the times, or the statuses if
+    those differ.
+
+    @type old: list[dict[str, object]]
+    @type new: list[dict[str, object]]
+    @type threshold: float
+    @rtype: list[(str, str, object, object)]
+
+    >>> old = [{"puzzle": "p", "engine": "dfs", "status": "solved",
+    ...         "seconds": 1.0},
+    ...        {"puzzle": "q", "engine": "dfs", "status": "solved",
+    ...         "seconds": 1.0}]
+    >>> new = [{"puzzle": "p", "engine": "dfs", "status": "solved",
+    ...         "seconds": 2.0},
+    ...        {"puzzle": "q", "engine": "dfs", "status": "timeout",
+    ...         "seconds": None}]
+    >>> compare(old, new)
+    [('p', 'dfs', 1.0, 2.0), ('q', 'dfs', 'solved', 'timeout')]
+    """
+    before = {(r["puzzle"], r["engine"]): r for r in old}
+    slower = []
+    for r in new:
+        key = (r["puzzle"], r["engine"])
+        if key not in before:
+            continue
+        b = before[key]
+        if b["status"] != r["status"]:
+            if b["status"] in (SOLVED, UNSOLVABLE):
+                slower.append(key + (b["status"], r["status"]))
+        elif (b["seconds"] is not None and r["seconds"] is not None and
+              r["seconds"] > b["seconds"] * threshold):
+            slower.append(key + (b["seconds"], r["seconds"]))
+    return slower
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Time every solver on a fixed set of puzzles.")
+    parser.add_argument("--engines", nargs="*", default=None,
+                        choices=sorted(BENCHMARK_ENGINES))
+    parser.add_argument("--puzzles", nargs="*", default=None,
+                        help="names of the puzzles to run (default: all)")
+    parser.add_argument("--timeout", type=float, default=10,
+                        help="seconds allowed for each run")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs to take the best time of")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--words", default="words.txt")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip measuring peak memory")
+    parser.add_argument("--output", default=None,
+                        help="JSON file for the results (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="list the runs that got slower from OLD to NEW")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args()
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old_results = json.load(f)["results"]
+        with open(args.compare[1]) as f:
+            new_results = json.load(f)["results"]
+        for row in compare(old_results, new_results, args.threshold):
+            print("{}\t{}\t{}\t{}".format(*row))
+        sys.exit(0)
+
+    def report(row):
+        sys.stderr.write("{puzzle:<28} {engine:<16} {status:<12} "
+                         "{seconds}\n".format(**row))
+
+    chosen = [p for p in corpus(args.seed, args.words)
+              if args.puzzles is None or p[0] in args.puzzles]
+    document = {"python": platform.python_version(),
+                "machine": platform.machine(), "seed": args.seed,
+                "timeout": args.timeout, "repeat": args.repeat,
+                "results": run_corpus(chosen, args.engines, args.timeout,
+                                      args.repeat, not args.no_memory,
+                                      report)}
+    if args.output is None:
+        json.dump(document, sys.stdout, indent=1, sort_keys=True)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=1, sort_keys=True)
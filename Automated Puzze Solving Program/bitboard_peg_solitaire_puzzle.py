@@ -0,0 +1,300 @@
+"""
+Peg solitaire on a rectangular grid, with the pegs kept as one int.
+"""
+from puzzle import Puzzle
+from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle, \
+    board_symmetries, board_invariants
+from symmetry import permute_bits
+
+# boards already made, keyed by their tuple of row strings of "#"/"o"
+_boards = {}
+
+
+class PegBoard:
+    """
+    Everything BitboardPegSolitairePuzzles on the same board shape share:
+    the usable holes and every possible jump.
+
+    Cell r, c is bit r * width + c, the same numbering as
+    GridPegSolitairePuzzle.state_key.
+    """
+
+    def __init__(self, shape):
+        """
+        Create the PegBoard self for shape, a tuple of rows in which "#"
+        marks an unused cell and anything else a hole.
+
+        @type self: PegBoard
+        @type shape: tuple[str]
+        @rtype: None
+        """
+        self.shape = shape
+        self.symmetries = board_symmetries(shape)
+        self.invariants = board_invariants(shape)
+        self.height, self.width = len(shape), len(shape[0])
+        self.holes = 0
+        for r, row in enumerate(shape):
+            for c, m in enumerate(row):
+                if m != "#":
+                    self.holes |= 1 << (r * self.width + c)
+        # each jump is (from and over bits, to bit, all three bits)
+        self.jumps = []
+        for r in range(self.height):
+            for c in range(self.width):
+                for dr, dc in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+                    cells = [(r + i * dr, c + i * dc) for i in range(3)]
+                    if all(0 <= y < self.height and 0 <= x < self.width
+                           for y, x in cells):
+                        bits = [1 << (y * self.width + x) for y, x in cells]
+                        if all(self.holes & b for b in bits):
+                            self.jumps.append((bits[0] | bits[1], bits[2],
+                                               bits[0] | bits[1] | bits[2]))
+
+    def jumps_from(self, pegs):
+        """
+        Yield the pegs left after each legal jump from pegs.
+
+        @type self: PegBoard
+        @type pegs: int
+        @rtype: Iterator[int]
+        """
+        for movers, target, all_three in self.jumps:
+            if pegs & movers == movers and not pegs & target:
+                yield pegs ^ all_three
+
+
+def board_for(marker):
+    """
+    Return the PegBoard with the shape of marker, making it only once.
+
+    @type marker: list[list[str]]
+    @rtype: PegBoard
+    """
+    shape = tuple("".join("#" if m == "#" else "o" for m in row)
+                  for row in marker)
+    if shape not in _boards:
+        _boards[shape] = PegBoard(shape)
+    return _boards[shape]
+
+
+class BitboardPegSolitairePuzzle(Puzzle):
+    """
+    Snapshot of peg solitaire whose pegs are the set bits of an int.
+    """
+
+    def __init__(self, pegs, board):
+        """
+        Create a BitboardPegSolitairePuzzle self with pegs on board.
+
+        @type self: BitboardPegSolitairePuzzle
+        @type pegs: int
+        @type board: PegBoard
+        @rtype: None
+        """
+        assert pegs & ~board.holes == 0
+        self.pegs, self.board = pegs, board
+        # whether fail_fast has already found the invariants satisfied
+        self._checked = False
+
+    @classmethod
+    def from_grid_puzzle(cls, puzzle):
+        """
+        Return the BitboardPegSolitairePuzzle for GridPegSolitairePuzzle
+        puzzle.
+
+        @type puzzle: GridPegSolitairePuzzle
+        @rtype: BitboardPegSolitairePuzzle
+        >>> grid = [["*", "*", "."], ["#", "*", "*"]]
+        >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+        >>> bin(BitboardPegSolitairePuzzle.from_grid_puzzle(gpsp).pegs)
+        '0b110011'
+        """
+        return cls(puzzle.state_key(), board_for(puzzle._marker))
+
+    def to_grid_puzzle(self):
+        """
+        Return the GridPegSolitairePuzzle with the same pegs as self.
+
+        @type self: BitboardPegSolitairePuzzle
+        @rtype: GridPegSolitairePuzzle
+        """
+        marker, bit = [], 1
+        for row in self.board.shape:
+            line = []
+            for m in row:
+                if m == "#":
+                    line.append("#")
+                else:
+                    line.append("*" if self.pegs & bit else ".")
+                bit <<= 1
+            marker.append(line)
+        return GridPegSolitairePuzzle(marker, {"*", ".", "#"})
+
+    def __eq__(self, other):
+        """
+        Return whether BitboardPegSolitairePuzzle self is equivalent to
+        other.
+
+        @type self: BitboardPegSolitairePuzzle
+        @type other: BitboardPegSolitairePuzzle | Any
+        @rtype: bool
+        """
+        return (type(self) == type(other) and self.pegs == other.pegs and
+                self.board.shape == other.board.shape)
+
+    def __hash__(self):
+        """
+        Return a hash of BitboardPegSolitairePuzzle self.
+
+        @type self: BitboardPegSolitairePuzzle
+        @rtype: int
+        """
+        return hash(self.pegs)
+
+    def __str__(self):
+        """
+        Return a human-readable string representation of self.
+
+        @type self: BitboardPegSolitairePuzzle
+        @rtype: str
+        >>> grid = [["*", "*", "."], ["#", "*", "*"]]
+        >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+        >>> print(BitboardPegSolitairePuzzle.from_grid_puzzle(gpsp))
+        **.
+        #**
+        <BLANKLINE>
+        """
+        return str(self.to_grid_puzzle())
+
+    def state_key(self):
+        """
+        Return the peg mask of BitboardPegSolitairePuzzle self.
+
+        @type self: BitboardPegSolitairePuzzle
+        @rtype: int
+        """
+        return self.pegs
+
+    def goal_key(self):
+        """
+        Return the board shape of BitboardPegSolitairePuzzle self, which
+        tells apart puzzles on different boards with the same peg mask.
+
+        @type self: BitboardPegSolitairePuzzle
+        @rtype: tuple[str]
+        """
+        return self.board.shape
+
+    def from_state_key(self, key):
+        """
+        Return the BitboardPegSolitairePuzzle on self's board with the
+        peg mask key.
+
+        @type self: BitboardPegSolitairePuzzle
+        @type key: int
+        @rtype: BitboardPegSolitairePuzzle
+        """
+        return BitboardPegSolitairePuzzle(key, self.board)
+
+    def canonical_key(self):
+        """
+        Return the smallest peg mask among the rotations and reflections
+        of self that keep its board shape.
+
+        @type self: BitboardPegSolitairePuzzle
+        @rtype: int
+        """
+        pegs = self.pegs
+        return min(permute_bits(pegs, perm) for perm in self.board.symmetries)
+
+    def extensions(self):
+        """
+        Return list of the puzzles one jump away from self.
+
+        @type self: BitboardPegSolitairePuzzle
+        @rtype: list[BitboardPegSolitairePuzzle]
+        >>> grid = [[".", "*", "*", "*"]]
+        >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+        >>> x = BitboardPegSolitairePuzzle.from_grid_puzzle(gpsp)
+        >>> [str(e) for e in x.extensions()]
+        ['*..*\\n']
+        """
+        return list(self.iter_extensions())
+
+    def iter_extensions(self):
+        """
+        Yield the puzzles one jump away from self, one at a time.
+
+        @type self: BitboardPegSolitairePuzzle
+        @rtype: Iterator[BitboardPegSolitairePuzzle]
+        """
+        board = self.board
+        for pegs in board.jumps_from(self.pegs):
+            extension = BitboardPegSolitairePuzzle(pegs, board)
+            # a jump keeps the classes, so they need no second look
+            extension._checked = self._checked
+            yield extension
+
+    def fail_fast(self):
+        """
+        Return True if the pegs of self can be shown, by position classes
+        or pagoda functions, never to come down to one.  Only puzzles not
+        reached by jumping from a checked one are checked.
+
+        @type self: BitboardPegSolitairePuzzle
+        @rtype: bool
+        >>> grid = [["*", ".", "*", ".", "*"]]
+        >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+        >>> BitboardPegSolitairePuzzle.from_grid_puzzle(gpsp).fail_fast()
+        True
+        """
+        if self._checked:
+            return False
+        self._checked = not self.board.invariants.unsolvable(self.pegs)
+        return not self._checked
+
+    def is_solved(self):
+        """
+        Return whether exactly one peg is left.
+
+        @type self: BitboardPegSolitairePuzzle
+        @rtype: bool
+        """
+        pegs = self.pegs
+        # a power of two has exactly one bit set
+        return pegs != 0 and pegs & (pegs - 1) == 0
+
+    def heuristic(self):
+        """
+        Return the number of pegs that still have to be jumped.
+
+        @type self: BitboardPegSolitairePuzzle
+        @rtype: int
+        """
+        return max(bin(self.pegs).count("1") - 1, 0)
+
+
+def english_board():
+    """
+    Return the standard 33-hole English board with only the centre empty.
+
+    @rtype: BitboardPegSolitairePuzzle
+    >>> english_board().heuristic()
+    31
+    """
+    rows = ["##***##", "##***##", "*******", "***.***", "*******",
+            "##***##", "##***##"]
+    return BitboardPegSolitairePuzzle.from_grid_puzzle(
+        GridPegSolitairePuzzle([list(row) for row in rows], {"*", ".", "#"}))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    from puzzle_tools import depth_first_solve
+    import time
+
+    start = time.time()
+    solution = depth_first_solve(english_board())
+    end = time.time()
+    print("Solved English peg solitaire in {} seconds.".format(end - start))
@@ -0,0 +1,307 @@
+"""
+Exact cover by Knuth's Algorithm X with dancing links, and its use as a
+SudokuPuzzle engine.
+
+The links live in parallel lists of ints rather than in one object per
+node, which keeps the matrix small and the inner loops cheap.
+"""
+from sudoku_puzzle import SudokuPuzzle
+from puzzle_tools import PuzzleNode, find_path
+
+
+class ExactCover:
+    """
+    A 0/1 matrix whose rows can be searched for sets that contain exactly
+    one 1 in every column.
+
+    Node 0 is the root, nodes 1 .. columns are the column headers, and
+    every 1 in the matrix is a node after them.
+    """
+
+    def __init__(self, columns):
+        """
+        Create an ExactCover self with columns columns and no rows.
+
+        @type self: ExactCover
+        @type columns: int
+        @rtype: None
+        """
+        nodes = list(range(columns + 1))
+        self.left = [i - 1 for i in nodes]
+        self.left[0] = columns
+        self.right = [i + 1 for i in nodes]
+        self.right[columns] = 0
+        self.up, self.down = nodes[:], nodes[:]
+        self.column = nodes[:]
+        self.size = [0] * (columns + 1)
+        # row id of every node, None for the root and headers
+        self.row = [None] * (columns + 1)
+
+    def add_row(self, row_id, columns):
+        """
+        Add a row with 1s in columns, which solutions report as row_id.
+
+        @type self: ExactCover
+        @type row_id: object
+        @type columns: list[int]
+        @rtype: None
+        """
+        first = None
+        for c in columns:
+            c += 1
+            node = len(self.column)
+            # link into the bottom of column c
+            self.up.append(self.up[c])
+            self.down.append(c)
+            self.down[self.up[c]] = node
+            self.up[c] = node
+            self.column.append(c)
+            self.size[c] += 1
+            self.row.append(row_id)
+            # link into the row, after the last node
+            if first is None:
+                first = node
+                self.left.append(node)
+                self.right.append(node)
+            else:
+                self.left.append(self.left[first])
+                self.right.append(first)
+                self.right[self.left[first]] = node
+                self.left[first] = node
+
+    def _cover(self, c):
+        """
+        Remove column c, and every row with a 1 in it, from the matrix.
+
+        @type self: ExactCover
+        @type c: int
+        @rtype: None
+        """
+        left, right, up, down = self.left, self.right, self.up, self.down
+        column, size = self.column, self.size
+        right[left[c]], left[right[c]] = right[c], left[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]], up[down[j]] = down[j], up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def _uncover(self, c):
+        """
+        Put back column c and its rows, undoing _cover(c).
+
+        @type self: ExactCover
+        @type c: int
+        @rtype: None
+        """
+        left, right, up, down = self.left, self.right, self.up, self.down
+        column, size = self.column, self.size
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = left[right[c]] = c
+
+    def solutions(self, limit=None):
+        """
+        Yield each exact cover as a list of row ids, stopping after
+        limit of them if limit is not None.
+
+        The matrix is restored once the generator finishes.
+
+        @type self: ExactCover
+        @type limit: int | None
+        @rtype: Iterator[list[object]]
+
+        >>> ec = ExactCover(3)
+        >>> for row_id, columns in [("a", [0, 1]), ("b", [2]), ("c", [0]),
+        ...                         ("d", [1, 2])]:
+        ...     ec.add_row(row_id, columns)
+        >>> sorted(sorted(s) for s in ec.solutions())
+        [['a', 'b'], ['c', 'd']]
+        """
+        right, down, column, size = (self.right, self.down, self.column,
+                                     self.size)
+        found = 0
+        # one node from each row chosen so far
+        chosen = []
+        while True:
+            if right[0] == 0:
+                # every column is covered
+                yield [self.row[i] for i in chosen]
+                found += 1
+                if limit is not None and found >= limit:
+                    break
+                node = None
+            else:
+                # the column with fewest rows fails or succeeds fastest
+                c = j = right[0]
+                while j != 0:
+                    if size[j] < size[c]:
+                        c = j
+                    j = right[j]
+                self._cover(c)
+                node = down[c]
+            # find the next row to try, backing up while there is none
+            while node is None or node == column[node]:
+                if node is not None:
+                    # every row of this column was tried
+                    self._uncover(node)
+                if not chosen:
+                    return
+                node = chosen.pop()
+                self._undo_row(node)
+                node = down[node]
+            chosen.append(node)
+            j = right[node]
+            while j != node:
+                self._cover(column[j])
+                j = right[j]
+        # stopped early, so undo every choice to leave the matrix intact
+        while chosen:
+            node = chosen.pop()
+            self._undo_row(node)
+            self._uncover(column[node])
+
+    def _undo_row(self, node):
+        """
+        Uncover the other columns of node's row, undoing choosing it.
+
+        @type self: ExactCover
+        @type node: int
+        @rtype: None
+        """
+        j = self.left[node]
+        while j != node:
+            self._uncover(self.column[j])
+            j = self.left[j]
+
+
+def sudoku_cover(puzzle):
+    """
+    Return the ExactCover of SudokuPuzzle puzzle, with a row (m, d) for
+    each symbol d that may go at position m.
+
+    Columns say that every position, and every symbol in every row,
+    column and subsquare, is used exactly once.
+
+    @type puzzle: SudokuPuzzle
+    @rtype: ExactCover
+    """
+    n, symbols = puzzle._n, puzzle._symbols
+    ss = round(n ** (1 / 2))
+    order = sorted(puzzle._symbol_set)
+    ec = ExactCover(4 * n * n)
+    for m in range(n * n):
+        r, c = divmod(m, n)
+        b = (r // ss) * ss + c // ss
+        choices = order if symbols[m] == "*" else [symbols[m]]
+        for d in choices:
+            k = order.index(d)
+            ec.add_row((m, d), [m, n * n + r * n + k, 2 * n * n + c * n + k,
+                                3 * n * n + b * n + k])
+    return ec
+
+
+def dlx_solutions(puzzle, limit=None):
+    """
+    Yield each solution of SudokuPuzzle puzzle as a full symbol list,
+    stopping after limit of them if limit is not None.
+
+    @type puzzle: SudokuPuzzle
+    @type limit: int | None
+    @rtype: Iterator[list[str]]
+    """
+    for rows in sudoku_cover(puzzle).solutions(limit):
+        symbols = puzzle._symbols[:]
+        for m, d in rows:
+            symbols[m] = d
+        yield symbols
+
+
+def count_solutions(puzzle, limit=None):
+    """
+    Return the number of solutions of SudokuPuzzle puzzle, counting no
+    further than limit if limit is not None.
+
+    count_solutions(puzzle, 2) == 1 checks that the solution is unique.
+
+    @type puzzle: SudokuPuzzle
+    @type limit: int | None
+    @rtype: int
+
+    >>> grid = ["A", "B", "*", "*"]
+    >>> grid += ["*", "*", "*", "*"]
+    >>> grid += ["*", "*", "*", "*"]
+    >>> grid += ["*", "*", "*", "*"]
+    >>> count_solutions(SudokuPuzzle(4, grid, {"A", "B", "C", "D"}))
+    24
+    >>> count_solutions(SudokuPuzzle(4, grid, {"A", "B", "C", "D"}), 2)
+    2
+    """
+    return sum(1 for _ in dlx_solutions(puzzle, limit))
+
+
+def dlx_solve(puzzle):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, with each child containing an extension of the puzzle
+    in its parent.  Return None if this is not possible.
+
+    This is a drop-in replacement for depth_first_solve on SudokuPuzzles:
+    the solution is found by exact cover, and the path then fills the
+    open positions in order, as SudokuPuzzle.extensions does.
+
+    @type puzzle: SudokuPuzzle
+    @rtype: PuzzleNode
+
+    >>> grid = ["A", "B", "C", "D"]
+    >>> grid += ["C", "D", "A", "B"]
+    >>> grid += ["B", "A", "D", "C"]
+    >>> grid += ["D", "C", "*", "*"]
+    >>> path = dlx_solve(SudokuPuzzle(4, grid, {"A", "B", "C", "D"}))
+    >>> print(path.children[0].children[0].puzzle)
+    AB|CD
+    CD|AB
+    -----
+    BA|DC
+    DC|BA
+    """
+    solution = next(dlx_solutions(puzzle, 1), None)
+    if solution is None:
+        return None
+    node = PuzzleNode(puzzle)
+    symbols = puzzle._symbols[:]
+    for m in range(len(symbols)):
+        if symbols[m] == "*":
+            symbols = symbols[:m] + [solution[m]] + symbols[m + 1:]
+            node = PuzzleNode(SudokuPuzzle(puzzle._n, symbols,
+                                           puzzle._symbol_set), parent=node)
+    return find_path(node)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    from time import time
+    s = SudokuPuzzle(9, list("8**********36******7**9*2***5***7*******457****"
+                             "*1***3***1****68**85***1**9****4**"),
+                     {"1", "2", "3", "4", "5", "6", "7", "8", "9"})
+    start = time()
+    sol = dlx_solve(s)
+    while sol.children:
+        sol = sol.children[0]
+    end = time()
+    print("time to solve 9x9 using dancing links: {} seconds\n".format(
+        end - start))
+    print(sol)
+    start = time()
+    print("solutions: {} (counted in {} seconds)".format(
+        count_solutions(s, 2), time() - start))
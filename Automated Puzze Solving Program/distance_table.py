@@ -0,0 +1,307 @@
+"""
+Complete distance-to-goal tables for small MNPuzzle boards.
+
+A board of n * m cells has (n * m)! arrangements, each numbered by the
+rank of its placement as in pattern_database.  One byte per arrangement
+holds its number of moves from the goal, filled in by a breadth-first
+search out from the goal; that is 720 bytes for 2x3, 40320 for 2x4 and
+362880 for 3x3.  A puzzle is then solved with no search at all, by
+stepping each time to the extension one move closer.
+
+Build from the command line, e.g. for the 8-puzzle:
+
+    python distance_table.py 12345678* --rows 3 -o 8.dist
+
+then load_table("8.dist") before calling table_solve, which otherwise
+builds the table of each goal the first time it meets it.
+"""
+import json
+import mmap
+import struct
+from array import array
+
+from pattern_database import UNKNOWN, placements, rank, unrank, _neighbours
+from puzzle_tools import PuzzleNode, find_path
+from mn_puzzle import MNPuzzle
+from packed_mn_puzzle import PackedMNPuzzle
+
+MAGIC = b"MNDIST1\n"
+# most cells a board can have for table_solve to build its table
+MAX_CELLS = 9
+
+# tables loaded or built for table_solve, keyed by to_grid
+_distance_tables = {}
+
+
+class UnsupportedPuzzle(ValueError):
+    """
+    Raised by table_solve for a puzzle it has no table for.
+    """
+    pass
+
+
+def build_distances(to_grid):
+    """
+    Return the moves from to_grid of every arrangement of its symbols,
+    by rank, UNKNOWN for those it cannot reach.
+
+    The open list holds ranks rather than arrangements, which are
+    unranked again as they are expanded.
+
+    @type to_grid: tuple[tuple[str]]
+    @rtype: array
+    >>> list(build_distances((("1", "*"),)))
+    [0, 1]
+    """
+    n, m = len(to_grid), len(to_grid[0])
+    cells = n * m
+    flat = [s for row in to_grid for s in row]
+    assert len(set(flat)) == cells, "symbols must not repeat"
+    neighbours, blank = _neighbours(n, m), flat.index("*")
+    table = array("B", [UNKNOWN]) * placements(cells, cells)
+    # an arrangement is the cell of each symbol, in the order of flat
+    start = rank(list(range(cells)), cells)
+    table[start], frontier, distance = 0, array("I", [start]), 0
+    while frontier:
+        distance += 1
+        following = array("I")
+        for index in frontier:
+            state = list(unrank(index, cells, cells))
+            here = state[blank]
+            for cell in neighbours[here]:
+                new = state[:]
+                new[state.index(cell)], new[blank] = here, cell
+                r = rank(new, cells)
+                if table[r] == UNKNOWN:
+                    table[r] = distance
+                    following.append(r)
+        frontier = following
+    return table
+
+
+def distance_table(to_grid):
+    """
+    Return the DistanceTable of to_grid, building it the first time.
+
+    @type to_grid: tuple[tuple[str]]
+    @rtype: DistanceTable
+    """
+    if to_grid not in _distance_tables:
+        _distance_tables[to_grid] = DistanceTable.build(to_grid)
+    return _distance_tables[to_grid]
+
+
+def load_table(path):
+    """
+    Return the DistanceTable saved at path, and use it for its goal in
+    table_solve from now on.
+
+    @type path: str
+    @rtype: DistanceTable
+    """
+    table = DistanceTable.load(path)
+    _distance_tables[table.to_grid] = table
+    return table
+
+
+def table_solve(puzzle):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, as breadth_first_solve would, or None if
+    this is not possible, by walking its goal's DistanceTable.
+
+    Raise UnsupportedPuzzle for a puzzle that is not an MNPuzzle or
+    PackedMNPuzzle, has more than MAX_CELLS cells, or repeats a symbol.
+
+    @type puzzle: MNPuzzle | PackedMNPuzzle
+    @rtype: PuzzleNode | None
+
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> path = table_solve(MNPuzzle(start_grid, target_grid))
+    >>> print(path.children[0].puzzle)
+    123
+    *45
+    <BLANKLINE>
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> table_solve(WordLadderPuzzle("cat", "cot", {"cat", "cot"}))
+    Traceback (most recent call last):
+    ...
+    distance_table.UnsupportedPuzzle: not an MNPuzzle: cat
+    """
+    if not isinstance(puzzle, (MNPuzzle, PackedMNPuzzle)):
+        raise UnsupportedPuzzle("not an MNPuzzle: {}".format(puzzle))
+    to_grid = _to_grid(puzzle)
+    flat = [s for row in to_grid for s in row]
+    if len(flat) > MAX_CELLS:
+        raise UnsupportedPuzzle("{} cells is more than {}".format(
+            len(flat), MAX_CELLS))
+    if len(set(flat)) < len(flat):
+        raise UnsupportedPuzzle("goal repeats a symbol")
+    return distance_table(to_grid).solve(puzzle)
+
+
+class DistanceTable:
+    """
+    The moves from one MNPuzzle goal of every arrangement of its board.
+    """
+
+    def __init__(self, to_grid, table):
+        """
+        Create the DistanceTable self of to_grid with the distances in
+        table, as build_distances returns them.
+
+        @type self: DistanceTable
+        @type to_grid: tuple[tuple[str]]
+        @type table: array | memoryview
+        @rtype: None
+        """
+        self.to_grid, self.table = to_grid, table
+        self._flat = [s for row in to_grid for s in row]
+        assert len(table) == placements(len(self._flat), len(self._flat))
+
+    @classmethod
+    def build(cls, to_grid):
+        """
+        Return the DistanceTable of to_grid.
+
+        @type to_grid: tuple[tuple[str]]
+        @rtype: DistanceTable
+        """
+        return cls(to_grid, build_distances(to_grid))
+
+    def save(self, path):
+        """
+        Write DistanceTable self to the file at path.
+
+        @type self: DistanceTable
+        @type path: str
+        @rtype: None
+        """
+        header = json.dumps({"to_grid": self.to_grid}).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            f.write(bytes(self.table))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Return the DistanceTable saved at path, memory-mapped read-only
+        so that processes loading the same file share its pages.
+
+        @type path: str
+        @rtype: DistanceTable
+        """
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        assert data[:len(MAGIC)] == MAGIC, "not a distance table"
+        offset = len(MAGIC) + 8
+        (length,) = struct.unpack_from("<Q", data, len(MAGIC))
+        header = json.loads(data[offset:offset + length].decode("utf-8"))
+        return cls(tuple(tuple(row) for row in header["to_grid"]),
+                   memoryview(data)[offset + length:])
+
+    def rank(self, from_grid):
+        """
+        Return the rank of from_grid, or None if it does not hold the
+        symbols of the goal of DistanceTable self.
+
+        @type self: DistanceTable
+        @type from_grid: tuple[tuple[str]]
+        @rtype: int | None
+        """
+        where = {s: i for i, s in enumerate(
+            s for row in from_grid for s in row)}
+        if len(where) != len(self._flat) or any(s not in where
+                                                for s in self._flat):
+            return None
+        return rank([where[s] for s in self._flat], len(self._flat))
+
+    def distance(self, puzzle):
+        """
+        Return the fewest moves that solve puzzle, or None if it cannot
+        be solved.
+
+        @type self: DistanceTable
+        @type puzzle: MNPuzzle | PackedMNPuzzle
+        @rtype: int | None
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> table = DistanceTable.build(target_grid)
+        >>> table.distance(MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+        ...                         target_grid))
+        3
+        >>> table.distance(MNPuzzle((("2", "1", "3"), ("4", "5", "*")),
+        ...                         target_grid)) is None
+        True
+        """
+        r = self.rank(_from_grid(puzzle))
+        if r is None or self.table[r] == UNKNOWN:
+            return None
+        return self.table[r]
+
+    def solve(self, puzzle):
+        """
+        Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+        containing a solution, or None if this is not possible.  Each
+        step is to the first extension one move closer to the goal.
+
+        @type self: DistanceTable
+        @type puzzle: MNPuzzle | PackedMNPuzzle
+        @rtype: PuzzleNode | None
+        """
+        assert _to_grid(puzzle) == self.to_grid
+        distance = self.distance(puzzle)
+        if distance is None:
+            return None
+        node = PuzzleNode(puzzle)
+        while distance:
+            distance -= 1
+            node = PuzzleNode(next(e for e in node.puzzle.extensions()
+                                   if self.distance(e) == distance),
+                              parent=node)
+        return find_path(node)
+
+
+def _from_grid(puzzle):
+    """
+    Return the current grid of puzzle.
+
+    @type puzzle: MNPuzzle | PackedMNPuzzle
+    @rtype: tuple[tuple[str]]
+    """
+    if isinstance(puzzle, PackedMNPuzzle):
+        return puzzle.layout.unpack(puzzle.state)
+    return puzzle.from_grid
+
+
+def _to_grid(puzzle):
+    """
+    Return the goal grid of puzzle.
+
+    @type puzzle: MNPuzzle | PackedMNPuzzle
+    @rtype: tuple[tuple[str]]
+    """
+    if isinstance(puzzle, PackedMNPuzzle):
+        return puzzle.layout.to_grid
+    return puzzle.to_grid
+
+
+if __name__ == "__main__":
+    import argparse
+    from time import time
+    parser = argparse.ArgumentParser(
+        description="Build an MNPuzzle distance table file.")
+    parser.add_argument("goal", help="goal symbols in row-major order, "
+                                     "one character each, '*' for blank")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+    width = len(args.goal) // args.rows
+    goal = tuple(tuple(args.goal[r * width:(r + 1) * width])
+                 for r in range(args.rows))
+    start = time()
+    DistanceTable.build(goal).save(args.output)
+    print("built {} entries in {} seconds".format(
+        placements(len(args.goal), len(args.goal)), time() - start))
@@ -0,0 +1,289 @@
+"""
+Breadth-first search that keeps its layers on disk instead of in memory.
+
+Every layer is a file of distinct state keys, sorted, each written as
+width big-endian bytes so that byte order is numeric order.  The next
+layer is built by expanding the current one into sorted runs of at most
+memory keys, merging the runs, and removing every key already in the
+last few layers (delayed duplicate detection).  Only the runs' merge
+heads and one buffer of keys are in memory at a time, so spaces far
+larger than RAM, such as the 3x4 MNPuzzle, can be searched.
+
+From the command line, to count every layer of an MNPuzzle:
+
+    python external_bfs.py 123/456/78* --directory /big/disk
+"""
+import heapq
+import mmap
+import os
+import tempfile
+from itertools import groupby
+
+from puzzle_tools import PuzzleNode, find_path
+
+
+def layer_path(directory, depth):
+    """
+    Return the name of the file for layer depth in directory.
+
+    @type directory: str
+    @type depth: int
+    @rtype: str
+    """
+    return os.path.join(directory, "layer{:04d}.keys".format(depth))
+
+
+def write_keys(path, keys, width):
+    """
+    Write keys to a new file path, width bytes each, and return how many
+    there were.
+
+    @type path: str
+    @type keys: Iterable[int]
+    @type width: int
+    @rtype: int
+    """
+    size = 0
+    with open(path, "wb") as f:
+        for key in keys:
+            f.write(key.to_bytes(width, "big"))
+            size += 1
+    return size
+
+
+def read_keys(path, width):
+    """
+    Yield the keys written to path by write_keys, in order.
+
+    @type path: str
+    @type width: int
+    @rtype: Iterator[int]
+    """
+    if os.path.getsize(path) == 0:
+        # empty files cannot be mapped
+        return
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for i in range(0, len(buf), width):
+                yield int.from_bytes(buf[i:i + width], "big")
+
+
+def contains_key(path, width, key):
+    """
+    Return whether the sorted key file path contains key, by binary
+    search.
+
+    @type path: str
+    @type width: int
+    @type key: int
+    @rtype: bool
+    """
+    size = os.path.getsize(path) // width
+    if size == 0:
+        return False
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            low, high = 0, size
+            while low < high:
+                middle = (low + high) // 2
+                i = middle * width
+                if int.from_bytes(buf[i:i + width], "big") < key:
+                    low = middle + 1
+                else:
+                    high = middle
+            return (low < size and
+                    int.from_bytes(buf[low * width:(low + 1) * width],
+                                   "big") == key)
+
+
+def _subtract(keys, removed):
+    """
+    Yield the keys not in removed, both being sorted.
+
+    @type keys: Iterator[int]
+    @type removed: Iterator[int]
+    @rtype: Iterator[int]
+    """
+    r = next(removed, None)
+    for key in keys:
+        while r is not None and r < key:
+            r = next(removed, None)
+        if r != key:
+            yield key
+
+
+def external_bfs(start, expand, directory, width=8, memory=1 << 20,
+                 previous=2):
+    """
+    Yield (depth, path, size) for each layer of a breadth-first search
+    from the int keys start, as soon as its file path in directory is
+    written.  size is the number of keys in the layer.
+
+    expand(key) returns the keys one move from key.  Keys must fit in
+    width bytes.  At most memory new keys are held before being sorted
+    and spilled to disk.  Each new layer drops keys in the previous
+    layers before it; 2 suffices when every move can be undone, since
+    then nothing one move away from a layer lies further back, and None
+    keeps all of them.  Layer files are left in directory.
+
+    @type start: Iterable[int]
+    @type expand: (int) -> Iterable[int]
+    @type directory: str
+    @type width: int
+    @type memory: int
+    @type previous: int | None
+    @rtype: Iterator[(int, str, int)]
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> from packed_mn_puzzle import PackedMNPuzzle
+    >>> goal = (("1", "2", "3"), ("4", "5", "*"))
+    >>> p = PackedMNPuzzle.from_mn_puzzle(MNPuzzle(goal, goal))
+    >>> def expand(key):
+    ...     return [e.state for e in p.from_state_key(key).extensions()]
+    >>> with tempfile.TemporaryDirectory() as tmp:
+    ...     layers = [size for depth, path, size
+    ...               in external_bfs([p.state], expand, tmp, memory=50)]
+    >>> len(layers) - 1, sum(layers)
+    (21, 360)
+    """
+    depth = 0
+    path = layer_path(directory, depth)
+    size = write_keys(path, sorted(set(start)), width)
+    while size:
+        yield depth, path, size
+        runs, buffer = [], set()
+        for key in read_keys(path, width):
+            buffer.update(expand(key))
+            if len(buffer) >= memory:
+                runs.append(_spill(directory, len(runs), buffer, width))
+                buffer = set()
+        if buffer or not runs:
+            runs.append(_spill(directory, len(runs), buffer, width))
+        first = 0 if previous is None else max(depth - previous + 1, 0)
+        older = heapq.merge(*[read_keys(layer_path(directory, d), width)
+                              for d in range(first, depth + 1)])
+        merged = heapq.merge(*[read_keys(run, width) for run in runs])
+        fresh = _subtract((key for key, _ in groupby(merged)), older)
+        depth += 1
+        path = layer_path(directory, depth)
+        size = write_keys(path, fresh, width)
+        for run in runs:
+            os.remove(run)
+
+
+def _spill(directory, i, keys, width):
+    """
+    Write keys sorted to run file i in directory, and return its name.
+
+    @type directory: str
+    @type i: int
+    @type keys: set[int]
+    @type width: int
+    @rtype: str
+    """
+    path = os.path.join(directory, "run{:04d}.keys".format(i))
+    write_keys(path, sorted(keys), width)
+    return path
+
+
+def external_solve(puzzle, directory=None, width=8, memory=1 << 20,
+                   previous=2):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing its goal_state, searching with external_bfs in a
+    temporary directory inside directory.  Return None if this is not
+    possible, without writing any layers if puzzle.fail_fast().
+
+    puzzle needs int state_keys, from_state_key, goal_state and
+    reverse_extensions; the path is traced back from the goal by
+    looking up the reverse extensions of each step in the layer before.
+
+    @type puzzle: Puzzle
+    @type directory: str | None
+    @type width: int
+    @type memory: int
+    @type previous: int | None
+    @rtype: PuzzleNode | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> from packed_mn_puzzle import PackedMNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> p = PackedMNPuzzle.from_mn_puzzle(MNPuzzle(start_grid, target_grid))
+    >>> path = external_solve(p)
+    >>> print(path.children[0].puzzle)
+    123
+    *45
+    <BLANKLINE>
+    >>> swapped_grid = (("2", "1", "3"), ("4", "5", "*"))
+    >>> external_solve(PackedMNPuzzle.from_mn_puzzle(
+    ...     MNPuzzle(swapped_grid, target_grid))) is None
+    True
+    """
+    if puzzle.fail_fast():
+        return None
+    goal = puzzle.goal_state().state_key()
+
+    def expand(key):
+        return [e.state_key()
+                for e in puzzle.from_state_key(key).extensions()]
+
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        for depth, path, size in external_bfs([puzzle.state_key()], expand,
+                                              tmp, width, memory, previous):
+            if contains_key(path, width, goal):
+                return _trace_back(puzzle, goal, depth, tmp, width)
+    return None
+
+
+def _trace_back(puzzle, goal, depth, directory, width):
+    """
+    Return the path from PuzzleNode(puzzle) to the key goal in layer
+    depth of the search in directory.
+
+    @type puzzle: Puzzle
+    @type goal: int
+    @type depth: int
+    @type directory: str
+    @type width: int
+    @rtype: PuzzleNode
+    """
+    steps, step = [], puzzle.from_state_key(goal)
+    for d in range(depth - 1, -1, -1):
+        steps.append(step)
+        path = layer_path(directory, d)
+        step = next(p for p in step.reverse_extensions()
+                    if contains_key(path, width, p.state_key()))
+    node = PuzzleNode(puzzle)
+    for step in reversed(steps):
+        node = PuzzleNode(step, parent=node)
+    return find_path(node)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from mn_puzzle import MNPuzzle
+    from packed_mn_puzzle import PackedMNPuzzle
+    parser = argparse.ArgumentParser(
+        description="Count every layer of an MNPuzzle breadth-first, "
+                    "keeping the layers on disk.")
+    parser.add_argument("goal", help="rows of the goal separated by /")
+    parser.add_argument("--directory", default=None,
+                        help="where to put the layer files")
+    parser.add_argument("--memory", type=int, default=1 << 20,
+                        help="keys to hold before spilling a run")
+    args = parser.parse_args()
+    grid = tuple(tuple(row) for row in args.goal.split("/"))
+    p = PackedMNPuzzle.from_mn_puzzle(MNPuzzle(grid, grid))
+
+    def expand_packed(key):
+        return [e.state for e in p.from_state_key(key).extensions()]
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as tmp:
+        start, total = time.time(), 0
+        for depth, _, size in external_bfs([p.state], expand_packed, tmp,
+                                           memory=args.memory):
+            total += size
+            print("depth {}: {} states ({} so far, {:.1f} seconds)".format(
+                depth, size, total, time.time() - start))
@@ -1,4 +1,150 @@
 from puzzle import Puzzle
+from symmetry import grid_symmetries, permute_bits
+
+# symmetries already found, keyed by the board's tuple of "#"/"o" rows
+_board_symmetries = {}
+
+
+def board_symmetries(shape):
+    """
+    Return the rotations and reflections of grid_symmetries that map the
+    unused "#" cells of shape onto themselves.
+
+    @type shape: tuple[str]
+    @rtype: list[tuple[int]]
+    >>> len(board_symmetries(("##o", "ooo", "##o")))
+    2
+    """
+    if shape not in _board_symmetries:
+        flat = "".join(shape)
+        _board_symmetries[shape] = [
+            perm for perm in grid_symmetries(len(shape), len(shape[0]))
+            if all(flat[perm[i]] == flat[i] for i in range(len(flat)))]
+    return _board_symmetries[shape]
+
+
+# invariants already worked out, keyed like _board_symmetries
+_board_invariants = {}
+
+
+def board_invariants(shape):
+    """
+    Return the PegInvariants of shape, working them out only once.
+
+    @type shape: tuple[str]
+    @rtype: PegInvariants
+    """
+    if shape not in _board_invariants:
+        _board_invariants[shape] = PegInvariants(shape)
+    return _board_invariants[shape]
+
+
+def _count(pegs):
+    """
+    Return the number of pegs, set bits, in pegs.
+
+    @type pegs: int
+    @rtype: int
+    """
+    return bin(pegs).count("1")
+
+
+class PegInvariants:
+    """
+    What no jump can change on one board shape, for proving that pegs
+    can never come down to a single peg.
+
+    Cells are numbered as in state_key.  A jump covers three cells in a
+    line, one from each class (r + c) % 3 and one from each class
+    (r - c) % 3, so it flips the parity of the peg count of every
+    class.  Which cells the last peg can end on is therefore fixed from
+    the start.  Each pagoda function weights the cells so that no jump
+    raises the total weight of the pegs, so pegs weighing less than
+    every cell the last peg can end on can never finish.
+    """
+
+    def __init__(self, shape):
+        """
+        Create the PegInvariants self of the board shape, a tuple of rows
+        in which "#" marks an unused cell.
+
+        @type self: PegInvariants
+        @type shape: tuple[str]
+        @rtype: None
+        """
+        height, width = len(shape), len(shape[0])
+        cells = [(r, c) for r in range(height) for c in range(width)
+                 if shape[r][c] != "#"]
+
+        def mask(test):
+            return sum(1 << (r * width + c) for r, c in cells if test(r, c))
+
+        self._classes = ([mask(lambda r, c, k=k: (r + c) % 3 == k)
+                          for k in range(3)] +
+                         [mask(lambda r, c, k=k: (r - c) % 3 == k)
+                          for k in range(3)])
+        # each pagoda function as (weight, mask of the cells it weights)
+        fibonacci = [1, 1]
+        while len(fibonacci) < max(height, width):
+            fibonacci.append(fibonacci[-1] + fibonacci[-2])
+        weights = []
+        for axis in (0, 1):
+            size = (height, width)[axis]
+            for phase in range(3):
+                weights.append(lambda r, c, a=axis, p=phase:
+                               int(((r, c)[a] - p) % 3 != 0))
+            weights.append(lambda r, c, a=axis: fibonacci[(r, c)[a]])
+            weights.append(lambda r, c, a=axis, s=size:
+                           fibonacci[s - 1 - (r, c)[a]])
+        self._pagodas = []
+        for weight in weights:
+            values = sorted({weight(r, c) for r, c in cells} - {0})
+            self._pagodas.append(
+                [(v, mask(lambda r, c, w=weight, v=v: w(r, c) == v))
+                 for v in values])
+        # for each signature a single peg can have, the least weight of
+        # the cells with it under each pagoda function
+        self._floors = {}
+        for r, c in cells:
+            bit = 1 << (r * width + c)
+            floors = self._floors.setdefault(self._signature(bit),
+                                             [None] * len(weights))
+            for i, weight in enumerate(weights):
+                if floors[i] is None or weight(r, c) < floors[i]:
+                    floors[i] = weight(r, c)
+
+    def _signature(self, pegs):
+        """
+        Return which class counts of pegs differ in parity, which no
+        jump changes.
+
+        @type self: PegInvariants
+        @type pegs: int
+        @rtype: tuple[bool]
+        """
+        parities = [_count(pegs & m) % 2 for m in self._classes]
+        return (parities[0] != parities[1], parities[1] != parities[2],
+                parities[3] != parities[4], parities[4] != parities[5])
+
+    def unsolvable(self, pegs):
+        """
+        Return True if pegs can be shown never to come down to one peg.
+
+        @type self: PegInvariants
+        @type pegs: int
+        @rtype: bool
+
+        >>> invariants = PegInvariants(("ooooo",))
+        >>> invariants.unsolvable(0b00011), invariants.unsolvable(0b10101)
+        (False, True)
+        """
+        floors = self._floors.get(self._signature(pegs))
+        if floors is None:
+            return True
+        for pagoda, floor in zip(self._pagodas, floors):
+            if sum(v * _count(pegs & m) for v, m in pagoda) < floor:
+                return True
+        return False
 
 
 class GridPegSolitairePuzzle(Puzzle):
@@ -23,6 +169,8 @@ class GridPegSolitairePuzzle(Puzzle):
         assert all([all(x in marker_set for x in row) for row in marker])
         assert all([x == "*" or x == "." or x == "#" for x in marker_set])
         self._marker, self._marker_set = marker, marker_set
+        # whether fail_fast has already found the invariants satisfied
+        self._checked = False
 
     # implement __eq__, __str__ methods
     # __repr__ is up to you
@@ -42,6 +190,102 @@ class GridPegSolitairePuzzle(Puzzle):
                 self._marker == other._marker and
                 self._marker_set == other._marker_set)
 
+    def __hash__(self):
+        """
+        Return a hash of GridPegSolitairePuzzle self, equal for equal puzzles.
+        @type self: GridPegSolitairePuzzle
+        @rtype: int
+        >>> grid = [["*", "*", "*", "*", "*"],["*", "*", ".", "*", "*"]]
+        >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+        >>> xy = GridPegSolitairePuzzle([r[:] for r in grid], {"*", ".", "#"})
+        >>> hash(xy) == hash(gpsp)
+        True
+        >>> len({xy, gpsp})
+        1
+        """
+        return hash(self.state_key())
+
+    def __copy__(self):
+        """
+        Return a GridPegSolitairePuzzle equal to self that shares no row
+        with it, so moves can be applied to either alone.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: GridPegSolitairePuzzle
+        """
+        return GridPegSolitairePuzzle([row[:] for row in self._marker],
+                                      self._marker_set)
+
+    def state_key(self):
+        """
+        Return an int with bit r * width + c set iff there is a peg
+        in row r, column c of GridPegSolitairePuzzle self.
+
+        The "#" and "." cells are left out, since only pegs move.
+        @type self: GridPegSolitairePuzzle
+        @rtype: int
+        >>> grid = [["*", ".", "#"],["#", ".", "*"]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).state_key()
+        33
+        """
+        key, bit = 0, 1
+        for row in self._marker:
+            for m in row:
+                if m == '*':
+                    key |= bit
+                bit <<= 1
+        return key
+
+    def canonical_key(self):
+        """
+        Return the smallest state_key among the rotations and reflections
+        of GridPegSolitairePuzzle self that keep its board shape.
+        @type self: GridPegSolitairePuzzle
+        @rtype: int
+        >>> a = GridPegSolitairePuzzle([["*", "*", "."]], {"*", ".", "#"})
+        >>> b = GridPegSolitairePuzzle([[".", "*", "*"]], {"*", ".", "#"})
+        >>> a.canonical_key() == b.canonical_key()
+        True
+        """
+        key = self.state_key()
+        return min(permute_bits(key, perm)
+                   for perm in board_symmetries(self.goal_key()))
+
+    def goal_key(self):
+        """
+        Return the board shape of GridPegSolitairePuzzle self, a tuple of
+        rows with "#" for unused cells and "o" for holes, which tells
+        apart puzzles on different boards with the same state_key.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: tuple[str]
+        >>> grid = [["*", ".", "#"], ["#", ".", "*"]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).goal_key()
+        ('oo#', '#oo')
+        """
+        return tuple("".join("#" if m == "#" else "o" for m in row)
+                     for row in self._marker)
+
+    def fail_fast(self):
+        """
+        Return True if the pegs of GridPegSolitairePuzzle self can be
+        shown, by position classes or pagoda functions, never to come
+        down to one.  Only puzzles not reached by jumps from a checked
+        one are checked: a jump keeps the class parities, and pagoda
+        sums that pass at the start have not been seen to fail later.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: bool
+        >>> grid = [["*", ".", "*", ".", "*"]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).fail_fast()
+        True
+        """
+        if self._checked:
+            return False
+        self._checked = not board_invariants(self.goal_key()).unsolvable(
+            self.state_key())
+        return not self._checked
+
     def __str__(self):
         """
         Return a human-readable string representation of GridPegPuzzle self.
@@ -76,10 +320,23 @@ class GridPegSolitairePuzzle(Puzzle):
         >>> y in gpsp.extensions()
         True
 
+        """
+        return list(self.iter_extensions())
+
+    def iter_extensions(self):
+        """
+        Yield the extensions of GridPegSolitairePuzzle self one at a time.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: Iterator[GridPegSolitairePuzzle]
+        >>> grid = [[".", "*", "*", "*"]]
+        >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+        >>> print(next(gpsp.iter_extensions()))
+        *..*
+        <BLANKLINE>
         """
         row_number = 0
-        result = []
-        # set initial row_number is 0 and result is a list
+        # set initial row_number is 0
         for i in self._marker:
             index = 0
             for m in i:
@@ -95,8 +352,7 @@ class GridPegSolitairePuzzle(Puzzle):
                         # copy _marker to avoid change original data
                         new_marker[row_number] = new_line
                         # change the row
-                        result.append(GridPegSolitairePuzzle(new_marker,
-                                                             self._marker_set))
+                        yield self._jumped(new_marker)
                     # jump left
 
                     if index > 1 and i[index - 2] == '*' \
@@ -109,8 +365,7 @@ class GridPegSolitairePuzzle(Puzzle):
                         # copy _marker to avoid change original data
                         new_marker[row_number] = new_line
                         # change the row
-                        result.append(GridPegSolitairePuzzle(new_marker,
-                                                             self._marker_set))
+                        yield self._jumped(new_marker)
                     # jump right
 
                     if row_number < len(self._marker) - 2 \
@@ -133,8 +388,7 @@ class GridPegSolitairePuzzle(Puzzle):
                         new_marker[row_number + 1] = new_line2
                         new_marker[row_number + 2] = new_line3
                     # append all three line
-                        result.append(GridPegSolitairePuzzle(new_marker,
-                                                             self._marker_set))
+                        yield self._jumped(new_marker)
                 # jump down
 
                     if row_number > 1 \
@@ -154,14 +408,102 @@ class GridPegSolitairePuzzle(Puzzle):
                         new_marker[row_number - 1] = new_line2
                         new_marker[row_number - 2] = new_line3
                     # append all three line
-                        result.append(GridPegSolitairePuzzle(new_marker,
-                                                             self._marker_set))
+                        yield self._jumped(new_marker)
                 # jump above
                 index += 1
             else:
                 index += 1
             row_number += 1
-        return result
+
+    def _jumped(self, marker):
+        """
+        Return the extension of GridPegSolitairePuzzle self with marker,
+        which fail_fast need not check again if self was checked.
+
+        @type self: GridPegSolitairePuzzle
+        @type marker: list[list[str]]
+        @rtype: GridPegSolitairePuzzle
+        """
+        extension = GridPegSolitairePuzzle(marker, self._marker_set)
+        extension._checked = self._checked
+        return extension
+
+    def legal_moves(self):
+        """
+        Return list of moves (r, c, dr, dc), each jumping the peg in row r,
+        column c over the next cell in direction dr, dc into the empty
+        one after it, in the order of extensions.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: list[(int, int, int, int)]
+        >>> grid = [[".", "*", "*", "*"]]
+        >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+        >>> gpsp.legal_moves()
+        [(0, 2, 0, -1)]
+        >>> gpsp.apply((0, 2, 0, -1))
+        >>> print(gpsp)
+        *..*
+        <BLANKLINE>
+        >>> gpsp.undo((0, 2, 0, -1))
+        >>> print(gpsp)
+        .***
+        <BLANKLINE>
+        """
+        marker = self._marker
+        height, width = len(marker), len(marker[0])
+        moves = []
+        for r in range(height):
+            for c in range(width):
+                if marker[r][c] != '.':
+                    continue
+                for dr, dc in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+                    # the jumping peg starts two cells away, against dr, dc
+                    r2, c2 = r - 2 * dr, c - 2 * dc
+                    if (0 <= r2 < height and 0 <= c2 < width and
+                            marker[r2][c2] == '*' and
+                            marker[r - dr][c - dc] == '*'):
+                        moves.append((r2, c2, dr, dc))
+        return moves
+
+    def apply(self, move):
+        """
+        Make the jump move on GridPegSolitairePuzzle self.
+
+        @type self: GridPegSolitairePuzzle
+        @type move: (int, int, int, int)
+        @rtype: None
+        """
+        r, c, dr, dc = move
+        marker = self._marker
+        marker[r][c] = marker[r + dr][c + dc] = '.'
+        marker[r + 2 * dr][c + 2 * dc] = '*'
+
+    def undo(self, move):
+        """
+        Take back the jump move on GridPegSolitairePuzzle self.
+
+        @type self: GridPegSolitairePuzzle
+        @type move: (int, int, int, int)
+        @rtype: None
+        """
+        r, c, dr, dc = move
+        marker = self._marker
+        marker[r][c] = marker[r + dr][c + dc] = '*'
+        marker[r + 2 * dr][c + 2 * dc] = '.'
+
+    def heuristic(self):
+        """
+        Return the number of pegs that still have to be jumped.
+
+        Every jump removes exactly one peg, so this is exact for
+        solvable positions.
+        @type self: GridPegSolitairePuzzle
+        @rtype: int
+        >>> grid = [["*", "*", "*", "*", "*"],["*", "*", ".", "*", "*"]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).heuristic()
+        8
+        """
+        return max(bin(self.state_key()).count("1") - 1, 0)
 
     # override is_solved
     # A configuration is solved when there is exactly one "*" left
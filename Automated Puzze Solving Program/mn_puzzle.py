@@ -1,4 +1,122 @@
 from puzzle import Puzzle
+from symmetry import grid_symmetries
+
+# goal (row, column) of every symbol, for each to_grid seen so far
+_goal_positions = {}
+
+
+def goal_positions(to_grid):
+    """
+    Return a dict mapping each symbol of to_grid to its (row, column).
+
+    The result is computed once per to_grid and then shared.
+
+    @type to_grid: tuple[tuple[str]]
+    @rtype: dict[str, (int, int)]
+    >>> goal_positions((("1", "2"), ("3", "*")))["3"]
+    (1, 0)
+    """
+    if to_grid not in _goal_positions:
+        _goal_positions[to_grid] = {symbol: (r, c)
+                                    for r, row in enumerate(to_grid)
+                                    for c, symbol in enumerate(row)}
+    return _goal_positions[to_grid]
+
+
+# symmetries already found, for each to_grid seen so far
+_goal_symmetries = {}
+
+
+def goal_symmetries(to_grid):
+    """
+    Return the rotations and reflections that keep the blank of to_grid
+    in place, each as (perm, relabel): cell i moves to perm[i] and
+    symbol s becomes relabel[s].
+
+    Relabelling maps to_grid onto itself, so a transformed grid is
+    exactly as many moves from to_grid as the original.
+
+    @type to_grid: tuple[tuple[str]]
+    @rtype: list[(tuple[int], dict[str, str])]
+    >>> len(goal_symmetries((("1", "2", "3"), ("4", "5", "6"),
+    ...                      ("7", "8", "*"))))
+    2
+    """
+    if to_grid not in _goal_symmetries:
+        flat = [s for row in to_grid for s in row]
+        blank = flat.index("*")
+        _goal_symmetries[to_grid] = [
+            (perm, {s: flat[perm[i]] for i, s in enumerate(flat)})
+            for perm in grid_symmetries(len(to_grid), len(to_grid[0]))
+            if perm[blank] == blank]
+    return _goal_symmetries[to_grid]
+
+
+def solvable(from_grid, to_grid):
+    """
+    Return whether to_grid can be reached from from_grid by sliding.
+
+    Each move swaps the blank with a tile, which flips the parity of
+    the permutation taking from_grid to to_grid and of the blank's
+    distance to its goal cell, so the two parities must agree; on a
+    grid at least two cells each way that is also enough.  In a single
+    row or column the tiles can never pass each other.  If to_grid
+    repeats a symbol, only the symbols are compared.
+
+    @type from_grid: tuple[tuple[str]]
+    @type to_grid: tuple[tuple[str]]
+    @rtype: bool
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> solvable((("*", "2", "3"), ("1", "4", "5")), target_grid)
+    True
+    >>> solvable((("2", "1", "3"), ("4", "5", "*")), target_grid)
+    False
+    """
+    flat = [s for row in from_grid for s in row]
+    goal_flat = [s for row in to_grid for s in row]
+    if sorted(flat) != sorted(goal_flat):
+        return False
+    if len(to_grid) == 1 or len(to_grid[0]) == 1:
+        return ([s for s in flat if s != "*"] ==
+                [s for s in goal_flat if s != "*"])
+    if len(set(goal_flat)) < len(goal_flat):
+        return True
+    goal, width = goal_positions(to_grid), len(to_grid[0])
+    targets = [goal[s][0] * width + goal[s][1] for s in flat]
+    # a cycle of length k is k - 1 swaps
+    swaps, seen = 0, [False] * len(targets)
+    for i in range(len(targets)):
+        j, length = i, 0
+        while not seen[j]:
+            seen[j], j = True, targets[j]
+            length += 1
+        swaps += max(length - 1, 0)
+    blank = flat.index("*")
+    goal_r, goal_c = goal["*"]
+    distance = abs(blank // width - goal_r) + abs(blank % width - goal_c)
+    return swaps % 2 == distance % 2
+
+
+def _line_conflicts(goal_order):
+    """
+    Return the number of tiles that must leave a line so that the rest
+    reach their goals in order, given the goal order of the tiles already
+    in their goal line, listed in their current order.
+
+    @type goal_order: list[int]
+    @rtype: int
+    >>> _line_conflicts([2, 1, 0])
+    2
+    >>> _line_conflicts([0, 2, 1])
+    1
+    """
+    # every tile not in the longest increasing run has to step aside
+    longest = []
+    for g in goal_order:
+        best = 1 + max([longest[i] for i in range(len(longest))
+                        if goal_order[i] < g] + [0])
+        longest.append(best)
+    return len(goal_order) - max(longest + [0])
 
 
 class MNPuzzle(Puzzle):
@@ -24,6 +142,8 @@ class MNPuzzle(Puzzle):
         assert all([len(r) == len(to_grid[0]) for r in to_grid])
         self.n, self.m = len(from_grid), len(from_grid[0])
         self.from_grid, self.to_grid = from_grid, to_grid
+        # whether fail_fast has already found to_grid reachable
+        self._checked = False
 
     # TODO
     # implement __eq__ and __str__
@@ -45,6 +165,102 @@ class MNPuzzle(Puzzle):
                self.from_grid == other.from_grid and
                self.to_grid == other.to_grid)
 
+    def __hash__(self):
+        """
+        Return a hash of MNPuzzle self, equal for equal puzzles.
+
+        @type self: MNPuzzle
+        @rtype: int
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> x = MNPuzzle(start_grid, target_grid)
+        >>> y = MNPuzzle(start_grid, target_grid)
+        >>> hash(x) == hash(y)
+        True
+        >>> len({x, y})
+        1
+        """
+        return hash(self.state_key())
+
+    def __copy__(self):
+        """
+        Return an MNPuzzle equal to self, so moves can be applied to
+        either alone.  The grids are tuples, so they can be shared.
+
+        @type self: MNPuzzle
+        @rtype: MNPuzzle
+        """
+        return self._moved(self.from_grid)
+
+    def _moved(self, from_grid):
+        """
+        Return the MNPuzzle with from_grid and the goal of self, which
+        fail_fast need not check again if self was checked: moves keep
+        whether to_grid is reachable.
+
+        @type self: MNPuzzle
+        @type from_grid: tuple[tuple[str]]
+        @rtype: MNPuzzle
+        """
+        puzzle = MNPuzzle(from_grid, self.to_grid)
+        puzzle._checked = self._checked
+        return puzzle
+
+    def fail_fast(self):
+        """
+        Return True if to_grid cannot be reached from MNPuzzle self, as
+        solvable decides.
+
+        @type self: MNPuzzle
+        @rtype: bool
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> MNPuzzle((("2", "1", "3"), ("4", "5", "*")),
+        ...          target_grid).fail_fast()
+        True
+        """
+        if not self._checked:
+            self._checked = solvable(self.from_grid, self.to_grid)
+        return not self._checked
+
+    def state_key(self):
+        """
+        Return the symbols of from_grid in row-major order.
+
+        to_grid is left out, since it never changes during a search.
+
+        @type self: MNPuzzle
+        @rtype: tuple[str]
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> MNPuzzle(start_grid, target_grid).state_key()
+        ('*', '2', '3', '1', '4', '5')
+        """
+        return tuple(symbol for row in self.from_grid for symbol in row)
+
+    def canonical_key(self):
+        """
+        Return the smallest state_key among the relabelled rotations and
+        reflections of MNPuzzle self that keep to_grid's blank in place.
+
+        @type self: MNPuzzle
+        @rtype: tuple[str]
+        >>> t = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+        >>> a = MNPuzzle((("1", "2", "3"), ("4", "5", "6"), ("7", "*", "8")),
+        ...              t)
+        >>> b = MNPuzzle((("1", "2", "3"), ("4", "5", "*"), ("7", "8", "6")),
+        ...              t)
+        >>> a.canonical_key() == b.canonical_key()
+        True
+        """
+        flat = self.state_key()
+        keys = []
+        for perm, relabel in goal_symmetries(self.to_grid):
+            moved = [None] * len(flat)
+            for i, s in enumerate(flat):
+                moved[perm[i]] = relabel[s]
+            keys.append(tuple(moved))
+        return min(keys)
+
     def __str__(self):
         """
         Return a human-readable string representation of MNPuzzle self.
@@ -80,6 +296,11 @@ class MNPuzzle(Puzzle):
         >>> y = x.extensions()
         >>> MNPuzzle((("1", "2","3"), ("4", "*", "5")),target_grid) in y
         True
+        >>> t = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+        >>> g = (("1", "2", "3"), ("4", "*", "6"), ("7", "5", "8"))
+        >>> z = MNPuzzle(g, t)
+        >>> all([isinstance(e, MNPuzzle) for e in z.extensions()])
+        True
         """
 
         def to_right(_list, _row_number, _index):
@@ -156,84 +377,204 @@ class MNPuzzle(Puzzle):
             # first case: '*' is in first row
             x = new_start_grid.copy()
             to_below(x, row_number, index)
-            result.append(MNPuzzle(tuple(x), self.to_grid))  # to below
+            result.append(self._moved(tuple(x)))  # to below
             # change it to below
             if index == 0:
                 x = new_start_grid.copy()
                 to_right(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to right
+                result.append(self._moved(tuple(x)))  # to right
                 return result
             # first place, change it to right
             elif index == self.m-1:
                 x = new_start_grid.copy()
                 to_left(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to left
+                result.append(self._moved(tuple(x)))  # to left
                 return result
             # change it to left
             else:
                 x = new_start_grid.copy()
                 to_left(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to left
+                result.append(self._moved(tuple(x)))  # to left
 
                 x = new_start_grid.copy()
                 to_right(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to right
+                result.append(self._moved(tuple(x)))  # to right
                 return result
             # can change it to both left and right
         elif row_number == self.n-1:
             x = new_start_grid.copy()
             to_upper(x, row_number, index)
-            result.append(MNPuzzle(tuple(x), self.to_grid))  # to upper
+            result.append(self._moved(tuple(x)))  # to upper
             # '*' locate in the last row
             if index == 0:
                 x = new_start_grid.copy()
                 to_right(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to right
+                result.append(self._moved(tuple(x)))  # to right
                 return result
             # can change it to right
             elif index == self.m-1:
                 x = new_start_grid.copy()
                 to_left(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to left
+                result.append(self._moved(tuple(x)))  # to left
                 return result
             # can change it to left
             else:
                 x = new_start_grid.copy()
                 to_left(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to left
+                result.append(self._moved(tuple(x)))  # to left
 
                 x = new_start_grid.copy()
                 to_right(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to right
+                result.append(self._moved(tuple(x)))  # to right
                 return result
             # can change it to left and right
         else:
             x = new_start_grid.copy()
             to_upper(x, row_number, index)
-            result.append(x)  # to upper
+            result.append(self._moved(tuple(x)))  # to upper
             x = new_start_grid.copy()
             to_below(x, row_number, index)
-            result.append(x)  # to below
+            result.append(self._moved(tuple(x)))  # to below
             if index == 0:
                 x = new_start_grid.copy()
                 to_right(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to right
+                result.append(self._moved(tuple(x)))  # to right
                 return result
             elif index == self.m-1:
                 x = new_start_grid.copy()
                 to_left(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to left
+                result.append(self._moved(tuple(x)))  # to left
                 return result
             else:
                 x = new_start_grid.copy()
                 to_left(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to left
+                result.append(self._moved(tuple(x)))  # to left
 
                 x = new_start_grid.copy()
                 to_right(x, row_number, index)
-                result.append(MNPuzzle(tuple(x), self.to_grid))  # to right
+                result.append(self._moved(tuple(x)))  # to right
                 return result
 
+    def legal_moves(self):
+        """
+        Return list of moves ((r, c), (r2, c2)), each swapping the blank
+        in row r, column c with the tile next to it in row r2, column c2.
+
+        @type self: MNPuzzle
+        @rtype: list[((int, int), (int, int))]
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> x = MNPuzzle(target_grid, target_grid)
+        >>> x.legal_moves()
+        [((1, 2), (0, 2)), ((1, 2), (1, 1))]
+        >>> x.apply(((1, 2), (1, 1)))
+        >>> print(x)
+        123
+        4*5
+        <BLANKLINE>
+        >>> x.undo(((1, 2), (1, 1)))
+        >>> x.is_solved()
+        True
+        """
+        for r, row in enumerate(self.from_grid):
+            if "*" in row:
+                c = row.index("*")
+                break
+        return [((r, c), (r + dr, c + dc))
+                for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                if 0 <= r + dr < self.n and 0 <= c + dc < self.m]
+
+    def apply(self, move):
+        """
+        Swap the blank with a tile next to it, for move ((r, c), (r2, c2)).
+
+        Only the one or two rows that change are rebuilt.
+
+        @type self: MNPuzzle
+        @type move: ((int, int), (int, int))
+        @rtype: None
+        """
+        (r, c), (r2, c2) = move
+        grid = list(self.from_grid)
+        if r == r2:
+            row = list(grid[r])
+            row[c], row[c2] = row[c2], row[c]
+            grid[r] = tuple(row)
+        else:
+            row, row2 = list(grid[r]), list(grid[r2])
+            row[c], row2[c2] = row2[c2], row[c]
+            grid[r], grid[r2] = tuple(row), tuple(row2)
+        self.from_grid = tuple(grid)
+
+    def undo(self, move):
+        """
+        Take back move, which swaps the same two cells again.
+
+        @type self: MNPuzzle
+        @type move: ((int, int), (int, int))
+        @rtype: None
+        """
+        self.apply(move)
+
+    def heuristic(self):
+        """
+        Return Manhattan distance plus linear conflict of MNPuzzle self.
+
+        Tiles that are in their goal row (column) but in reversed order
+        must step out of the row (column) and back, which costs two extra
+        moves each on top of the Manhattan distance.
+
+        @type self: MNPuzzle
+        @rtype: int
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> x = MNPuzzle((("2", "1", "3"), ("4", "5", "*")), target_grid)
+        >>> x.heuristic()
+        4
+        >>> y = MNPuzzle((("*", "2", "3"), ("1", "4", "5")), target_grid)
+        >>> y.heuristic()
+        3
+        """
+        goal = goal_positions(self.to_grid)
+        distance = 0
+        rows = [[] for _ in range(self.n)]
+        columns = [[] for _ in range(self.m)]
+        for r, row in enumerate(self.from_grid):
+            for c, symbol in enumerate(row):
+                if symbol == '*':
+                    continue
+                goal_r, goal_c = goal[symbol]
+                distance += abs(goal_r - r) + abs(goal_c - c)
+                if goal_r == r:
+                    rows[r].append(goal_c)
+                if goal_c == c:
+                    columns[c].append(goal_r)
+        # rows and columns were filled left to right and top to bottom
+        return distance + 2 * sum(_line_conflicts(line)
+                                  for line in rows + columns)
+
+    def goal_state(self):
+        """
+        Return the solved MNPuzzle self is working towards.
+
+        Every move can be undone, so reverse_extensions is extensions.
+
+        @type self: MNPuzzle
+        @rtype: MNPuzzle
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> MNPuzzle(start_grid, target_grid).goal_state().is_solved()
+        True
+        """
+        return MNPuzzle(self.to_grid, self.to_grid)
+
+    def goal_key(self):
+        """
+        Return the grid MNPuzzle self is working towards.
+
+        @type self: MNPuzzle
+        @rtype: tuple[tuple[str]]
+        """
+        return self.to_grid
+
     # override is_solved
     # a configuration is solved when from_grid is the same as to_grid
     def is_solved(self):
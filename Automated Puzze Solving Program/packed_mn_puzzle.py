@@ -0,0 +1,355 @@
+"""
+A compact MNPuzzle: the whole grid is one int with 4 bits per cell.
+"""
+from puzzle import Puzzle
+from mn_puzzle import MNPuzzle, solvable
+
+# layouts already made, keyed by to_grid
+_layouts = {}
+
+
+class PackedLayout:
+    """
+    Everything PackedMNPuzzles with the same to_grid share: symbol codes,
+    the packed goal, and the neighbours of every cell.
+
+    Symbols are coded 1, 2, ... in to_grid's row-major order, and the
+    blank "*" is coded 0, so cell i of a state is (state >> 4 * i) & 15.
+    """
+
+    def __init__(self, to_grid):
+        """
+        Create the PackedLayout self for to_grid.
+
+        @type self: PackedLayout
+        @type to_grid: tuple[tuple[str]]
+        @rtype: None
+        """
+        self.n, self.m = len(to_grid), len(to_grid[0])
+        cells = self.n * self.m
+        assert cells <= 16, "at most 16 cells fit in 4 bits each"
+        self.to_grid = to_grid
+        flat = [s for row in to_grid for s in row]
+        self.symbols = ["*"] + [s for s in flat if s != "*"]
+        self.codes = {s: i for i, s in enumerate(self.symbols)}
+        self.goal = self.pack(flat)
+        self.neighbours = []
+        for cell in range(cells):
+            r, c = divmod(cell, self.m)
+            self.neighbours.append(tuple(
+                (r + dr) * self.m + c + dc
+                for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                if 0 <= r + dr < self.n and 0 <= c + dc < self.m))
+        # Manhattan distance of each code from each cell
+        goal_cells = {self.codes[s]: i for i, s in enumerate(flat)}
+        self.distance = [[0] * cells for _ in self.symbols]
+        for code in range(1, len(self.symbols)):
+            goal_r, goal_c = divmod(goal_cells[code], self.m)
+            for cell in range(cells):
+                r, c = divmod(cell, self.m)
+                self.distance[code][cell] = (abs(goal_r - r) +
+                                             abs(goal_c - c))
+
+    def pack(self, flat):
+        """
+        Return the int with the code of flat[i] in bits 4i .. 4i+3.
+
+        @type self: PackedLayout
+        @type flat: list[str]
+        @rtype: int
+        """
+        state = 0
+        for i, s in enumerate(flat):
+            state |= self.codes[s] << (4 * i)
+        return state
+
+    def unpack(self, state):
+        """
+        Return the grid of symbols that state encodes.
+
+        @type self: PackedLayout
+        @type state: int
+        @rtype: tuple[tuple[str]]
+        """
+        return tuple(tuple(self.symbols[(state >> 4 * (r * self.m + c)) & 15]
+                           for c in range(self.m))
+                     for r in range(self.n))
+
+
+def layout_for(to_grid):
+    """
+    Return the PackedLayout for to_grid, making it only once.
+
+    @type to_grid: tuple[tuple[str]]
+    @rtype: PackedLayout
+    """
+    if to_grid not in _layouts:
+        _layouts[to_grid] = PackedLayout(to_grid)
+    return _layouts[to_grid]
+
+
+class PackedMNPuzzle(Puzzle):
+    """
+    An nxm puzzle with at most 16 cells, stored as a single int with the
+    position of the blank cached.
+    """
+
+    def __init__(self, state, blank, layout):
+        """
+        Create a PackedMNPuzzle self for the grid packed in state, whose
+        blank is cell blank.
+
+        @type self: PackedMNPuzzle
+        @type state: int
+        @type blank: int
+        @type layout: PackedLayout
+        @rtype: None
+        """
+        self.state, self.blank, self.layout = state, blank, layout
+        # whether fail_fast has already found the goal reachable
+        self._checked = False
+
+    @classmethod
+    def from_mn_puzzle(cls, puzzle):
+        """
+        Return the PackedMNPuzzle for MNPuzzle puzzle.
+
+        @type puzzle: MNPuzzle
+        @rtype: PackedMNPuzzle
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> x = MNPuzzle(start_grid, target_grid)
+        >>> p = PackedMNPuzzle.from_mn_puzzle(x)
+        >>> p.blank, hex(p.state)
+        (0, '0x541320')
+        """
+        layout = layout_for(puzzle.to_grid)
+        flat = [s for row in puzzle.from_grid for s in row]
+        return cls(layout.pack(flat), flat.index("*"), layout)
+
+    def to_mn_puzzle(self):
+        """
+        Return the MNPuzzle with the same grid as PackedMNPuzzle self.
+
+        @type self: PackedMNPuzzle
+        @rtype: MNPuzzle
+        """
+        return MNPuzzle(self.layout.unpack(self.state), self.layout.to_grid)
+
+    def __eq__(self, other):
+        """
+        Return whether PackedMNPuzzle self is equivalent to other.
+
+        @type self: PackedMNPuzzle
+        @type other: PackedMNPuzzle | Any
+        @rtype: bool
+        """
+        return (type(self) == type(other) and
+                self.state == other.state and
+                self.layout.to_grid == other.layout.to_grid)
+
+    def __hash__(self):
+        """
+        Return a hash of PackedMNPuzzle self, equal for equal puzzles.
+
+        @type self: PackedMNPuzzle
+        @rtype: int
+        """
+        return hash(self.state)
+
+    def __str__(self):
+        """
+        Return a human-readable string representation of PackedMNPuzzle self.
+
+        @type self: PackedMNPuzzle
+        @rtype: str
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> print(PackedMNPuzzle.from_mn_puzzle(MNPuzzle(start_grid,
+        ...                                              target_grid)))
+        *23
+        145
+        <BLANKLINE>
+        """
+        return str(self.to_mn_puzzle())
+
+    def state_key(self):
+        """
+        Return the packed grid of PackedMNPuzzle self.
+
+        @type self: PackedMNPuzzle
+        @rtype: int
+        """
+        return self.state
+
+    def from_state_key(self, key):
+        """
+        Return the PackedMNPuzzle with the same layout as self and the
+        packed grid key.
+
+        @type self: PackedMNPuzzle
+        @type key: int
+        @rtype: PackedMNPuzzle
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> x = PackedMNPuzzle.from_mn_puzzle(MNPuzzle(target_grid,
+        ...                                            target_grid))
+        >>> x.from_state_key(0x541320).blank
+        0
+        """
+        blank = 0
+        while (key >> 4 * blank) & 15:
+            blank += 1
+        return PackedMNPuzzle(key, blank, self.layout)
+
+    def extensions(self):
+        """
+        Return list of extensions of PackedMNPuzzle self.
+
+        Each one swaps the blank with one of the tiles next to it, which
+        is a shift and two additions on the packed int.
+
+        @type self: PackedMNPuzzle
+        @rtype: list[PackedMNPuzzle]
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> x = PackedMNPuzzle.from_mn_puzzle(MNPuzzle(target_grid,
+        ...                                            target_grid))
+        >>> sorted([str(e).replace("\\n", " ") for e in x.extensions()])
+        ['12* 453 ', '123 4*5 ']
+        """
+        state, blank, layout = self.state, self.blank, self.layout
+        result = []
+        for cell in layout.neighbours[blank]:
+            tile = (state >> 4 * cell) & 15
+            # the blank's bits are zero, so only the tile has to move
+            extension = PackedMNPuzzle(
+                state - (tile << 4 * cell) + (tile << 4 * blank),
+                cell, layout)
+            extension._checked = self._checked
+            result.append(extension)
+        return result
+
+    def legal_moves(self):
+        """
+        Return list of moves (blank, cell), each swapping the blank with
+        the tile in cell next to it, in the order of extensions.
+
+        @type self: PackedMNPuzzle
+        @rtype: list[(int, int)]
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> x = PackedMNPuzzle.from_mn_puzzle(MNPuzzle(target_grid,
+        ...                                            target_grid))
+        >>> x.legal_moves()
+        [(5, 2), (5, 4)]
+        >>> x.apply((5, 4))
+        >>> print(x)
+        123
+        4*5
+        <BLANKLINE>
+        >>> x.undo((5, 4))
+        >>> x.is_solved()
+        True
+        """
+        blank = self.blank
+        return [(blank, cell) for cell in self.layout.neighbours[blank]]
+
+    def apply(self, move):
+        """
+        Swap the blank, in the first cell of move, with the tile in the
+        second.
+
+        @type self: PackedMNPuzzle
+        @type move: (int, int)
+        @rtype: None
+        """
+        blank, cell = move
+        tile = (self.state >> 4 * cell) & 15
+        self.state += (tile << 4 * blank) - (tile << 4 * cell)
+        self.blank = cell
+
+    def undo(self, move):
+        """
+        Take back move, by moving the blank back to where it was.
+
+        @type self: PackedMNPuzzle
+        @type move: (int, int)
+        @rtype: None
+        """
+        self.apply((move[1], move[0]))
+
+    def fail_fast(self):
+        """
+        Return True if the goal cannot be reached from PackedMNPuzzle
+        self, as solvable decides.
+
+        @type self: PackedMNPuzzle
+        @rtype: bool
+        """
+        if not self._checked:
+            self._checked = solvable(self.layout.unpack(self.state),
+                                     self.layout.to_grid)
+        return not self._checked
+
+    def goal_state(self):
+        """
+        Return the solved PackedMNPuzzle self is working towards.
+
+        @type self: PackedMNPuzzle
+        @rtype: PackedMNPuzzle
+        """
+        layout = self.layout
+        flat = [s for row in layout.to_grid for s in row]
+        return PackedMNPuzzle(layout.goal, flat.index("*"), layout)
+
+    def goal_key(self):
+        """
+        Return the packed grid PackedMNPuzzle self is working towards.
+
+        @type self: PackedMNPuzzle
+        @rtype: int
+        """
+        return self.layout.goal
+
+    def is_solved(self):
+        """
+        Return whether PackedMNPuzzle self is solved.
+
+        @type self: PackedMNPuzzle
+        @rtype: bool
+        """
+        return self.state == self.layout.goal
+
+    def heuristic(self):
+        """
+        Return the Manhattan distance of PackedMNPuzzle self.
+
+        @type self: PackedMNPuzzle
+        @rtype: int
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> PackedMNPuzzle.from_mn_puzzle(MNPuzzle(start_grid,
+        ...                                        target_grid)).heuristic()
+        3
+        """
+        state, distance = self.state, self.layout.distance
+        total = 0
+        for cell in range(self.layout.n * self.layout.m):
+            total += distance[state & 15][cell]
+            state >>= 4
+        return total
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    from puzzle_tools import breadth_first_solve
+    from time import time
+    target_grid = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+    start_grid = (("8", "6", "7"), ("2", "5", "4"), ("3", "*", "1"))
+    for puzzle in [MNPuzzle(start_grid, target_grid),
+                   PackedMNPuzzle.from_mn_puzzle(MNPuzzle(start_grid,
+                                                          target_grid))]:
+        start = time()
+        solution = breadth_first_solve(puzzle)
+        end = time()
+        print("{} BFS took {} seconds".format(type(puzzle).__name__,
+                                              end - start))
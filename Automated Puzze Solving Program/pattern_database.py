@@ -0,0 +1,356 @@
+"""
+Additive pattern databases for MNPuzzle, built once and memory-mapped.
+
+A pattern is a group of tile symbols.  Its table stores, for every way of
+placing those tiles on the grid, how many moves of those tiles are needed
+to bring them home, whatever the other tiles do.  Tables of disjoint
+patterns can be added together and still never overestimate, which makes
+them a much stronger heuristic than Manhattan distance.
+
+Build from the command line, e.g. for the 15-puzzle:
+
+    python pattern_database.py 123456789abcdef* --rows 4 -o 15.pdb
+
+and load with PatternDatabase.load("15.pdb") in every solver process.
+"""
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections import deque
+
+MAGIC = b"MNPDB1\n"
+# byte for a placement that was never reached
+UNKNOWN = 255
+
+# databases unpickled in this process, keyed by absolute path
+_databases = {}
+
+
+def placements(cells, k):
+    """
+    Return the number of ways to put k distinct tiles on cells cells.
+
+    @type cells: int
+    @type k: int
+    @rtype: int
+    >>> placements(6, 2)
+    30
+    """
+    result = 1
+    for i in range(k):
+        result *= cells - i
+    return result
+
+
+def rank(positions, cells):
+    """
+    Return the index of positions among all placements of len(positions)
+    distinct tiles on cells cells.
+
+    @type positions: tuple[int] | list[int]
+    @type cells: int
+    @rtype: int
+    >>> rank((0, 1), 6), rank((5, 4), 6)
+    (0, 29)
+    """
+    result, used = 0, 0
+    for i, p in enumerate(positions):
+        # cells before p that are still free
+        smaller = p - bin(used & ((1 << p) - 1)).count("1")
+        result = result * (cells - i) + smaller
+        used |= 1 << p
+    return result
+
+
+def unrank(index, k, cells):
+    """
+    Return the placement of k distinct tiles on cells cells whose rank
+    is index.
+
+    @type index: int
+    @type k: int
+    @type cells: int
+    @rtype: tuple[int]
+    >>> unrank(29, 2, 6)
+    (5, 4)
+    >>> all(rank(unrank(i, 3, 5), 5) == i for i in range(placements(5, 3)))
+    True
+    """
+    digits = []
+    for i in reversed(range(k)):
+        index, digit = divmod(index, cells - i)
+        digits.append(digit)
+    free, result = list(range(cells)), []
+    for digit in reversed(digits):
+        result.append(free.pop(digit))
+    return tuple(result)
+
+
+def default_patterns(to_grid, size=5):
+    """
+    Return the tiles of to_grid split into disjoint patterns of at most
+    size tiles, in row-major order.
+
+    @type to_grid: tuple[tuple[str]]
+    @type size: int
+    @rtype: list[tuple[str]]
+    >>> default_patterns((("1", "2", "3"), ("4", "5", "*")), 3)
+    [('1', '2', '3'), ('4', '5')]
+    """
+    tiles = [s for row in to_grid for s in row if s != "*"]
+    return [tuple(tiles[i:i + size]) for i in range(0, len(tiles), size)]
+
+
+def _neighbours(n, m):
+    """
+    Return, for each cell of an nxm grid, the cells next to it.
+
+    @type n: int
+    @type m: int
+    @rtype: list[list[int]]
+    """
+    result = []
+    for cell in range(n * m):
+        r, c = divmod(cell, m)
+        result.append([(r + dr) * m + c + dc
+                       for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                       if 0 <= r + dr < n and 0 <= c + dc < m])
+    return result
+
+
+def build_table(to_grid, pattern):
+    """
+    Return the table of pattern for to_grid, found by a breadth-first
+    search backwards from to_grid.
+
+    Each entry is the fewest moves of pattern tiles needed to bring them
+    home from that placement.  Moving any other tile is free.
+
+    @type to_grid: tuple[tuple[str]]
+    @type pattern: tuple[str]
+    @rtype: array
+    >>> table = build_table((("1", "2", "3"), ("4", "5", "*")), ("1",))
+    >>> list(table)
+    [0, 1, 2, 1, 2, 3]
+    """
+    n, m = len(to_grid), len(to_grid[0])
+    cells, k = n * m, len(pattern)
+    flat = [s for row in to_grid for s in row]
+    neighbours = _neighbours(n, m)
+    table = array("B", [UNKNOWN]) * placements(cells, k)
+    # states are pattern positions followed by the blank position
+    distance = bytearray([UNKNOWN]) * placements(cells, k + 1)
+    start = tuple(flat.index(s) for s in pattern) + (flat.index("*"),)
+    distance[rank(start, cells)] = 0
+    # 0-1 breadth-first search: free moves go in front, others behind
+    queue = deque([(start, 0)])
+    while queue:
+        state, d = queue.popleft()
+        if d > distance[rank(state, cells)]:
+            continue
+        place = rank(state[:k], cells)
+        if d < table[place]:
+            table[place] = d
+        blank = state[k]
+        for cell in neighbours[blank]:
+            if cell in state:
+                # a pattern tile slides into the blank
+                i = state.index(cell)
+                new = state[:i] + (blank,) + state[i + 1:k] + (cell,)
+                cost = 1
+            else:
+                new = state[:k] + (cell,)
+                cost = 0
+            r = rank(new, cells)
+            if d + cost < distance[r]:
+                distance[r] = d + cost
+                if cost:
+                    queue.append((new, d + cost))
+                else:
+                    queue.appendleft((new, d))
+    return table
+
+
+class PatternDatabase:
+    """
+    Additive disjoint pattern databases for one MNPuzzle goal.
+    """
+
+    def __init__(self, to_grid, patterns, tables, path=None):
+        """
+        Create a PatternDatabase self with one table per pattern, mapped
+        from the file path if it was loaded.
+
+        @type self: PatternDatabase
+        @type to_grid: tuple[tuple[str]]
+        @type patterns: list[tuple[str]]
+        @type tables: list[array | memoryview]
+        @type path: str | None
+        @rtype: None
+        """
+        tiles = [s for pattern in patterns for s in pattern]
+        assert len(tiles) == len(set(tiles))
+        assert "*" not in tiles
+        self.to_grid, self.patterns, self.tables = to_grid, patterns, tables
+        self.path = path
+        self._cells = len(to_grid) * len(to_grid[0])
+
+    @classmethod
+    def build(cls, to_grid, patterns=None):
+        """
+        Return a PatternDatabase for to_grid with a table for each of
+        patterns, which default to default_patterns(to_grid).
+
+        @type to_grid: tuple[tuple[str]]
+        @type patterns: list[tuple[str]] | None
+        @rtype: PatternDatabase
+        """
+        if patterns is None:
+            patterns = default_patterns(to_grid)
+        patterns = [tuple(p) for p in patterns]
+        return cls(to_grid, patterns,
+                   [build_table(to_grid, p) for p in patterns])
+
+    def save(self, path):
+        """
+        Write PatternDatabase self to the file at path.
+
+        @type self: PatternDatabase
+        @type path: str
+        @rtype: None
+        """
+        header = json.dumps({"to_grid": self.to_grid,
+                             "patterns": self.patterns,
+                             "sizes": [len(t) for t in self.tables]})
+        header = header.encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for table in self.tables:
+                f.write(bytes(table))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Return the PatternDatabase saved at path.
+
+        The tables are memory-mapped read-only, so processes loading the
+        same file share its pages instead of each holding a copy.  A
+        loaded PatternDatabase is pickled as its path, so a worker
+        process that unpickles it maps the file too.
+
+        @type path: str
+        @rtype: PatternDatabase
+        """
+        path = os.path.abspath(path)
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        assert data[:len(MAGIC)] == MAGIC, "not a pattern database"
+        offset = len(MAGIC) + 8
+        (length,) = struct.unpack_from("<Q", data, len(MAGIC))
+        header = json.loads(data[offset:offset + length].decode("utf-8"))
+        offset += length
+        view, tables = memoryview(data), []
+        for size in header["sizes"]:
+            tables.append(view[offset:offset + size])
+            offset += size
+        return cls(tuple(tuple(row) for row in header["to_grid"]),
+                   [tuple(p) for p in header["patterns"]], tables, path)
+
+    def __getstate__(self):
+        """
+        Return what pickling PatternDatabase self keeps: only its path if
+        it was loaded, since its tables are then views of the mapped file.
+
+        @type self: PatternDatabase
+        @rtype: (str | None, dict | None)
+        """
+        if self.path is not None:
+            return self.path, None
+        return None, dict(self.__dict__)
+
+    def __setstate__(self, state):
+        """
+        Make PatternDatabase self again from the state __getstate__
+        returned, mapping each file only once per process.
+
+        @type self: PatternDatabase
+        @type state: (str | None, dict | None)
+        @rtype: None
+
+        >>> import os, tempfile
+        >>> from mn_puzzle import MNPuzzle
+        >>> from puzzle_tools import parallel_ida_star_solve
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("4", "1", "2"), ("5", "*", "3"))
+        >>> with tempfile.TemporaryDirectory() as tmp:
+        ...     path = os.path.join(tmp, "6.pdb")
+        ...     PatternDatabase.build(target_grid, [("1", "2", "3"),
+        ...                                         ("4", "5")]).save(path)
+        ...     pdb = PatternDatabase.load(path)
+        ...     solution = parallel_ida_star_solve(
+        ...         MNPuzzle(start_grid, target_grid), pdb, 1, 2)
+        >>> len(list(solution.iter_path()))
+        6
+        """
+        path, attributes = state
+        if path is None:
+            self.__dict__.update(attributes)
+            return
+        if path not in _databases:
+            _databases[path] = PatternDatabase.load(path)
+        self.__dict__.update(_databases[path].__dict__)
+
+    def heuristic(self, puzzle):
+        """
+        Return the sum of the table entries of puzzle's placement of each
+        pattern.
+
+        @type self: PatternDatabase
+        @type puzzle: MNPuzzle
+        @rtype: int
+        >>> from mn_puzzle import MNPuzzle
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> pdb = PatternDatabase.build(target_grid, [("1", "2", "3"),
+        ...                                           ("4", "5")])
+        >>> pdb.heuristic(MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+        ...                        target_grid))
+        3
+        """
+        assert puzzle.to_grid == self.to_grid
+        where = {s: i for i, s in enumerate(
+            s for row in puzzle.from_grid for s in row)}
+        cells = self._cells
+        return sum(table[rank([where[s] for s in pattern], cells)]
+                   for pattern, table in zip(self.patterns, self.tables))
+
+    __call__ = heuristic
+
+
+if __name__ == "__main__":
+    import argparse
+    from time import time
+    parser = argparse.ArgumentParser(
+        description="Build an MNPuzzle pattern database file.")
+    parser.add_argument("goal", help="goal symbols in row-major order, "
+                                     "one character each, '*' for blank")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--pattern", action="append",
+                        help="symbols of one pattern, e.g. 1235; "
+                             "repeat for each pattern")
+    parser.add_argument("--size", type=int, default=5,
+                        help="pattern size when --pattern is not given")
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+    width = len(args.goal) // args.rows
+    goal = tuple(tuple(args.goal[r * width:(r + 1) * width])
+                 for r in range(args.rows))
+    chosen = ([tuple(p) for p in args.pattern] if args.pattern
+              else default_patterns(goal, args.size))
+    start = time()
+    PatternDatabase.build(goal, chosen).save(args.output)
+    print("built {} patterns in {} seconds".format(len(chosen),
+                                                   time() - start))
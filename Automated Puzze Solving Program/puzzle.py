@@ -39,3 +39,153 @@ class Puzzle:
         @rtype: list[Puzzle]
         """
         raise NotImplementedError
+
+    def iter_extensions(self):
+        """
+        Return an iterator over the legal extensions of Puzzle self.
+
+        Override this in a subclass with a generator that builds each
+        extension only when it is asked for, so a search that stops early
+        never builds the rest.  extensions should then return
+        list(self.iter_extensions()).
+
+        @type self: Puzzle
+        @rtype: Iterator[Puzzle]
+        """
+        return iter(self.extensions())
+
+    def legal_moves(self):
+        """
+        Return list of the moves that can be applied to Puzzle self.
+
+        Moves are an optional alternative to extensions, for searches
+        that change one puzzle in place instead of building a new one at
+        every step: apply(move) gives the puzzle of an extension, and
+        undo(move) turns it back.  A move is any value the subclass
+        chooses.  Only change puzzles no other puzzle shares data with,
+        such as a copy.copy of one.
+
+        @type self: Puzzle
+        @rtype: list[object]
+        """
+        raise NotImplementedError
+
+    def apply(self, move):
+        """
+        Make move, one of legal_moves(), on Puzzle self.
+
+        @type self: Puzzle
+        @type move: object
+        @rtype: None
+        """
+        raise NotImplementedError
+
+    def undo(self, move):
+        """
+        Take back move, the last move applied to Puzzle self.
+
+        @type self: Puzzle
+        @type move: object
+        @rtype: None
+        """
+        raise NotImplementedError
+
+    def goal_state(self):
+        """
+        Return the solved puzzle that Puzzle self is working towards.
+
+        This is only possible for puzzles with a single solution, and
+        must be implemented in a subclass for bidirectional_solve.
+
+        @type self: Puzzle
+        @rtype: Puzzle
+        """
+        raise NotImplementedError
+
+    def goal_key(self):
+        """
+        Return a key for what Puzzle self is working towards, which tells
+        apart puzzles in the same state with different goals.
+
+        Override this in a subclass whose goal is not fixed by its kind.
+
+        @type self: Puzzle
+        @rtype: object
+        """
+        return None
+
+    def reverse_extensions(self):
+        """
+        Return list of the puzzles that have Puzzle self as an extension.
+
+        By default these are the extensions of self, which is right for
+        puzzles whose every move can be undone.
+
+        @type self: Puzzle
+        @rtype: list[Puzzle]
+        """
+        return self.extensions()
+
+    def heuristic(self):
+        """
+        Return an estimate of the number of extensions needed to get
+        from Puzzle self to a solution.
+
+        Override this in a subclass with an estimate that never exceeds
+        the real number, so astar_solve and ida_star_solve stay optimal.
+
+        @type self: Puzzle
+        @rtype: int
+        """
+        return 0
+
+    def state_key(self):
+        """
+        Return a hashable key identifying the configuration of Puzzle self.
+
+        Two puzzles met during the same search must have equal keys
+        exactly when they are equal. Override this in a subclass with a
+        more compact encoding.
+
+        @type self: Puzzle
+        @rtype: object
+        """
+        return str(self)
+
+    def from_state_key(self, key):
+        """
+        Return the puzzle of the same kind as Puzzle self whose state_key
+        is key, for searches that store only keys.
+
+        Override this in a subclass whose keys hold the whole state.
+
+        @type self: Puzzle
+        @type key: object
+        @rtype: Puzzle
+        """
+        raise NotImplementedError
+
+    def canonical_key(self):
+        """
+        Return the same key for every puzzle that is a rotation or
+        reflection of Puzzle self, and is therefore just as far from a
+        solution.
+
+        Override this in a subclass whose puzzles have such symmetries.
+
+        @type self: Puzzle
+        @rtype: object
+        """
+        return self.state_key()
+
+    def __hash__(self):
+        """
+        Return a hash of Puzzle self derived from its state_key.
+
+        Subclasses that override __eq__ must also define __hash__, since
+        Python otherwise makes them unhashable.
+
+        @type self: Puzzle
+        @rtype: int
+        """
+        return hash(self.state_key())
@@ -2,14 +2,13 @@
 Some functions for working with puzzles
 """
 from puzzle import Puzzle
-from collections import deque
-# set higher recursion limit
-# which is needed in PuzzleNode.__str__
-# uncomment the next two lines on a unix platform, say CDF
-# import resource
-# resource.setrlimit(resource.RLIMIT_STACK, (2**29, -1))
-import sys
-sys.setrecursionlimit(10**6)
+from collections import deque, OrderedDict
+from heapq import heappush, heappop
+from itertools import count
+from copy import copy
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import json
+import multiprocessing
 
 # implement depth_first_solve
 # do NOT change the type contract
@@ -17,27 +16,46 @@ sys.setrecursionlimit(10**6)
 # you like
 
 
-def depth_first_solve(puzzle):
+def depth_first_solve(puzzle, canonical=None, table=None, stats=None):
     """
     Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
     a solution, with each child containing an extension of the puzzle
     in its parent.  Return None if this is not possible.
 
+    Puzzles with the same canonical(puzzle) are only searched once;
+    canonical defaults to state_key, and canonical_key also merges
+    rotations and reflections.  Pass a bounded TranspositionTable as
+    table to cap the memory used to remember them, at the cost of
+    searching again below puzzles it forgets or reaches more shallowly,
+    and a SearchStats as stats to record what the search did.
+
     @type puzzle: Puzzle
+    @type canonical: (Puzzle) -> object | None
+    @type table: TranspositionTable | None
+    @type stats: SearchStats | None
     @rtype: PuzzleNode
-    """
 
+    >>> from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+    >>> grid = [["*", "*", "*", "*"], ["*", "*", ".", "*"]]
+    >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+    >>> path = depth_first_solve(gpsp, canonical_key,
+    ...                          TranspositionTable(100, "depth"))
+    >>> path is None
+    True
+    """
+    if stats is not None:
+        puzzle = stats.start(puzzle)
     root_node = PuzzleNode(puzzle)
     # first node in loop
     if root_node.puzzle.is_solved():
-        return root_node
+        return _finish(stats, root_node)
     # if this is solved, then return this one
     elif root_node.puzzle.fail_fast():
-        return None
+        return _finish(stats, None)
     # if fail fast, means can't do it and return None
     else:
-        unused = [root_node]
-        return find_path(dfs([], unused))
+        return _finish(stats, find_path(dfs(root_node, canonical, table,
+                                            stats=stats)))
         # else use DFS to find a solution and return path
 
 
@@ -50,26 +68,33 @@ def depth_first_solve(puzzle):
 # we imported deque
 
 
-def breadth_first_solve(puzzle):
+def breadth_first_solve(puzzle, canonical=None, stats=None):
     """
     Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
     a solution, with each child PuzzleNode containing an extension
     of the puzzle in its parent.  Return None if this is not possible.
 
+    Puzzles with the same canonical(puzzle) are only queued once, when
+    first reached; canonical defaults to state_key.  stats is as for
+    depth_first_solve.
+
     @type puzzle: Puzzle
+    @type canonical: (Puzzle) -> object | None
+    @type stats: SearchStats | None
     @rtype: PuzzleNode
     """
+    if stats is not None:
+        puzzle = stats.start(puzzle)
     root_node = PuzzleNode(puzzle)
     # first node in loop
     if root_node.puzzle.is_solved():
-        return root_node
+        return _finish(stats, root_node)
     # if this is solved, then return this one
     elif root_node.puzzle.fail_fast():
-        return None
+        return _finish(stats, None)
     # if fail fast, means can't do it and return None
     else:
-        unused = [root_node]
-        return find_path(bfs([], unused))
+        return _finish(stats, find_path(bfs(root_node, canonical, stats)))
         # else use BFS to find a solution and return path
 
 
@@ -77,10 +102,13 @@ def find_path(node):
     """
     find the first node from child node
 
-    @type node: PuzzleNode
-    @rtype: PuzzleNode
+    @type node: PuzzleNode | None
+    @rtype: PuzzleNode | None
 
     """
+    if node is None:
+        return None
+    # no solution was found, so there is no path
     current = node
     # set node as current node
     while current.parent is not None and current.puzzle is not None:
@@ -91,67 +119,1159 @@ def find_path(node):
     return current
 
 
-def bfs(used_list, unused_list):
+# how many extensions dfs and _bounded_dfs try between calls to stop()
+STOP_CHECK_INTERVAL = 1024
+
+
+def _finish(stats, result):
+    """
+    Return result, after letting stats finish with it if stats is given.
+
+    @type stats: SearchStats | None
+    @type result: PuzzleNode | list[object] | None
+    @rtype: PuzzleNode | list[object] | None
+    """
+    if stats is None:
+        return result
+    return stats.finish(result)
+
+
+def state_key(puzzle):
+    """
+    Return puzzle's state_key, the default key solvers remember puzzles by.
+
+    @type puzzle: Puzzle
+    @rtype: object
+    """
+    return puzzle.state_key()
+
+
+def canonical_key(puzzle):
+    """
+    Return puzzle's canonical_key, so that solvers given it as canonical
+    search only one of each group of symmetric puzzles.
+
+    @type puzzle: Puzzle
+    @rtype: object
+    """
+    return puzzle.canonical_key()
+
+
+def bfs(root, canonical=None, stats=None):
+    """
+    using BFS to find a solution PuzzleNode below root
+
+    Frontier is a deque of PuzzleNodes, and every puzzle that has ever been
+    queued is remembered by its canonical key, so each state is expanded
+    once.
+
+    @type root: PuzzleNode
+    @type canonical: (Puzzle) -> object | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode | None
+    """
+    key_of = canonical or state_key
+    seen = {key_of(root.puzzle)}
+    frontier = deque([root])
+    while frontier:
+        node = frontier.popleft()
+        # oldest node first, so shallower nodes are tested first. This is BFS
+        if node.puzzle.is_solved():
+            return node
+        if node.puzzle.fail_fast():
+            continue
+        if stats is not None:
+            stats.expand(len(frontier), len(seen))
+        for extension in node.puzzle.iter_extensions():
+            key = key_of(extension)
+            if stats is not None:
+                stats.generated += 1
+                stats.duplicates += key in seen
+            if key not in seen:
+                # only queue extensions that were never queued before
+                seen.add(key)
+                frontier.append(PuzzleNode(extension, parent=node))
+    return None
+
+
+def dfs(root, canonical=None, table=None, stop=None, stats=None):
+    """
+    using DFS to find a solution PuzzleNode below root
+
+    The stack holds each node of the current path with an iterator over
+    its extensions still to try, so an extension is only built when the
+    search gets to it.  Every puzzle reached is entered in table by its
+    canonical key and depth, and puzzles on the current path are never
+    re-entered, so the search stops even if table forgets entries.
+    If stop is given, the search gives up once stop() returns True; it
+    is asked every STOP_CHECK_INTERVAL extensions.
+
+    @type root: PuzzleNode
+    @type canonical: (Puzzle) -> object | None
+    @type table: TranspositionTable | None
+    @type stop: () -> bool | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode | None
+    """
+    key_of = canonical or state_key
+    if table is None:
+        table = TranspositionTable()
+    root_key = key_of(root.puzzle)
+    table.enter(root_key, 0)
+    on_path = {root_key}
+    stack = [(root, root_key, root.puzzle.iter_extensions())]
+    if stats is not None:
+        stats.expand(len(stack), len(table))
+    checks = count(1)
+    while stack:
+        node, node_key, extensions = stack[-1]
+        extension = next(extensions, None)
+        if extension is None:
+            # every extension is done, so go back up. This is DFS
+            stack.pop()
+            on_path.discard(node_key)
+            continue
+        if (stop is not None and
+                next(checks) % STOP_CHECK_INTERVAL == 0 and stop()):
+            return None
+        key = key_of(extension)
+        if stats is not None:
+            stats.generated += 1
+        if key in on_path or not table.enter(key, len(stack)):
+            # skip extensions whose subtree was already searched
+            if stats is not None:
+                stats.duplicates += 1
+            continue
+        child = PuzzleNode(extension, parent=node)
+        if extension.is_solved():
+            return child
+        if extension.fail_fast():
+            continue
+        on_path.add(key)
+        stack.append((child, key, extension.iter_extensions()))
+        if stats is not None:
+            stats.expand(len(stack), len(table))
+    return None
+
+
+class TranspositionTable:
+    """
+    Remembers the shallowest depth at which a search reached each key,
+    so it can skip puzzles it has already searched at least as deeply.
+
+    Without a capacity every key is kept.  With one, the table keeps at
+    most capacity keys and replaces entries using policy:
+    "lru" forgets the least recently reached key, and "depth" gives each
+    key one slot by hash and keeps whichever of two colliding keys was
+    reached more shallowly, since its subtree is bigger.
+    """
+
+    def __init__(self, capacity=None, policy="lru"):
+        """
+        Create an empty TranspositionTable self.
+
+        @type self: TranspositionTable
+        @type capacity: int | None
+        @type policy: str
+        @rtype: None
+        """
+        assert policy in ("lru", "depth")
+        assert capacity is None or capacity > 0
+        self.capacity, self.policy = capacity, policy
+        self.clear()
+
+    def clear(self):
+        """
+        Forget every key in TranspositionTable self.
+
+        @type self: TranspositionTable
+        @rtype: None
+        """
+        if self.capacity is not None and self.policy == "depth":
+            self._slots = [None] * self.capacity
+            self._filled = 0
+        else:
+            self._depths = OrderedDict()
+
+    def __len__(self):
+        """
+        Return the number of keys TranspositionTable self remembers.
+
+        @type self: TranspositionTable
+        @rtype: int
+        """
+        if self.capacity is not None and self.policy == "depth":
+            return self._filled
+        return len(self._depths)
+
+    def visit(self, key, depth):
+        """
+        Record that key was reached at depth, and return False iff it was
+        already known to have been reached at depth or shallower.
+
+        @type self: TranspositionTable
+        @type key: object
+        @type depth: int
+        @rtype: bool
+
+        >>> table = TranspositionTable(2)
+        >>> table.visit("a", 3), table.visit("a", 4), table.visit("a", 1)
+        (True, False, True)
+        >>> table.visit("b", 0), table.visit("c", 0), table.visit("a", 5)
+        (True, True, True)
+        """
+        if self.capacity is not None and self.policy == "depth":
+            i = hash(key) % self.capacity
+            slot = self._slots[i]
+            if slot is not None and slot[0] == key and slot[1] <= depth:
+                return False
+            if slot is None:
+                self._filled += 1
+            if slot is None or slot[0] == key or depth <= slot[1]:
+                self._slots[i] = (key, depth)
+            return True
+        depths = self._depths
+        if key in depths and depths[key] <= depth:
+            if self.capacity is not None:
+                depths.move_to_end(key)
+            return False
+        depths[key] = depth
+        if self.capacity is not None:
+            depths.move_to_end(key)
+            if len(depths) > self.capacity:
+                depths.popitem(last=False)
+        return True
+
+    def enter(self, key, depth):
+        """
+        Record that a depth-first search reached key at depth, and
+        return whether it should search below key.
+
+        A table without a capacity forgets nothing, so a key it holds
+        has had its whole subtree searched already and is never entered
+        again.  A bounded table may have forgotten that, so it enters
+        keys as visit allows.
+
+        @type self: TranspositionTable
+        @type key: object
+        @type depth: int
+        @rtype: bool
+
+        >>> table = TranspositionTable()
+        >>> table.enter("a", 3), table.enter("a", 1)
+        (True, False)
+        >>> table = TranspositionTable(2)
+        >>> table.enter("a", 3), table.enter("a", 1)
+        (True, True)
+        """
+        if self.capacity is None:
+            if key in self._depths:
+                return False
+            self._depths[key] = depth
+            return True
+        return self.visit(key, depth)
+
+
+def bidirectional_solve(puzzle, stats=None):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing puzzle.goal_state(), searching breadth-first from both
+    ends until they meet.  Return None if this is not possible.
+
+    The search always grows whichever side has the smaller frontier, by a
+    whole layer.  puzzle must implement goal_state, and reverse_extensions
+    if its moves cannot all be undone.  stats is as for depth_first_solve.
+
+    @type puzzle: Puzzle
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> ws = {"cat", "cot", "cog", "dog", "cut", "dot"}
+    >>> path = bidirectional_solve(WordLadderPuzzle("cat", "dog", ws))
+    >>> [str(node.puzzle) for node in path.iter_path()][::3]
+    ['cat', 'dog']
+    """
+    if stats is not None:
+        puzzle = stats.start(puzzle)
+    root_node = PuzzleNode(puzzle)
+    if puzzle.is_solved():
+        return _finish(stats, root_node)
+    elif puzzle.fail_fast():
+        return _finish(stats, None)
+    goal_node = PuzzleNode(puzzle.goal_state())
+    # node and depth of each state reached from either end
+    forward = {puzzle.state_key(): (root_node, 0)}
+    backward = {goal_node.puzzle.state_key(): (goal_node, 0)}
+    forward_layer, backward_layer = [root_node], [goal_node]
+    depths = [0, 0]
+    while forward_layer and backward_layer:
+        if len(forward_layer) <= len(backward_layer):
+            depths[0] += 1
+            forward_layer, meeting = _grow_layer(
+                forward_layer, depths[0], forward, backward, False, stats)
+        else:
+            depths[1] += 1
+            backward_layer, meeting = _grow_layer(
+                backward_layer, depths[1], backward, forward, True, stats)
+        if meeting is not None:
+            return _finish(stats, _join(forward[meeting][0],
+                                        backward[meeting][0]))
+    return _finish(stats, None)
+
+
+def _grow_layer(layer, depth, reached, other, reverse, stats=None):
+    """
+    Return the next layer after layer, recording its nodes at depth in
+    reached, and the key of the best state also in other (None if no
+    state is), meaning the one closest to other's root.  Layers grow by
+    reverse_extensions if reverse is True, and by extensions otherwise.
+
+    @type layer: list[PuzzleNode]
+    @type depth: int
+    @type reached: dict[object, (PuzzleNode, int)]
+    @type other: dict[object, (PuzzleNode, int)]
+    @type reverse: bool
+    @type stats: SearchStats | None
+    @rtype: (list[PuzzleNode], object | None)
+    """
+    next_layer, meeting = [], None
+    for node in layer:
+        if stats is not None:
+            stats.expand(len(layer) + len(next_layer),
+                         len(reached) + len(other))
+        if reverse:
+            extensions = node.puzzle.reverse_extensions()
+        else:
+            extensions = node.puzzle.iter_extensions()
+        for extension in extensions:
+            key = extension.state_key()
+            if stats is not None:
+                stats.generated += 1
+            if key in reached:
+                if stats is not None:
+                    stats.duplicates += 1
+                continue
+            child = PuzzleNode(extension, parent=node)
+            reached[key] = (child, depth)
+            next_layer.append(child)
+            if key in other and (meeting is None or
+                                 other[key][1] < other[meeting][1]):
+                meeting = key
+    return next_layer, meeting
+
+
+def _join(forward_node, backward_node):
+    """
+    Return the path from the root above forward_node, through it, and on
+    through the parents of backward_node, which holds the same state.
+
+    @type forward_node: PuzzleNode
+    @type backward_node: PuzzleNode
+    @rtype: PuzzleNode
+    """
+    current, node = forward_node, backward_node.parent
+    while node is not None:
+        current = PuzzleNode(node.puzzle, parent=current)
+        node = node.parent
+    return find_path(current)
+
+
+def best_first_solve(puzzle, heuristic=None, canonical=None, stats=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, always extending the node whose puzzle looks closest to a
+    solution according to heuristic.  Return None if this is not possible.
+
+    The path is found quickly but is not guaranteed to be shortest.
+    heuristic defaults to Puzzle.heuristic, and canonical and stats are
+    as for depth_first_solve.
+
+    @type puzzle: Puzzle
+    @type heuristic: (Puzzle) -> int | None
+    @type canonical: (Puzzle) -> object | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> ws = {"cat", "cot", "cog", "dog", "cut"}
+    >>> path = best_first_solve(WordLadderPuzzle("cat", "dog", ws))
+    >>> path.children[0].children[0].children[0].puzzle.is_solved()
+    True
+    """
+    return _heap_solve(puzzle, heuristic, 0, canonical, stats)
+
+
+def astar_solve(puzzle, heuristic=None, canonical=None, stats=None):
     """
-    using BFS to find a solution PuzzleNode
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, using A* search with heuristic.  Return None
+    if this is not possible.
+
+    heuristic defaults to Puzzle.heuristic, and the path is shortest
+    as long as heuristic never overestimates.  canonical and stats are
+    as for depth_first_solve.
 
-    @type used_list:list
-    @type unused_list: list
+    @type puzzle: Puzzle
+    @type heuristic: (Puzzle) -> int | None
+    @type canonical: (Puzzle) -> object | None
+    @type stats: SearchStats | None
     @rtype: PuzzleNode
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> path = astar_solve(MNPuzzle(start_grid, target_grid))
+    >>> len(list(path.iter_path()))
+    4
+    """
+    return _heap_solve(puzzle, heuristic, 1, canonical, stats)
+
+
+def _heap_solve(puzzle, heuristic, cost_weight, canonical, stats=None):
+    """
+    Run best-first search from puzzle with a binary heap open list,
+    ordered by cost_weight * depth + heuristic.
+
+    @type puzzle: Puzzle
+    @type heuristic: (Puzzle) -> int | None
+    @type cost_weight: int
+    @type canonical: (Puzzle) -> object | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode | None
+    """
+    if heuristic is None:
+        heuristic = _puzzle_heuristic
+    key_of = canonical or state_key
+    if stats is not None:
+        puzzle = stats.start(puzzle)
+    root_node = PuzzleNode(puzzle)
+    if puzzle.is_solved():
+        return _finish(stats, root_node)
+    elif puzzle.fail_fast():
+        return _finish(stats, None)
+    # best depth found so far for every state that was ever queued
+    root_key = key_of(puzzle)
+    best = {root_key: 0}
+    # ties are broken towards deeper nodes, then oldest first
+    tie = count()
+    open_list = [(heuristic(puzzle), 0, next(tie), root_key, root_node)]
+    while open_list:
+        _, neg_depth, _, node_key, node = heappop(open_list)
+        depth = -neg_depth
+        if depth > best[node_key]:
+            # a shorter way to this state was queued after this one
+            continue
+        if node.puzzle.is_solved():
+            return _finish(stats, find_path(node))
+        if node.puzzle.fail_fast():
+            continue
+        if stats is not None:
+            stats.expand(len(open_list), len(best))
+        for extension in node.puzzle.iter_extensions():
+            key = key_of(extension)
+            if stats is not None:
+                stats.generated += 1
+            if key not in best or depth + 1 < best[key]:
+                best[key] = depth + 1
+                priority = cost_weight * (depth + 1) + heuristic(extension)
+                heappush(open_list,
+                         (priority, -(depth + 1), next(tie), key,
+                          PuzzleNode(extension, parent=node)))
+            elif stats is not None:
+                stats.duplicates += 1
+    return _finish(stats, None)
+
+
+def ida_star_solve(puzzle, heuristic=None, canonical=None, table=None,
+                   stats=None):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, using iterative deepening A*.  Return None if
+    this is not possible.
+
+    Only the current path is kept in memory, so this works on puzzles
+    whose state space is too big for astar_solve.  heuristic defaults to
+    Puzzle.heuristic.  If table is given, puzzles already reached as
+    shallowly in the same iteration are skipped, using canonical as for
+    depth_first_solve; table is emptied before every iteration.  stats
+    is as for depth_first_solve, and counts every iteration.
+
+    @type puzzle: Puzzle
+    @type heuristic: (Puzzle) -> int | None
+    @type canonical: (Puzzle) -> object | None
+    @type table: TranspositionTable | None
+    @type stats: SearchStats | None
+    @rtype: PuzzleNode
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> path = ida_star_solve(MNPuzzle(start_grid, target_grid))
+    >>> len(list(path.iter_path()))
+    4
+    """
+    if heuristic is None:
+        heuristic = _puzzle_heuristic
+    if stats is not None:
+        puzzle = stats.start(puzzle)
+    root_node = PuzzleNode(puzzle)
+    if puzzle.is_solved():
+        return _finish(stats, root_node)
+    elif puzzle.fail_fast():
+        return _finish(stats, None)
+    bound = heuristic(puzzle)
+    while bound is not None:
+        # search every path whose estimated length is within bound,
+        # and learn the smallest estimate that went past it
+        if table is not None:
+            table.clear()
+        solution, bound = _bounded_dfs(root_node, bound, heuristic,
+                                       canonical or state_key, table,
+                                       stats=stats)
+        if solution is not None:
+            return _finish(stats, find_path(solution))
+    return _finish(stats, None)
+
+
+def _bounded_dfs(root, bound, heuristic, key_of, table, depth=0,
+                 stop=None, stats=None):
+    """
+    Return a solution PuzzleNode below root whose depth plus heuristic
+    never exceeds bound along the way, together with the smallest such
+    sum that did exceed bound (None if nothing was cut off).  root is at
+    depth, and stop and stats are as for dfs.
+
+    States already on the current path are skipped, so the search cannot
+    loop.
+
+    @type root: PuzzleNode
+    @type bound: int
+    @type heuristic: (Puzzle) -> int
+    @type key_of: (Puzzle) -> object
+    @type table: TranspositionTable | None
+    @type depth: int
+    @type stop: () -> bool | None
+    @type stats: SearchStats | None
+    @rtype: (PuzzleNode | None, int | None)
+    """
+    next_bound = None
+    root_key = key_of(root.puzzle)
+    on_path = {root_key}
+    # each frame is a node on the current path and its unvisited extensions
+    stack = [(root, root_key, depth, root.puzzle.iter_extensions())]
+    if stats is not None:
+        stats.expand(len(stack), len(on_path))
+    checks = count(1)
+    while stack:
+        node, node_key, depth, extensions = stack[-1]
+        extension = next(extensions, None)
+        if extension is None:
+            # every extension is done, so leave this node
+            stack.pop()
+            on_path.discard(node_key)
+            continue
+        if (stop is not None and
+                next(checks) % STOP_CHECK_INTERVAL == 0 and stop()):
+            return None, None
+        key = key_of(extension)
+        if stats is not None:
+            stats.generated += 1
+        if key in on_path:
+            if stats is not None:
+                stats.duplicates += 1
+            continue
+        estimate = depth + 1 + heuristic(extension)
+        if estimate > bound:
+            if next_bound is None or estimate < next_bound:
+                next_bound = estimate
+            continue
+        if table is not None and not table.visit(key, depth + 1):
+            if stats is not None:
+                stats.duplicates += 1
+            continue
+        child = PuzzleNode(extension, parent=node)
+        if extension.is_solved():
+            return child, bound
+        if extension.fail_fast():
+            continue
+        on_path.add(key)
+        stack.append((child, key, depth + 1, extension.iter_extensions()))
+        if stats is not None:
+            stats.expand(len(stack), len(on_path) + len(table or ()))
+    return None, next_bound
+
+
+def inplace_depth_first_solve(puzzle, canonical=None, table=None,
+                              stats=None):
+    """
+    Return the list of moves of a path from puzzle to a solution, found
+    by the same search as depth_first_solve, or None if this is not
+    possible.
+
+    The search changes one copy of puzzle in place with apply and undo,
+    and remembers only the moves on the current path, so puzzle must
+    implement legal_moves, apply and undo.  path_from_moves turns the
+    result into the usual PuzzleNode path.  stats is as for
+    depth_first_solve.
+
+    @type puzzle: Puzzle
+    @type canonical: (Puzzle) -> object | None
+    @type table: TranspositionTable | None
+    @type stats: SearchStats | None
+    @rtype: list[object] | None
+
+    >>> from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+    >>> grid = [[".", "*", "*", "*"]]
+    >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+    >>> inplace_depth_first_solve(gpsp)
+    >>> grid = [["*", "*", ".", "*"]]
+    >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+    >>> inplace_depth_first_solve(gpsp)
+    [(0, 0, 0, 1), (0, 3, 0, -1)]
     """
-    if not unused_list:
+    board = copy(puzzle)
+    if stats is not None:
+        board = stats.start(board)
+    if board.is_solved():
+        return _finish(stats, [])
+    elif board.fail_fast():
+        return _finish(stats, None)
+    key_of = canonical or state_key
+    if table is None:
+        table = TranspositionTable()
+    root_key = key_of(board)
+    table.enter(root_key, 0)
+    # keys of the puzzles on the current path, and each one's moves
+    # still to try
+    path_keys, on_path, moves = [root_key], {root_key}, []
+    stack = [iter(board.legal_moves())]
+    if stats is not None:
+        stats.expand(len(stack), len(table))
+    while stack:
+        move = next(stack[-1], None)
+        if move is None:
+            # every move is done, so take back the one that led here
+            stack.pop()
+            on_path.discard(path_keys.pop())
+            if moves:
+                board.undo(moves.pop())
+            continue
+        board.apply(move)
+        key = key_of(board)
+        if stats is not None:
+            stats.generated += 1
+        if key in on_path or not table.enter(key, len(stack)):
+            if stats is not None:
+                stats.duplicates += 1
+            board.undo(move)
+            continue
+        if board.is_solved():
+            return _finish(stats, moves + [move])
+        if board.fail_fast():
+            board.undo(move)
+            continue
+        path_keys.append(key)
+        on_path.add(key)
+        moves.append(move)
+        stack.append(iter(board.legal_moves()))
+        if stats is not None:
+            stats.expand(len(stack), len(table))
+    return _finish(stats, None)
+
+
+def inplace_ida_star_solve(puzzle, heuristic=None, canonical=None,
+                           stats=None):
+    """
+    Return the list of moves of a shortest path from puzzle to a
+    solution, found by the same search as ida_star_solve, or None if
+    this is not possible.
+
+    Like inplace_depth_first_solve, this changes one copy of puzzle in
+    place and needs legal_moves, apply and undo.  stats is as for
+    depth_first_solve.
+
+    @type puzzle: Puzzle
+    @type heuristic: (Puzzle) -> int | None
+    @type canonical: (Puzzle) -> object | None
+    @type stats: SearchStats | None
+    @rtype: list[object] | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> inplace_ida_star_solve(MNPuzzle(start_grid, target_grid))
+    [((0, 0), (1, 0)), ((1, 0), (1, 1)), ((1, 1), (1, 2))]
+    """
+    if heuristic is None:
+        heuristic = _puzzle_heuristic
+    key_of = canonical or state_key
+    board = copy(puzzle)
+    if stats is not None:
+        board = stats.start(board)
+    if board.is_solved():
+        return _finish(stats, [])
+    elif board.fail_fast():
+        return _finish(stats, None)
+    bound = heuristic(board)
+    while bound is not None:
+        moves, bound = _inplace_bounded_dfs(board, bound, heuristic, key_of,
+                                            stats)
+        if moves is not None:
+            return _finish(stats, moves)
+    return _finish(stats, None)
+
+
+def _inplace_bounded_dfs(board, bound, heuristic, key_of, stats=None):
+    """
+    Return the moves of a path from board to a solution, as for
+    _bounded_dfs, together with the next bound.  board is left as it was
+    unless a solution is found.
+
+    @type board: Puzzle
+    @type bound: int
+    @type heuristic: (Puzzle) -> int
+    @type key_of: (Puzzle) -> object
+    @type stats: SearchStats | None
+    @rtype: (list[object] | None, int | None)
+    """
+    next_bound = None
+    path_keys, moves = [key_of(board)], []
+    on_path = set(path_keys)
+    stack = [iter(board.legal_moves())]
+    if stats is not None:
+        stats.expand(len(stack), len(on_path))
+    while stack:
+        move = next(stack[-1], None)
+        if move is None:
+            # every move is done, so leave this puzzle
+            stack.pop()
+            on_path.discard(path_keys.pop())
+            if moves:
+                board.undo(moves.pop())
+            continue
+        board.apply(move)
+        key = key_of(board)
+        if stats is not None:
+            stats.generated += 1
+        if key in on_path:
+            if stats is not None:
+                stats.duplicates += 1
+            board.undo(move)
+            continue
+        estimate = len(stack) + heuristic(board)
+        if estimate > bound:
+            if next_bound is None or estimate < next_bound:
+                next_bound = estimate
+            board.undo(move)
+            continue
+        if board.is_solved():
+            return moves + [move], bound
+        if board.fail_fast():
+            board.undo(move)
+            continue
+        path_keys.append(key)
+        on_path.add(key)
+        moves.append(move)
+        stack.append(iter(board.legal_moves()))
+        if stats is not None:
+            stats.expand(len(stack), len(on_path))
+    return None, next_bound
+
+
+def path_from_moves(puzzle, moves):
+    """
+    Return the path from PuzzleNode(puzzle) through the puzzles that
+    moves lead to, or None if moves is None.
+
+    @type puzzle: Puzzle
+    @type moves: list[object] | None
+    @rtype: PuzzleNode | None
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> w = WordLadderPuzzle("cat", "dog", {"cat", "cot", "dot", "dog"})
+    >>> path = path_from_moves(w, inplace_depth_first_solve(w))
+    >>> print(path.children[0].children[0].puzzle)
+    dot
+    """
+    if moves is None:
         return None
-    # if used_list is empty, then can't find a solution, return None
-    if unused_list[0].puzzle.is_solved():
-        return unused_list[0]
-    # if the bottom unused list is solution, then return it
+    node, board = PuzzleNode(puzzle), copy(puzzle)
+    for move in moves:
+        board.apply(move)
+        node = PuzzleNode(copy(board), parent=node)
+    return find_path(node)
+
+
+def moves_from_path(node):
+    """
+    Return the moves that lead along the path from node through each
+    first child below it, undoing path_from_moves.  Each move is found
+    by trying the legal_moves of the puzzle before it.
+
+    @type node: PuzzleNode
+    @rtype: list[object]
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> w = WordLadderPuzzle("cat", "dog", {"cat", "cot", "dot", "dog"})
+    >>> moves_from_path(breadth_first_solve(w))
+    [('cat', 'cot'), ('cot', 'dot'), ('dot', 'dog')]
+    """
+    return [move for _, move in _steps(node)][1:]
+
+
+def write_path(node, out, moves=True):
+    """
+    Write the path from node through each first child below it to the
+    text file out, one JSON line per puzzle, and return how many lines
+    were written.  Each line holds the step number and state_key of its
+    puzzle and, if moves is True, the move from the puzzle before as
+    found by moves_from_path (None for the first).
+
+    The path is written as it is walked, so long solutions never become
+    one string in memory.
+
+    @type node: PuzzleNode
+    @type out: TextIO
+    @type moves: bool
+    @rtype: int
+
+    >>> import sys
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> w = WordLadderPuzzle("cat", "cot", {"cat", "cot"})
+    >>> write_path(breadth_first_solve(w), sys.stdout)
+    {"step": 0, "state": "cat", "move": null}
+    {"step": 1, "state": "cot", "move": ["cat", "cot"]}
+    2
+    """
+    if moves:
+        steps = _steps(node)
     else:
-        for extension in unused_list[0].puzzle.extensions():
-            unused = True
-            for obj in unused_list:
-                if extension == obj.puzzle:
-                    unused = False
-            if extension not in used_list and unused:
-                # for all extensions, first find if they are used before, if not
-                # used, change it to a PuzzleNode and append it to unused_list
-                unused_list.append(PuzzleNode(extension, parent=unused_list[0]))
-    return bfs(used_list + [unused_list[0].puzzle], unused_list[1:])
-    # put bottom unused puzzle to used list and test the next bottom one.
-    # this method test PuzzleNode from the most bottom, so it will fnd all
-    # extensions first and then find extensions' extension. This is a BFS
-
-
-def dfs(used_list, unused_list):
-    """
-    @type used_list:list
-    @type unused_list: list
+        steps = ((n, None) for n in node.iter_path())
+    written = 0
+    for written, (step, move) in enumerate(steps, 1):
+        line = {"step": written - 1, "state": state_key(step.puzzle)}
+        if moves:
+            line["move"] = move
+        out.write(json.dumps(line, default=str) + "\n")
+    return written
+
+
+def _steps(node):
+    """
+    Yield (n, move) for node and each first child n below it, where
+    move leads to n from the puzzle before it (None for node itself).
+
+    @type node: PuzzleNode
+    @rtype: Iterator[(PuzzleNode, object)]
+    """
+    previous = None
+    for n in node.iter_path():
+        if previous is None:
+            yield n, None
+        else:
+            yield n, _move_between(previous.puzzle, n.puzzle)
+        previous = n
+
+
+def _move_between(puzzle, extension):
+    """
+    Return the legal move of puzzle that leads to extension.
+
+    @type puzzle: Puzzle
+    @type extension: Puzzle
+    @rtype: object
+    """
+    board, key = copy(puzzle), state_key(extension)
+    for move in board.legal_moves():
+        board.apply(move)
+        found = state_key(board) == key
+        board.undo(move)
+        if found:
+            return move
+    raise ValueError("no legal move leads from {} to {}".format(puzzle,
+                                                                 extension))
+
+
+def parallel_solve(puzzle, split_depth=2, workers=None, canonical=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, searching depth-first on several processes at once.
+    Return None if this is not possible.
+
+    The puzzles split_depth extensions below puzzle are put on a shared
+    queue, and each of workers processes (default: one per CPU) takes the
+    next one whenever it is free and searches below it with dfs.  As soon
+    as one finds a solution, every other worker is told to stop.  puzzle
+    and canonical must be picklable.
+
+    @type puzzle: Puzzle
+    @type split_depth: int
+    @type workers: int | None
+    @type canonical: (Puzzle) -> object | None
     @rtype: PuzzleNode
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("4", "1", "2"), ("5", "*", "3"))
+    >>> path = parallel_solve(MNPuzzle(start_grid, target_grid), 1, 2)
+    >>> list(path.iter_path())[-1].puzzle.is_solved()
+    True
     """
-    if not unused_list:
+    solution, frontier = _split(PuzzleNode(puzzle), split_depth, canonical)
+    if solution is not None or not frontier:
+        return find_path(solution)
+    tasks = [(_subtree_dfs, (node.puzzle, canonical)) for node in frontier]
+    pool, stop_event = _split_pool(workers)
+    try:
+        for i, found in _run_split(tasks, pool):
+            if found is not None:
+                return _graft(frontier[i], found)
         return None
-    # if used_list is empty, then can't find a solution, return None
-    if unused_list[len(unused_list)-1].puzzle.is_solved():
-        return unused_list[len(unused_list)-1]
-    # if the topmost unused list is a solution, then return it
-    else:
-        outer = unused_list.pop()
-        # outer is the topmost unused list, unused list will delete this one
-        for extension in outer.puzzle.extensions():
-            unused = True
-            for obj in unused_list:
-                if obj.puzzle == extension:
-                    unused = False
-
-            if extension == outer.puzzle:
-                unused = False
-            if extension not in used_list and unused:
-                # for all extensions, first find if they are used before, if not
-                # used, change it to a PuzzleNode and append it to unused_list
-                unused_list.append(PuzzleNode(extension, parent=outer))
-    return dfs(used_list + [outer.puzzle], unused_list[:])
-    # put topmost unused puzzle to used list and test the next topmost one.
-    # this method test PuzzleNode from the topmost, so it will fnd one
-    # extension first and then find this extensions' extension. This is a DFS
+    finally:
+        _stop_pool(pool, stop_event)
+
+
+def parallel_ida_star_solve(puzzle, heuristic=None, split_depth=2,
+                            workers=None, canonical=None):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, running iterative deepening A* on several
+    processes at once.  Return None if this is not possible.
+
+    In every iteration the puzzles split_depth extensions below puzzle
+    are searched as separate tasks with the same bound, as in
+    parallel_solve.  The next bound is the smallest estimate that went
+    past the bound in any task.  One pool of workers processes runs
+    every iteration.  puzzle, heuristic and canonical must be picklable.
+
+    @type puzzle: Puzzle
+    @type heuristic: (Puzzle) -> int | None
+    @type split_depth: int
+    @type workers: int | None
+    @type canonical: (Puzzle) -> object | None
+    @rtype: PuzzleNode
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("4", "1", "2"), ("5", "*", "3"))
+    >>> path = parallel_ida_star_solve(MNPuzzle(start_grid, target_grid),
+    ...                                split_depth=1, workers=2)
+    >>> len(list(path.iter_path()))
+    6
+    """
+    if heuristic is None:
+        heuristic = _puzzle_heuristic
+    solution, frontier = _split(PuzzleNode(puzzle), split_depth, canonical)
+    if solution is not None or not frontier:
+        return find_path(solution)
+    bound = heuristic(puzzle)
+    pool, stop_event = _split_pool(workers)
+    try:
+        while bound is not None:
+            next_bound, tasks, nodes = None, [], []
+            for node in frontier:
+                estimate = split_depth + heuristic(node.puzzle)
+                if estimate > bound:
+                    # too far already, so this task would only say so
+                    if next_bound is None or estimate < next_bound:
+                        next_bound = estimate
+                else:
+                    nodes.append(node)
+                    tasks.append((_subtree_ida_star,
+                                  (node.puzzle, split_depth, bound,
+                                   heuristic, canonical)))
+            for i, (found, task_bound) in _run_split(tasks, pool):
+                if found is not None:
+                    return _graft(nodes[i], found)
+                if task_bound is not None and (next_bound is None or
+                                               task_bound < next_bound):
+                    next_bound = task_bound
+            bound = next_bound
+        return None
+    finally:
+        _stop_pool(pool, stop_event)
+
+
+def _split(root, depth, canonical):
+    """
+    Return a solution PuzzleNode found less than depth extensions below
+    root, or else None and the distinct PuzzleNodes exactly depth
+    extensions below root.
+
+    @type root: PuzzleNode
+    @type depth: int
+    @type canonical: (Puzzle) -> object | None
+    @rtype: (PuzzleNode | None, list[PuzzleNode])
+    """
+    key_of = canonical or state_key
+    seen = {key_of(root.puzzle)}
+    layer = [root]
+    for _ in range(depth):
+        next_layer = []
+        for node in layer:
+            if node.puzzle.is_solved():
+                return node, []
+            if node.puzzle.fail_fast():
+                continue
+            for extension in node.puzzle.iter_extensions():
+                key = key_of(extension)
+                if key not in seen:
+                    seen.add(key)
+                    next_layer.append(PuzzleNode(extension, parent=node))
+        layer = next_layer
+    for node in layer:
+        if node.puzzle.is_solved():
+            return node, []
+    return None, layer
+
+
+# set in each worker process of _run_split, and by the parent to stop them
+_stop_event = None
+
+
+def _init_worker(stop_event):
+    """
+    Remember stop_event in a worker process of _run_split.
+
+    @type stop_event: multiprocessing.Event
+    @rtype: None
+    """
+    global _stop_event
+    _stop_event = stop_event
+
+
+def _stopped():
+    """
+    Return whether another worker has already found a solution.
+
+    @rtype: bool
+    """
+    return _stop_event is not None and _stop_event.is_set()
+
+
+def _split_pool(workers):
+    """
+    Return a pool of workers processes for _run_split, and the event
+    that tells its running calls to stop.
+
+    @type workers: int | None
+    @rtype: (ProcessPoolExecutor, multiprocessing.Event)
+    """
+    context = multiprocessing.get_context()
+    stop_event = context.Event()
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                               initializer=_init_worker,
+                               initargs=(stop_event,))
+    return pool, stop_event
+
+
+def _stop_pool(pool, stop_event):
+    """
+    Tell the running calls on pool to stop, cancel the queued ones and
+    wait for its processes to exit.
+
+    @type pool: ProcessPoolExecutor
+    @type stop_event: multiprocessing.Event
+    @rtype: None
+    """
+    stop_event.set()
+    pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _run_split(tasks, pool):
+    """
+    Yield (i, result) as each function call tasks[i] = (f, args) finishes
+    on pool, until the caller stops asking, which cancels the calls still
+    queued.  The pool stays open for the caller's next batch of tasks.
+
+    @type tasks: list[((...) -> object, tuple)]
+    @type pool: ProcessPoolExecutor
+    @rtype: Iterator[(int, object)]
+    """
+    pending = {pool.submit(f, *args): i
+               for i, (f, args) in enumerate(tasks)}
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _subtree_dfs(puzzle, canonical):
+    """
+    Return the puzzles on a path from puzzle to a solution found by dfs,
+    or None if there is none or another worker found one first.
+
+    @type puzzle: Puzzle
+    @type canonical: (Puzzle) -> object | None
+    @rtype: list[Puzzle] | None
+    """
+    found = dfs(PuzzleNode(puzzle), canonical, stop=_stopped)
+    return _puzzles_to(found)
+
+
+def _subtree_ida_star(puzzle, depth, bound, heuristic, canonical):
+    """
+    Return the puzzles on a path from puzzle, at depth, to a solution
+    within bound, or None, together with the next bound as for
+    _bounded_dfs.
+
+    @type puzzle: Puzzle
+    @type depth: int
+    @type bound: int
+    @type heuristic: (Puzzle) -> int
+    @type canonical: (Puzzle) -> object | None
+    @rtype: (list[Puzzle] | None, int | None)
+    """
+    found, next_bound = _bounded_dfs(PuzzleNode(puzzle), bound, heuristic,
+                                     canonical or state_key, None, depth,
+                                     _stopped)
+    return _puzzles_to(found), next_bound
+
+
+def _puzzles_to(node):
+    """
+    Return the puzzles from the root above node down to node, or None if
+    node is None.
+
+    @type node: PuzzleNode | None
+    @rtype: list[Puzzle] | None
+    """
+    if node is None:
+        return None
+    puzzles = []
+    while node is not None:
+        puzzles.append(node.puzzle)
+        node = node.parent
+    return puzzles[::-1]
+
+
+def _graft(node, puzzles):
+    """
+    Return the path from the root above node, through node, and on
+    through puzzles[1:], where puzzles[0] is node's puzzle.
+
+    @type node: PuzzleNode
+    @type puzzles: list[Puzzle]
+    @rtype: PuzzleNode
+    """
+    for puzzle in puzzles[1:]:
+        node = PuzzleNode(puzzle, parent=node)
+    return find_path(node)
+
+
+def _puzzle_heuristic(puzzle):
+    """
+    Return the puzzle's own estimate of its distance to a solution.
+
+    @type puzzle: Puzzle
+    @rtype: int
+    """
+    return puzzle.heuristic()
 
 
 # Class PuzzleNode helps build trees of PuzzleNodes that have
@@ -197,16 +1317,63 @@ class PuzzleNode:
         >>> pn1.__eq__(pn3)
         False
         """
-        return (type(self) == type(other) and
-                self.puzzle == other.puzzle and
-                all([x in self.children for x in other.children]) and
-                all([x in other.children for x in self.children]))
+        node = self
+        # walk down paths with a loop, recursing only where they branch
+        while (type(node) == type(other) and node.puzzle == other.puzzle and
+               len(node.children) == len(other.children) == 1):
+            node, other = node.children[0], other.children[0]
+        return (type(node) == type(other) and
+                node.puzzle == other.puzzle and
+                all([x in node.children for x in other.children]) and
+                all([x in other.children for x in node.children]))
 
     def __str__(self):
         """
         Return a human-readable string representing PuzzleNode self.
 
-        # doctest not feasible.
+        The tree is walked with a stack rather than by recursion, so
+        paths of any length can be shown.
+
+        @type self: PuzzleNode
+        @rtype: str
+
+        >>> root = node = PuzzleNode("a")
+        >>> for _ in range(5000):
+        ...     node.children.append(PuzzleNode("b", parent=node))
+        ...     node = node.children[0]
+        >>> text = str(root)
+        >>> text.count("b"), text.split()[:3]
+        (5000, ['a', 'b', 'b'])
+        """
+        pieces = []
+        # each entry is a node still to show, or a separator
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                pieces.append(node)
+                continue
+            pieces.append("{}\n\n".format(node.puzzle))
+            for i in range(len(node.children) - 1, -1, -1):
+                stack.append(node.children[i])
+                if i > 0:
+                    stack.append("\n")
+        return "".join(pieces)
+
+    def iter_path(self):
+        """
+        Yield PuzzleNode self and then each first child below it, the
+        path that find_path leaves from a solution.
+
+        @type self: PuzzleNode
+        @rtype: Iterator[PuzzleNode]
+
+        >>> root = PuzzleNode("a")
+        >>> root.children.append(PuzzleNode("b", parent=root))
+        >>> [node.puzzle for node in root.iter_path()]
+        ['a', 'b']
         """
-        return "{}\n\n{}".format(self.puzzle,
-                                 "\n".join([str(x) for x in self.children]))
+        node = self
+        while node is not None:
+            yield node
+            node = node.children[0] if node.children else None
@@ -0,0 +1,340 @@
+"""
+Counters and timings of a search, for finding out why a solve is slow.
+
+Pass a SearchStats as stats to a solver in puzzle_tools:
+
+    stats = SearchStats(progress=print, every=100000)
+    depth_first_solve(puzzle, stats=stats)
+    print(stats)
+
+Solvers given no stats do none of this work.
+"""
+import tracemalloc
+from copy import copy
+from time import perf_counter
+
+
+class SearchStats:
+    """
+    What one run of a solver did.
+
+    generated counts extensions built, expanded counts puzzles whose
+    extensions were asked for, and duplicates counts extensions dropped
+    because their state was already reached.  max_frontier and
+    max_visited are the largest sizes of the open list (or stack) and
+    of the set of remembered states.  time_extensions, time_is_solved
+    and time_fail_fast are seconds spent in those methods, and elapsed
+    the seconds of the whole run.  peak_memory is the tracemalloc peak
+    in bytes if trace_memory was set, and depth the number of moves in
+    the solution found.
+    """
+
+    def __init__(self, progress=None, every=10000, trace_memory=False):
+        """
+        Create an empty SearchStats self that calls progress(self) every
+        every expansions, and traces memory if trace_memory is True.
+
+        @type self: SearchStats
+        @type progress: (SearchStats) -> object | None
+        @type every: int
+        @type trace_memory: bool
+        @rtype: None
+        """
+        self.progress, self.every = progress, every
+        self.trace_memory = trace_memory
+        self.generated = self.expanded = self.duplicates = 0
+        self.max_frontier = self.max_visited = 0
+        self.time_extensions = self.time_is_solved = 0.0
+        self.time_fail_fast = self.elapsed = 0.0
+        self.peak_memory = self.depth = None
+        self._started, self._tracing = None, False
+
+    def start(self, puzzle):
+        """
+        Start timing a run from puzzle, and return the stand-in for
+        puzzle that the solver should search instead, which times
+        extensions, is_solved and fail_fast.
+
+        @type self: SearchStats
+        @type puzzle: Puzzle
+        @rtype: Puzzle
+        """
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self._started = perf_counter()
+        return _TimedPuzzle(puzzle, self)
+
+    def finish(self, result):
+        """
+        Stop timing, and return result, a PuzzleNode path or list of
+        moves, with the stand-ins that start made replaced by the
+        puzzles they stand for.
+
+        @type self: SearchStats
+        @type result: PuzzleNode | list[object] | None
+        @rtype: PuzzleNode | list[object] | None
+        """
+        self.elapsed += perf_counter() - self._started
+        if self.trace_memory:
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+        if isinstance(result, list):
+            self.depth = len(result)
+            return result
+        node, self.depth = result, None
+        while node is not None:
+            if isinstance(node.puzzle, _TimedPuzzle):
+                node.puzzle = node.puzzle.puzzle
+            self.depth = 0 if self.depth is None else self.depth + 1
+            node = node.children[0] if node.children else None
+        return result
+
+    def expand(self, frontier, visited):
+        """
+        Count one expansion, with frontier puzzles waiting and visited
+        states remembered, and report progress if it is due.
+
+        @type self: SearchStats
+        @type frontier: int
+        @type visited: int
+        @rtype: None
+        """
+        self.expanded += 1
+        if frontier > self.max_frontier:
+            self.max_frontier = frontier
+        if visited > self.max_visited:
+            self.max_visited = visited
+        if self.progress is not None and self.expanded % self.every == 0:
+            self.progress(self)
+
+    def branching_factor(self):
+        """
+        Return the average number of extensions built per expansion.
+
+        @type self: SearchStats
+        @rtype: float
+        """
+        return self.generated / self.expanded if self.expanded else 0.0
+
+    def effective_branching_factor(self):
+        """
+        Return b such that a uniform tree of depth depth with branching
+        factor b has generated nodes below its root, or None if no
+        solution depth is known.
+
+        @type self: SearchStats
+        @rtype: float | None
+
+        >>> stats = SearchStats()
+        >>> stats.generated, stats.depth = 14, 3
+        >>> round(stats.effective_branching_factor(), 6)
+        2.0
+        """
+        if not self.depth:
+            return None
+        depth, generated = self.depth, self.generated
+
+        def tree_size(b):
+            return sum(b ** i for i in range(1, depth + 1))
+
+        low, high = 0.0, max(1.0, float(generated))
+        for _ in range(100):
+            middle = (low + high) / 2
+            if tree_size(middle) < generated:
+                low = middle
+            else:
+                high = middle
+        return (low + high) / 2
+
+    def as_dict(self):
+        """
+        Return the counters and timings of SearchStats self as a dict.
+
+        @type self: SearchStats
+        @rtype: dict[str, object]
+        """
+        return {"generated": self.generated, "expanded": self.expanded,
+                "duplicates": self.duplicates,
+                "max_frontier": self.max_frontier,
+                "max_visited": self.max_visited,
+                "branching_factor": self.branching_factor(),
+                "effective_branching_factor":
+                    self.effective_branching_factor(),
+                "time_extensions": self.time_extensions,
+                "time_is_solved": self.time_is_solved,
+                "time_fail_fast": self.time_fail_fast,
+                "elapsed": self.elapsed, "peak_memory": self.peak_memory,
+                "depth": self.depth}
+
+    def __str__(self):
+        """
+        Return a one-line summary of SearchStats self.
+
+        @type self: SearchStats
+        @rtype: str
+
+        >>> print(SearchStats())
+        0 generated, 0 expanded, 0 duplicates in 0.000s
+        """
+        return "{} generated, {} expanded, {} duplicates in {:.3f}s".format(
+            self.generated, self.expanded, self.duplicates, self.elapsed)
+
+
+class _TimedPuzzle:
+    """
+    A stand-in for a puzzle that adds the time spent in its extensions,
+    is_solved and fail_fast to a SearchStats, and passes everything else
+    on to the puzzle.
+    """
+
+    def __init__(self, puzzle, stats):
+        """
+        Create a _TimedPuzzle self standing in for puzzle.
+
+        @type self: _TimedPuzzle
+        @type puzzle: Puzzle
+        @type stats: SearchStats
+        @rtype: None
+        """
+        self.puzzle, self.stats = puzzle, stats
+
+    def __getattr__(self, name):
+        """
+        Return attribute name of the puzzle self stands in for.
+
+        @type self: _TimedPuzzle
+        @type name: str
+        @rtype: object
+        """
+        return getattr(self.puzzle, name)
+
+    def __eq__(self, other):
+        """
+        Return whether the puzzle of self is equivalent to other, or to
+        the puzzle other stands in for.
+
+        @type self: _TimedPuzzle
+        @type other: _TimedPuzzle | Any
+        @rtype: bool
+        """
+        if isinstance(other, _TimedPuzzle):
+            other = other.puzzle
+        return self.puzzle == other
+
+    def __hash__(self):
+        """
+        Return the hash of the puzzle of self.
+
+        @type self: _TimedPuzzle
+        @rtype: int
+        """
+        return hash(self.puzzle)
+
+    def __str__(self):
+        """
+        Return the string of the puzzle of self.
+
+        @type self: _TimedPuzzle
+        @rtype: str
+        """
+        return str(self.puzzle)
+
+    def __copy__(self):
+        """
+        Return a stand-in for a copy of the puzzle of self.
+
+        @type self: _TimedPuzzle
+        @rtype: _TimedPuzzle
+        """
+        return _TimedPuzzle(copy(self.puzzle), self.stats)
+
+    def is_solved(self):
+        """
+        Return whether the puzzle of self is solved, timing the call.
+
+        @type self: _TimedPuzzle
+        @rtype: bool
+        """
+        started = perf_counter()
+        result = self.puzzle.is_solved()
+        self.stats.time_is_solved += perf_counter() - started
+        return result
+
+    def fail_fast(self):
+        """
+        Return whether the puzzle of self fails fast, timing the call.
+
+        @type self: _TimedPuzzle
+        @rtype: bool
+        """
+        started = perf_counter()
+        result = self.puzzle.fail_fast()
+        self.stats.time_fail_fast += perf_counter() - started
+        return result
+
+    def iter_extensions(self):
+        """
+        Yield stand-ins for the extensions of the puzzle of self, timing
+        the building of each.
+
+        @type self: _TimedPuzzle
+        @rtype: Iterator[_TimedPuzzle]
+        """
+        stats = self.stats
+        extensions = self.puzzle.iter_extensions()
+        while True:
+            started = perf_counter()
+            extension = next(extensions, None)
+            stats.time_extensions += perf_counter() - started
+            if extension is None:
+                return
+            yield _TimedPuzzle(extension, stats)
+
+    def extensions(self):
+        """
+        Return stand-ins for the extensions of the puzzle of self.
+
+        @type self: _TimedPuzzle
+        @rtype: list[_TimedPuzzle]
+        """
+        return list(self.iter_extensions())
+
+    def reverse_extensions(self):
+        """
+        Return stand-ins for the reverse extensions of the puzzle of self,
+        timed as extensions.
+
+        @type self: _TimedPuzzle
+        @rtype: list[_TimedPuzzle]
+        """
+        started = perf_counter()
+        result = self.puzzle.reverse_extensions()
+        self.stats.time_extensions += perf_counter() - started
+        return [_TimedPuzzle(p, self.stats) for p in result]
+
+    def legal_moves(self):
+        """
+        Return the legal moves of the puzzle of self, timed as
+        extensions.
+
+        @type self: _TimedPuzzle
+        @rtype: list[object]
+        """
+        started = perf_counter()
+        result = self.puzzle.legal_moves()
+        self.stats.time_extensions += perf_counter() - started
+        return result
+
+    def goal_state(self):
+        """
+        Return a stand-in for the goal state of the puzzle of self.
+
+        @type self: _TimedPuzzle
+        @rtype: _TimedPuzzle
+        """
+        return _TimedPuzzle(self.puzzle.goal_state(), self.stats)
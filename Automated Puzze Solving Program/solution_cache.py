@@ -0,0 +1,265 @@
+"""
+A cache of solutions in front of the solvers in puzzle_tools.
+
+Solutions are stored one state at a time: each state on a solution path
+is kept with the key of the next state and its distance to the goal, so
+a later puzzle starting anywhere along a cached path is answered too.
+Entries live in an in-memory LRU tier and, optionally, in an SQLite
+file that survives restarts.
+"""
+import sqlite3
+from ast import literal_eval
+from collections import OrderedDict
+
+from puzzle_tools import breadth_first_solve, bidirectional_solve, \
+    astar_solve, ida_star_solve, PuzzleNode, find_path
+
+# solvers whose solutions are always shortest
+SHORTEST = {breadth_first_solve, bidirectional_solve, astar_solve,
+            ida_star_solve}
+
+
+class SolutionCache:
+    """
+    Remembers, for each (kind, goal_key, state_key) reached, the state
+    key one step closer to a solution, the number of steps left, and
+    whether that number is the shortest possible.
+
+    Unsolvable states are remembered with no next key and no distance.
+    """
+
+    def __init__(self, capacity=100000, path=None):
+        """
+        Create an empty SolutionCache self holding at most capacity
+        entries in memory, and every entry in the SQLite file path if it
+        is given.
+
+        @type self: SolutionCache
+        @type capacity: int
+        @type path: str | None
+        @rtype: None
+        """
+        assert capacity > 0
+        self.capacity = capacity
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries (kind TEXT, goal TEXT, "
+                "state TEXT, next TEXT, distance INTEGER, optimal INTEGER, "
+                "PRIMARY KEY (kind, goal, state))")
+
+    def close(self):
+        """
+        Close the SQLite file of SolutionCache self, if it has one.
+
+        @type self: SolutionCache
+        @rtype: None
+        """
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def solve(self, puzzle, solver=breadth_first_solve, optimal=None):
+        """
+        Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+        a solution, as solver would, or None if this is not possible.
+
+        The path is rebuilt from cached entries when they reach a
+        solution; otherwise solver is run and its solution cached.
+        optimal says whether solver always finds shortest paths (by
+        default, whether it is in SHORTEST); cached paths are only used
+        for such a solver if they are shortest too.
+
+        @type self: SolutionCache
+        @type puzzle: Puzzle
+        @type solver: (Puzzle) -> PuzzleNode | None
+        @type optimal: bool | None
+        @rtype: PuzzleNode | None
+
+        >>> from word_ladder_puzzle import WordLadderPuzzle
+        >>> ws = {"cat", "cot", "dot", "dog"}
+        >>> cache = SolutionCache()
+        >>> path = cache.solve(WordLadderPuzzle("cat", "dog", ws))
+        >>> path = cache.solve(WordLadderPuzzle("cot", "dog", ws))
+        >>> print(path.children[0].puzzle)
+        dot
+        >>> cache.hits, cache.misses
+        (1, 1)
+
+        Boards whose pegs share a mask are told apart by goal_key.
+
+        >>> from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+        >>> marker_set = {"*", ".", "#"}
+        >>> cache.solve(GridPegSolitairePuzzle([["*", "*"], [".", "."]],
+        ...                                    marker_set)) is None
+        True
+        >>> path = cache.solve(GridPegSolitairePuzzle([["*", "*", "."]],
+        ...                                           marker_set))
+        >>> print(path.children[0].puzzle)
+        ..*
+        <BLANKLINE>
+        """
+        if optimal is None:
+            optimal = solver in SHORTEST
+        kind, goal = type(puzzle).__name__, puzzle.goal_key()
+        entry = self._get((kind, goal, puzzle.state_key()))
+        if entry is not None and (entry[1] is None or entry[2] or
+                                  not optimal):
+            path = self._replay(puzzle, kind, goal, optimal)
+            if path is not None or entry[1] is None:
+                self.hits += 1
+                return path
+        self.misses += 1
+        solution = solver(puzzle)
+        self.store(puzzle, solution, optimal)
+        return solution
+
+    def store(self, puzzle, solution, optimal):
+        """
+        Remember solution, the path solving puzzle or None if puzzle has
+        none, and whether it is a shortest path.
+
+        A shortest path replaces what is known about its states.  Any
+        other path is only stored up to the first state already known,
+        where it joins the cached path.
+
+        @type self: SolutionCache
+        @type puzzle: Puzzle
+        @type solution: PuzzleNode | None
+        @type optimal: bool
+        @rtype: None
+        """
+        kind, goal = type(puzzle).__name__, puzzle.goal_key()
+        if solution is None:
+            self._put((kind, goal, puzzle.state_key()), (None, None, True))
+            self._commit()
+            return
+        keys = []
+        while solution is not None:
+            keys.append(solution.puzzle.state_key())
+            solution = solution.children[0] if solution.children else None
+        end, distance, joined = len(keys) - 1, 0, False
+        if not optimal:
+            for i, key in enumerate(keys):
+                entry = self._get((kind, goal, key))
+                if entry is not None and entry[1] is not None:
+                    end, distance, joined = i, entry[1], True
+                    break
+        for i in range(end if joined else end + 1):
+            following = keys[i + 1] if i < end else None
+            self._put((kind, goal, keys[i]),
+                      (following, end - i + distance, optimal))
+        self._commit()
+
+    def _replay(self, puzzle, kind, goal, optimal):
+        """
+        Return the path from PuzzleNode(puzzle) that the cached entries
+        lead along to a solution, or None if an entry is missing, was
+        unsolvable, no longer matches an extension, or, if optimal, is
+        not known to be shortest.
+
+        An entry forgotten by the memory tier may have been stored again
+        from a longer path, so every entry along the way is checked.
+
+        @type self: SolutionCache
+        @type puzzle: Puzzle
+        @type kind: str
+        @type goal: object
+        @type optimal: bool
+        @rtype: PuzzleNode | None
+
+        >>> from puzzle_tools import depth_first_solve
+        >>> from word_ladder_puzzle import WordLadderPuzzle, WordDictionary
+        >>> ws = WordDictionary({"cat", "cot", "cog", "dog", "hot", "hog"})
+        >>> cache = SolutionCache()
+        >>> path = cache.solve(WordLadderPuzzle("cat", "dog", ws))
+        >>> goal = ("dog", ws.fingerprint)
+        >>> del cache._entries[("WordLadderPuzzle", goal, "cot")]
+        >>> path = cache.solve(WordLadderPuzzle("cot", "dog", ws),
+        ...                    depth_first_solve)
+        >>> len(list(path.iter_path()))
+        5
+        >>> path = cache.solve(WordLadderPuzzle("cat", "dog", ws))
+        >>> len(list(path.iter_path()))
+        4
+        """
+        node = PuzzleNode(puzzle)
+        while True:
+            entry = self._get((kind, goal, node.puzzle.state_key()))
+            if (entry is None or entry[1] is None or
+                    (optimal and not entry[2])):
+                return None
+            if entry[0] is None:
+                return find_path(node)
+            extension = next((e for e in node.puzzle.extensions()
+                              if e.state_key() == entry[0]), None)
+            if extension is None:
+                return None
+            node = PuzzleNode(extension, parent=node)
+
+    def _get(self, key):
+        """
+        Return the entry (next, distance, optimal) for key, or None.
+
+        @type self: SolutionCache
+        @type key: (str, object, object)
+        @rtype: (object, int | None, bool) | None
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT next, distance, optimal FROM entries "
+            "WHERE kind = ? AND goal = ? AND state = ?",
+            (key[0], repr(key[1]), repr(key[2]))).fetchone()
+        if row is None:
+            return None
+        entry = (literal_eval(row[0]), row[1], bool(row[2]))
+        self._remember(key, entry)
+        return entry
+
+    def _put(self, key, entry):
+        """
+        Store entry for key in every tier.
+
+        @type self: SolutionCache
+        @type key: (str, object, object)
+        @type entry: (object, int | None, bool)
+        @rtype: None
+        """
+        self._remember(key, entry)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key[0], repr(key[1]), repr(key[2]), repr(entry[0]),
+                 entry[1], int(entry[2])))
+
+    def _remember(self, key, entry):
+        """
+        Store entry for key in memory, forgetting the least recently used
+        entry if there are too many.
+
+        @type self: SolutionCache
+        @type key: (str, object, object)
+        @type entry: (object, int | None, bool)
+        @rtype: None
+        """
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def _commit(self):
+        """
+        Make the SQLite tier's new entries permanent.
+
+        @type self: SolutionCache
+        @rtype: None
+        """
+        if self._db is not None:
+            self._db.commit()
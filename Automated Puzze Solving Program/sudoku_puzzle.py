@@ -55,6 +55,70 @@ class SudokuPuzzle(Puzzle):
                 self._n == other._n and self._symbols == other._symbols and
                 self._symbol_set == other._symbol_set)
 
+    def __hash__(self):
+        """
+        Return a hash of SudokuPuzzle self, equal for equal puzzles.
+
+        @type self: SudokuPuzzle
+        @rtype: int
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["D", "C", "B", "A"]
+        >>> grid += ["*", "D", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> s1 = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> s2 = SudokuPuzzle(4, grid[:], {"A", "B", "C", "D"})
+        >>> hash(s1) == hash(s2)
+        True
+        >>> len({s1, s2})
+        1
+        """
+        return hash(self.state_key())
+
+    def __copy__(self):
+        """
+        Return a SudokuPuzzle equal to self that shares no list with it,
+        so moves can be applied to either alone.
+
+        @type self: SudokuPuzzle
+        @rtype: SudokuPuzzle
+        """
+        return SudokuPuzzle(self._n, self._symbols[:], self._symbol_set)
+
+    def state_key(self):
+        """
+        Return the symbols of SudokuPuzzle self as a tuple.
+
+        @type self: SudokuPuzzle
+        @rtype: tuple[str]
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["D", "C", "B", "A"]
+        >>> grid += ["*", "D", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> s.state_key()[:5]
+        ('A', 'B', 'C', 'D', 'D')
+        """
+        return tuple(self._symbols)
+
+    def goal_key(self):
+        """
+        Return the size and sorted symbols of SudokuPuzzle self, which
+        tell apart puzzles of different sizes or symbols with the same
+        state_key.
+
+        @type self: SudokuPuzzle
+        @rtype: (int, tuple[str])
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["D", "C", "B", "A"]
+        >>> grid += ["*", "D", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> SudokuPuzzle(4, grid, {"A", "B", "C", "D"}).goal_key()
+        (4, ('A', 'B', 'C', 'D'))
+        """
+        return self._n, tuple(sorted(self._symbol_set))
+
     def __str__(self):
         """
         Return a human-readable string representation of SudokuPuzzle self.
@@ -161,25 +225,86 @@ class SudokuPuzzle(Puzzle):
         >>> all([s in L1 for s in L2])
         True
         """
+        return list(self.iter_extensions())
+
+    def iter_extensions(self):
+        """
+        Yield the extensions of SudokuPuzzle self one at a time.
+
+        @type self: SudokuPuzzle
+        @rtype: Iterator[SudokuPuzzle]
+
+        >>> grid = ["A", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> e = s.iter_extensions()
+        >>> next(e)._symbols[1] in {"B", "C", "D"}
+        True
+        """
         # convenient names
         symbols, symbol_set, n = self._symbols, self._symbol_set, self._n
+        # a SudokuPuzzle with each legal digit at the first open position
+        for i, d in self.legal_moves():
+            yield SudokuPuzzle(n, symbols[:i] + [d] + symbols[i + 1:],
+                               symbol_set)
+
+    def legal_moves(self):
+        """
+        Return list of moves (i, d) putting each symbol d allowed at the
+        first open position i there.
+
+        @type self: SudokuPuzzle
+        @rtype: list[(int, str)]
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["C", "D", "A", "B"]
+        >>> grid += ["B", "A", "D", "C"]
+        >>> grid += ["D", "C", "B", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> s.legal_moves()
+        [(15, 'A')]
+        >>> s.apply((15, 'A'))
+        >>> s.is_solved()
+        True
+        >>> s.undo((15, 'A'))
+        >>> s.is_solved()
+        False
+        """
+        symbols = self._symbols
         if "*" not in symbols:
-            # return an empty list
-            return [_ for _ in []]
-        else:
-            # position of first empty position
-            i = symbols.index("*")
-            # allowed symbols at position i
-            # A | B == A.union(B)
-            allowed_symbols = (self._symbol_set -
-                               (self._row_set(i) |
-                                self._column_set(i) |
-                                self._subsquare_set(i)))
-            # list of SudokuPuzzles with each legal digit at position i
-            return (
-                [SudokuPuzzle(n,
-                 symbols[:i] + [d] + symbols[i + 1:], symbol_set)
-                 for d in allowed_symbols])
+            return []
+        # position of first empty position
+        i = symbols.index("*")
+        # allowed symbols at position i
+        # A | B == A.union(B)
+        allowed_symbols = (self._symbol_set -
+                           (self._row_set(i) |
+                            self._column_set(i) |
+                            self._subsquare_set(i)))
+        return [(i, d) for d in allowed_symbols]
+
+    def apply(self, move):
+        """
+        Put symbol d at position i, for move (i, d).
+
+        @type self: SudokuPuzzle
+        @type move: (int, str)
+        @rtype: None
+        """
+        i, d = move
+        self._symbols[i] = d
+
+    def undo(self, move):
+        """
+        Open position i again, for move (i, d).
+
+        @type self: SudokuPuzzle
+        @type move: (int, str)
+        @rtype: None
+        """
+        self._symbols[move[0]] = "*"
     # override fail_fast
     # Notice that it is not possible to complete a sudoku puzzle if there
     # is one open position that has no symbols available to put in it.  In
@@ -276,6 +401,335 @@ class SudokuPuzzle(Puzzle):
             [symbols[ul + i + n * j] for i in range(ss) for j in range(ss)])
 
 
+# cell groups of an nxn grid, keyed by n
+_units = {}
+
+
+def sudoku_units(n):
+    """
+    Return, for an nxn sudoku, the row, column and subsquare number of
+    each position, and the positions in each row, column and subsquare.
+
+    @type n: int
+    @rtype: (list[int], list[int], list[int], list[list[int]])
+    >>> rows, columns, boxes, units = sudoku_units(4)
+    >>> rows[6], columns[6], boxes[6], units[8]
+    (1, 2, 1, [0, 1, 4, 5])
+    """
+    if n not in _units:
+        ss = round(n ** (1 / 2))
+        rows = [m // n for m in range(n ** 2)]
+        columns = [m % n for m in range(n ** 2)]
+        boxes = [(m // n // ss) * ss + (m % n) // ss for m in range(n ** 2)]
+        units = ([[m for m in range(n ** 2) if rows[m] == i]
+                  for i in range(n)] +
+                 [[m for m in range(n ** 2) if columns[m] == i]
+                  for i in range(n)] +
+                 [[m for m in range(n ** 2) if boxes[m] == i]
+                  for i in range(n)])
+        _units[n] = (rows, columns, boxes, units)
+    return _units[n]
+
+
+class PropagatingSudokuPuzzle(SudokuPuzzle):
+    """
+    A sudoku puzzle that fills in every forced symbol as soon as it is
+    made, and whose extensions branch on the open position with the
+    fewest allowed symbols.
+
+    The symbols used in each row, column and subsquare are kept as
+    bitmasks and updated with each symbol placed, instead of being
+    recomputed as sets.
+    """
+
+    def __init__(self, n, symbols, symbol_set):
+        """
+        Create a new nxn PropagatingSudokuPuzzle self with symbols
+        from symbol_set already selected, and then place every symbol
+        forced by them.
+
+        @type self: PropagatingSudokuPuzzle
+        @type n: int
+        @type symbols: list[str]
+        @type symbol_set: set[str]
+        """
+        SudokuPuzzle.__init__(self, n, symbols[:], symbol_set)
+        # symbol number i is bit 1 << i
+        self._order = sorted(symbol_set)
+        self._bits = {d: 1 << i for i, d in enumerate(self._order)}
+        self._used = [[0] * n, [0] * n, [0] * n]
+        self._dead = False
+        # positions placed in order, and the trail length before each move
+        self._trail, self._marks = [], []
+        rows, columns, boxes, _ = sudoku_units(n)
+        for m, d in enumerate(self._symbols):
+            if d != "*":
+                bit = self._bits[d]
+                if (self._used[0][rows[m]] | self._used[1][columns[m]] |
+                        self._used[2][boxes[m]]) & bit:
+                    # the given symbols already clash
+                    self._dead = True
+                self._used[0][rows[m]] |= bit
+                self._used[1][columns[m]] |= bit
+                self._used[2][boxes[m]] |= bit
+        if not self._dead:
+            self._propagate()
+
+    def _allowed(self, m):
+        """
+        Return the bitmask of symbols allowed at open position m.
+
+        @type self: PropagatingSudokuPuzzle
+        @type m: int
+        @rtype: int
+        """
+        rows, columns, boxes, _ = sudoku_units(self._n)
+        used = self._used
+        return ((1 << self._n) - 1) & ~(used[0][rows[m]] |
+                                        used[1][columns[m]] |
+                                        used[2][boxes[m]])
+
+    def _place(self, m, bit):
+        """
+        Put the symbol of bit at position m.
+
+        @type self: PropagatingSudokuPuzzle
+        @type m: int
+        @type bit: int
+        @rtype: None
+        """
+        rows, columns, boxes, _ = sudoku_units(self._n)
+        self._symbols[m] = self._order[bit.bit_length() - 1]
+        self._used[0][rows[m]] |= bit
+        self._used[1][columns[m]] |= bit
+        self._used[2][boxes[m]] |= bit
+        self._trail.append(m)
+
+    def _propagate(self):
+        """
+        Place symbols until none is forced, or record that self is dead.
+
+        A symbol is forced at a position when it is the only one allowed
+        there (naked single), or when that position is the only one in a
+        row, column or subsquare that allows it (hidden single).
+
+        @type self: PropagatingSudokuPuzzle
+        @rtype: None
+        """
+        symbols, n = self._symbols, self._n
+        units = sudoku_units(n)[3]
+        changed = True
+        while changed:
+            changed = False
+            for m in range(n ** 2):
+                if symbols[m] == "*":
+                    allowed = self._allowed(m)
+                    if allowed == 0:
+                        self._dead = True
+                        return
+                    if allowed & (allowed - 1) == 0:
+                        self._place(m, allowed)
+                        changed = True
+            for unit in units:
+                open_cells = [(m, self._allowed(m)) for m in unit
+                              if symbols[m] == "*"]
+                missing = (1 << n) - 1
+                for m in unit:
+                    if symbols[m] != "*":
+                        missing &= ~self._bits[symbols[m]]
+                for bit in (1 << i for i in range(n)):
+                    if not missing & bit:
+                        continue
+                    places = [m for m, allowed in open_cells if allowed & bit]
+                    if not places:
+                        self._dead = True
+                        return
+                    if len(places) == 1 and symbols[places[0]] == "*":
+                        if not self._allowed(places[0]) & bit:
+                            self._dead = True
+                            return
+                        self._place(places[0], bit)
+                        changed = True
+
+    def _child(self, m, bit):
+        """
+        Return a copy of self with the symbol of bit at position m, and
+        every symbol it forces placed too.
+
+        @type self: PropagatingSudokuPuzzle
+        @type m: int
+        @type bit: int
+        @rtype: PropagatingSudokuPuzzle
+        """
+        child = self.__copy__()
+        child._place(m, bit)
+        child._propagate()
+        return child
+
+    def __copy__(self):
+        """
+        Return a PropagatingSudokuPuzzle equal to self that shares no
+        list with it, so moves can be applied to either alone.
+
+        @type self: PropagatingSudokuPuzzle
+        @rtype: PropagatingSudokuPuzzle
+        """
+        other = PropagatingSudokuPuzzle.__new__(PropagatingSudokuPuzzle)
+        other._n, other._symbol_set = self._n, self._symbol_set
+        other._symbols, other._bits = self._symbols[:], self._bits
+        other._order = self._order
+        other._used = [used[:] for used in self._used]
+        other._dead = self._dead
+        other._trail, other._marks = [], []
+        return other
+
+    def extensions(self):
+        """
+        Return list of extensions of PropagatingSudokuPuzzle self, one for
+        each symbol allowed at the open position with fewest of them.
+
+        Extensions that propagation shows to be dead are left out.
+
+        @type self: PropagatingSudokuPuzzle
+        @rtype: list[PropagatingSudokuPuzzle]
+
+        >>> grid = ["A", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> s = PropagatingSudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> len(s.extensions())
+        3
+        """
+        return list(self.iter_extensions())
+
+    def iter_extensions(self):
+        """
+        Yield the extensions of PropagatingSudokuPuzzle self one at a
+        time, propagating each only when it is asked for.
+
+        @type self: PropagatingSudokuPuzzle
+        @rtype: Iterator[PropagatingSudokuPuzzle]
+        """
+        if self._dead or "*" not in self._symbols:
+            return
+        choices = [(bin(self._allowed(m)).count("1"), m)
+                   for m in range(self._n ** 2) if self._symbols[m] == "*"]
+        m = min(choices)[1]
+        allowed = self._allowed(m)
+        for i in range(self._n):
+            if allowed & (1 << i):
+                child = self._child(m, 1 << i)
+                if not child._dead:
+                    yield child
+
+    def legal_moves(self):
+        """
+        Return list of moves (m, bit) putting each symbol allowed at the
+        open position m with fewest of them there, as extensions does.
+
+        Unlike extensions, moves that propagation would show to be dead
+        are not left out; fail_fast tells once one is applied.
+
+        @type self: PropagatingSudokuPuzzle
+        @rtype: list[(int, int)]
+
+        >>> grid = ["A", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> s = PropagatingSudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> before = s.state_key()
+        >>> move = s.legal_moves()[0]
+        >>> s.apply(move)
+        >>> s.state_key() == before
+        False
+        >>> s.undo(move)
+        >>> s.state_key() == before
+        True
+        """
+        if self._dead or "*" not in self._symbols:
+            return []
+        choices = [(bin(self._allowed(m)).count("1"), m)
+                   for m in range(self._n ** 2) if self._symbols[m] == "*"]
+        m = min(choices)[1]
+        allowed = self._allowed(m)
+        return [(m, 1 << i) for i in range(self._n) if allowed & (1 << i)]
+
+    def apply(self, move):
+        """
+        Put the symbol of bit at position m, for move (m, bit), and every
+        symbol it forces.
+
+        @type self: PropagatingSudokuPuzzle
+        @type move: (int, int)
+        @rtype: None
+        """
+        self._marks.append(len(self._trail))
+        self._place(*move)
+        self._propagate()
+
+    def undo(self, move):
+        """
+        Take back every symbol placed by the last move applied.
+
+        Symbols are only placed where they are allowed, so each one set
+        exactly its own bits, which can simply be cleared.
+
+        @type self: PropagatingSudokuPuzzle
+        @type move: (int, int)
+        @rtype: None
+        """
+        rows, columns, boxes, _ = sudoku_units(self._n)
+        mark = self._marks.pop()
+        while len(self._trail) > mark:
+            m = self._trail.pop()
+            bit = self._bits[self._symbols[m]]
+            self._used[0][rows[m]] &= ~bit
+            self._used[1][columns[m]] &= ~bit
+            self._used[2][boxes[m]] &= ~bit
+            self._symbols[m] = "*"
+        self._dead = False
+
+    def is_solved(self):
+        """
+        Return whether PropagatingSudokuPuzzle self is solved.
+
+        Symbols are only ever placed where they are allowed, so a full
+        grid that is not dead is solved.
+
+        @type self: PropagatingSudokuPuzzle
+        @rtype: bool
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["C", "D", "A", "B"]
+        >>> grid += ["B", "A", "D", "C"]
+        >>> grid += ["D", "*", "*", "*"]
+        >>> s = PropagatingSudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> s.is_solved()
+        True
+        """
+        return not self._dead and "*" not in self._symbols
+
+    def fail_fast(self):
+        """
+        Return True iff propagation found PropagatingSudokuPuzzle self
+        can never be extended to a solution.
+
+        @type self: PropagatingSudokuPuzzle
+        @rtype: bool
+
+        >>> grid = ["A", "A", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> s = PropagatingSudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> s.fail_fast()
+        True
+        """
+        return self._dead
+
+
 if __name__ == "__main__":
     import doctest
 
@@ -309,3 +763,11 @@ if __name__ == "__main__":
     print("time to solve 9x9 using depth_first: {} seconds\n".format(
         end - start))
     print(sol)
+    start = time()
+    sol = depth_first_solve(PropagatingSudokuPuzzle(9, s._symbols,
+                                                    s._symbol_set))
+    while sol.children:
+        sol = sol.children[0]
+    end = time()
+    print("time to solve 9x9 propagating constraints: {} seconds\n".format(
+        end - start))
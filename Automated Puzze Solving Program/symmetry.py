@@ -0,0 +1,61 @@
+"""
+Rotations and reflections of rectangular grids, for puzzles whose
+positions are equivalent under them.
+"""
+
+# cell permutations already made, keyed by (height, width)
+_grid_symmetries = {}
+
+
+def grid_symmetries(height, width):
+    """
+    Return the rotations and reflections of a height x width grid, each
+    as a tuple perm where cell i (numbered row-major) moves to perm[i].
+
+    Square grids have all 8, other grids only the 4 that keep the shape.
+    The identity comes first.
+
+    @type height: int
+    @type width: int
+    @rtype: list[tuple[int]]
+    >>> len(grid_symmetries(3, 3)), len(grid_symmetries(2, 3))
+    (8, 4)
+    >>> grid_symmetries(2, 2)[0]
+    (0, 1, 2, 3)
+    """
+    if (height, width) not in _grid_symmetries:
+        h, w = height - 1, width - 1
+        maps = [lambda r, c: (r, c), lambda r, c: (h - r, c),
+                lambda r, c: (r, w - c), lambda r, c: (h - r, w - c)]
+        if height == width:
+            maps += [lambda r, c: (c, r), lambda r, c: (w - c, h - r),
+                     lambda r, c: (c, h - r), lambda r, c: (w - c, r)]
+        result = []
+        for f in maps:
+            perm = []
+            for r in range(height):
+                for c in range(width):
+                    y, x = f(r, c)
+                    perm.append(y * width + x)
+            result.append(tuple(perm))
+        _grid_symmetries[(height, width)] = result
+    return _grid_symmetries[(height, width)]
+
+
+def permute_bits(mask, perm):
+    """
+    Return mask with bit i moved to bit perm[i].
+
+    @type mask: int
+    @type perm: tuple[int]
+    @rtype: int
+    >>> bin(permute_bits(0b0011, (3, 2, 1, 0)))
+    '0b1100'
+    """
+    result, i = 0, 0
+    while mask:
+        if mask & 1:
+            result |= 1 << perm[i]
+        mask >>= 1
+        i += 1
+    return result
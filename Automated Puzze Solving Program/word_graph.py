@@ -0,0 +1,342 @@
+"""
+Word lists compiled once into a memory-mapped graph of one-letter steps.
+
+The file holds every word, sorted, as one UTF-8 string table with an
+offset for each word, and the words one letter away from each word as
+compressed sparse rows: the neighbours of word i are the word numbers
+edges[rows[i]:rows[i + 1]].  The connected component of every word is
+stored too, so whether two words are joined by a ladder is known
+without a search.  Opening it reads nothing but the header,
+so a solver is ready as soon as the file is mapped, and every process
+that maps the same file shares its pages.
+
+Compile from the command line:
+
+    python word_graph.py words.txt -o words.graph
+
+and solve with WordLadderPuzzle(..., WordDictionary.load("words.graph")).
+"""
+import mmap
+import struct
+import sys
+from array import array
+from collections import deque
+
+from word_ladder_puzzle import CHARS, WordDictionary, WordIndex
+
+MAGIC = b"WORDGRF2"
+# magic, words, string table bytes, edges, fingerprint
+HEADER = struct.Struct("<8sIII16s")
+
+# component of a word that cannot be stepped onto, so no search reaches
+UNREACHED = -1
+
+
+def compile_graph(ws, path):
+    """
+    Write the word graph of the words in ws to the file at path, with the
+    steps WordIndex allows, and return the number of edges.
+
+    @type ws: Iterable[str]
+    @type path: str
+    @rtype: int
+    """
+    data = graph_bytes(ws)
+    with open(path, "wb") as f:
+        f.write(data)
+    return HEADER.unpack_from(data)[3]
+
+
+def graph_bytes(ws):
+    """
+    Return the contents of the word graph file of the words in ws.
+
+    @type ws: Iterable[str]
+    @rtype: bytes
+    """
+    words = sorted(set(ws))
+    number = {word: i for i, word in enumerate(words)}
+    index = WordIndex(words)
+    offsets, rows, edges, table = array("I", [0]), array("I", [0]), \
+        array("I"), bytearray()
+    for word in words:
+        table += word.encode("utf-8")
+        offsets.append(len(table))
+        edges.extend(sorted(number[w] for w in index.neighbours(word)))
+        rows.append(len(edges))
+    components = _label_components(words, rows, edges)
+    fingerprint = WordDictionary(set(words)).fingerprint.encode("ascii")
+    if sys.byteorder != "little":
+        for numbers in (offsets, rows, edges, components):
+            numbers.byteswap()
+    return b"".join([HEADER.pack(MAGIC, len(words), len(table), len(edges),
+                                 fingerprint),
+                     offsets.tobytes(), rows.tobytes(), edges.tobytes(),
+                     components.tobytes(), bytes(table)])
+
+
+def _label_components(words, rows, edges):
+    """
+    Return the component number of each of the sorted words, whose
+    neighbours are given as compressed sparse rows, or UNREACHED for
+    words that cannot be stepped onto.
+
+    @type words: list[str]
+    @type rows: array[int]
+    @type edges: array[int]
+    @rtype: array[int]
+    """
+    labels = array("i", [UNREACHED]) * len(words)
+    component = 0
+    for i, word in enumerate(words):
+        if labels[i] != UNREACHED or not all([c in CHARS for c in word]):
+            continue
+        labels[i] = component
+        queue = deque([i])
+        while queue:
+            j = queue.popleft()
+            for k in edges[rows[j]:rows[j + 1]]:
+                if labels[k] == UNREACHED:
+                    labels[k] = component
+                    queue.append(k)
+        component += 1
+    return labels
+
+
+def _numbers(view, code="I"):
+    """
+    Return the little-endian ints of array type code in the memoryview
+    view, as a view of the same memory where the machine allows it.
+
+    @type view: memoryview
+    @type code: str
+    @rtype: memoryview | array
+    """
+    if sys.byteorder == "little":
+        return view.cast(code)
+    numbers = array(code)
+    numbers.frombytes(view)
+    numbers.byteswap()
+    return numbers
+
+
+class WordGraph:
+    """
+    A compiled word graph file, mapped read-only, or held in memory.
+
+    It answers the same questions as a word set and its WordIndex, so a
+    WordDictionary can use one for both.  Words are numbered 0, 1, ...
+    in sorted order.
+    """
+
+    def __init__(self, path=None, data=None):
+        """
+        Map the word graph file at path as WordGraph self, or, if path is
+        None, use data, the contents of such a file.
+
+        @type self: WordGraph
+        @type path: str | None
+        @type data: bytes | None
+        @rtype: None
+        """
+        self.path = path
+        if path is not None:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size, table_size, edge_count, fingerprint = \
+            HEADER.unpack_from(data)
+        assert magic == MAGIC, "not a word graph of this version"
+        self.fingerprint = fingerprint.decode("ascii")
+        self._size = size
+        view, offset = memoryview(data), HEADER.size
+        self._offsets = _numbers(view[offset:offset + 4 * (size + 1)])
+        offset += 4 * (size + 1)
+        self._rows = _numbers(view[offset:offset + 4 * (size + 1)])
+        offset += 4 * (size + 1)
+        self._edges = _numbers(view[offset:offset + 4 * edge_count])
+        offset += 4 * edge_count
+        self.components = _numbers(view[offset:offset + 4 * size], "i")
+        offset += 4 * size
+        self._table = data
+        self._table_start = offset
+        assert offset + table_size == len(data), "truncated word graph"
+
+    @classmethod
+    def from_words(cls, ws):
+        """
+        Return the WordGraph of the words in ws, held in memory.
+
+        @type ws: Iterable[str]
+        @rtype: WordGraph
+        """
+        return cls(data=graph_bytes(ws))
+
+    def __getstate__(self):
+        """
+        Return what pickling WordGraph self keeps: only its path if it
+        has one, so a process that unpickles it maps the file again.
+
+        @type self: WordGraph
+        @rtype: (str | None, bytes | None)
+        """
+        if self.path is not None:
+            return self.path, None
+        return None, bytes(self._table)
+
+    def __setstate__(self, state):
+        """
+        Make WordGraph self again from the state __getstate__ returned.
+
+        @type self: WordGraph
+        @type state: (str | None, bytes | None)
+        @rtype: None
+        """
+        self.__init__(*state)
+
+    def __len__(self):
+        """
+        Return the number of words in WordGraph self.
+
+        @type self: WordGraph
+        @rtype: int
+        """
+        return self._size
+
+    def word(self, i):
+        """
+        Return word number i of WordGraph self.
+
+        @type self: WordGraph
+        @type i: int
+        @rtype: str
+        """
+        start = self._table_start
+        return self._table[start + self._offsets[i]:
+                           start + self._offsets[i + 1]].decode("utf-8")
+
+    def neighbour_numbers(self, i):
+        """
+        Return the numbers of the words one letter away from word number
+        i that can be stepped onto.
+
+        @type self: WordGraph
+        @type i: int
+        @rtype: Sequence[int]
+        """
+        return self._edges[self._rows[i]:self._rows[i + 1]]
+
+    def component(self, word):
+        """
+        Return the number of the connected component of word, or None if
+        word is not in WordGraph self or cannot be stepped onto.
+
+        @type self: WordGraph
+        @type word: str
+        @rtype: int | None
+
+        >>> graph = WordGraph.from_words(["cat", "cot", "dog", "Cat"])
+        >>> graph.component("cat") == graph.component("cot")
+        True
+        >>> graph.component("dog") == graph.component("cat")
+        False
+        >>> graph.component("Cat") is None
+        True
+        """
+        i = self.find(word)
+        if i is None or self.components[i] == UNREACHED:
+            return None
+        return self.components[i]
+
+    def __iter__(self):
+        """
+        Yield the words of WordGraph self in sorted order.
+
+        @type self: WordGraph
+        @rtype: Iterator[str]
+        """
+        for i in range(self._size):
+            yield self.word(i)
+
+    def find(self, word):
+        """
+        Return the number of word in WordGraph self, or None if it is not
+        there.
+
+        @type self: WordGraph
+        @type word: str
+        @rtype: int | None
+        """
+        key = word.encode("utf-8")
+        table, start, offsets = self._table, self._table_start, self._offsets
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if table[start + offsets[middle]:
+                     start + offsets[middle + 1]] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if (low < self._size and
+                table[start + offsets[low]:start + offsets[low + 1]] == key):
+            return low
+        return None
+
+    def __contains__(self, word):
+        """
+        Return whether word is in WordGraph self.
+
+        @type self: WordGraph
+        @type word: str
+        @rtype: bool
+        """
+        return self.find(word) is not None
+
+    def neighbours(self, word):
+        """
+        Return the words one letter away from word that can be stepped
+        onto, as WordIndex.neighbours does.
+
+        @type self: WordGraph
+        @type word: str
+        @rtype: list[str]
+
+        >>> import os, tempfile
+        >>> with tempfile.TemporaryDirectory() as tmp:
+        ...     path = os.path.join(tmp, "words.graph")
+        ...     edges = compile_graph(["cat", "cot", "cut", "dog", "Cat"],
+        ...                           path)
+        ...     graph = WordGraph(path)
+        ...     found = graph.neighbours("cat"), graph.neighbours("Cat")
+        ...     missing = graph.neighbours("cab")
+        >>> found, missing
+        ((['cot', 'cut'], ['cat']), ['cat'])
+        """
+        i = self.find(word)
+        if i is not None:
+            return [self.word(j) for j in self.neighbour_numbers(i)]
+        # a word outside the graph has no row, so try every one-letter
+        # change that could be in it
+        result = []
+        for i in range(len(word)):
+            if not all([c in CHARS for c in word[:i] + word[i + 1:]]):
+                continue
+            for c in CHARS:
+                if c != word[i] and word[:i] + c + word[i + 1:] in self:
+                    result.append(word[:i] + c + word[i + 1:])
+        return result
+
+
+if __name__ == "__main__":
+    import argparse
+    from time import time
+    parser = argparse.ArgumentParser(
+        description="Compile a word list into a word graph file.")
+    parser.add_argument("words", help="file of whitespace-separated words")
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+    start = time()
+    with open(args.words) as word_file:
+        word_list = word_file.read().split()
+    edge_total = compile_graph(word_list, args.output)
+    print("compiled {} words and {} steps in {} seconds".format(
+        len(set(word_list)), edge_total, time() - start))
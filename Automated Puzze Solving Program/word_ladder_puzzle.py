@@ -1,26 +1,226 @@
+import hashlib
+import os
+
 from puzzle import Puzzle
 
+# characters a word must be made of to be stepped onto
+CHARS = "abcdefghijklmnopqrstuvwxyz"
+
+# dictionaries already loaded, keyed by absolute path
+_dictionaries = {}
+
+
+class WordIndex:
+    """
+    The words of a word set grouped into wildcard buckets, so that the
+    words one letter away from any word are a few dict lookups away.
+
+    Bucket "c*t" holds "cat", "cot", "cut", ...: every word of the right
+    length that matches outside the "*".  Build one WordIndex per word set
+    and share it between all the puzzles that use that set.
+    """
+
+    def __init__(self, ws):
+        """
+        Create the WordIndex self of the words in ws that use only CHARS.
+
+        @type self: WordIndex
+        @type ws: set[str] | Iterable[str]
+        @rtype: None
+        """
+        self._buckets = {}
+        for word in ws:
+            if all([c in CHARS for c in word]):
+                for i in range(len(word)):
+                    self._buckets.setdefault(
+                        word[:i] + "*" + word[i + 1:], []).append(word)
+
+    def neighbours(self, word):
+        """
+        Return the indexed words that differ from word in exactly one
+        position.
+
+        @type self: WordIndex
+        @type word: str
+        @rtype: list[str]
+        >>> index = WordIndex({"cat", "cot", "cut", "dog", "Cat", "cats"})
+        >>> sorted(index.neighbours("cat"))
+        ['cot', 'cut']
+        >>> sorted(index.neighbours("Cat"))
+        ['cat']
+        """
+        result = []
+        for i in range(len(word)):
+            for other in self._buckets.get(word[:i] + "*" + word[i + 1:], ()):
+                if other != word:
+                    result.append(other)
+        return result
+
+
+class WordDictionary:
+    """
+    A word set shared by every WordLadderPuzzle that uses it, with its
+    WordIndex built once on first use.
+
+    Dictionaries are equal when their words are, which is decided by
+    comparing fingerprints rather than the words themselves.  The words
+    must not change once the dictionary is made.
+    """
+
+    def __init__(self, ws, index=None, fingerprint=None):
+        """
+        Create the WordDictionary self of the words in ws, whose
+        WordIndex is index and fingerprint is fingerprint if they are
+        already known.
+
+        @type self: WordDictionary
+        @type ws: set[str] | WordGraph
+        @type index: WordIndex | WordGraph | None
+        @type fingerprint: str | None
+        @rtype: None
+        """
+        self.words, self._index = ws, index
+        self._fingerprint = fingerprint
+
+    @classmethod
+    def load(cls, path):
+        """
+        Return the WordDictionary of the file path, loading it only the
+        first time.  The file is either whitespace-separated words or a
+        word graph compiled by word_graph.py, which is memory-mapped
+        instead of read.
+
+        @type path: str
+        @rtype: WordDictionary
+        """
+        from word_graph import MAGIC, WordGraph
+        path = os.path.abspath(path)
+        if path not in _dictionaries:
+            with open(path, "rb") as f:
+                # any version, so an old graph fails loudly in WordGraph
+                compiled = f.read(len(MAGIC))[:-1] == MAGIC[:-1]
+            if compiled:
+                graph = WordGraph(path)
+                _dictionaries[path] = cls(graph, graph, graph.fingerprint)
+            else:
+                with open(path) as f:
+                    _dictionaries[path] = cls(set(f.read().split()))
+        return _dictionaries[path]
+
+    @property
+    def index(self):
+        """
+        Return the WordIndex of WordDictionary self, building it if need
+        be.
+
+        @type self: WordDictionary
+        @rtype: WordIndex
+        """
+        if self._index is None:
+            self._index = WordIndex(self.words)
+        return self._index
+
+    @property
+    def fingerprint(self):
+        """
+        Return a short hex digest of the words of WordDictionary self,
+        the same for any dictionary of the same words.
+
+        @type self: WordDictionary
+        @rtype: str
+
+        >>> a = WordDictionary({"cat", "cot"})
+        >>> a.fingerprint == WordDictionary({"cot", "cat"}).fingerprint
+        True
+        >>> a.fingerprint == WordDictionary({"cat"}).fingerprint
+        False
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=8)
+            for word in sorted(self.words):
+                digest.update(word.encode())
+                digest.update(b"\n")
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def component(self, word):
+        """
+        Return the number of the connected component of word in
+        WordDictionary self, or None if word cannot be stepped onto or
+        the components are unknown, as they are unless the words are a
+        compiled WordGraph.
+
+        @type self: WordDictionary
+        @type word: str
+        @rtype: int | None
+        """
+        if not hasattr(self.words, "component"):
+            return None
+        return self.words.component(word)
+
+    def __contains__(self, word):
+        """
+        Return whether word is in WordDictionary self.
+
+        @type self: WordDictionary
+        @type word: str
+        @rtype: bool
+        """
+        return word in self.words
+
+    def __eq__(self, other):
+        """
+        Return whether WordDictionary self has the same words as other.
+
+        @type self: WordDictionary
+        @type other: WordDictionary | Any
+        @rtype: bool
+        """
+        return self is other or (type(self) == type(other) and
+                                 self.fingerprint == other.fingerprint)
+
+    def __hash__(self):
+        """
+        Return a hash of WordDictionary self, equal for equal
+        dictionaries.
+
+        @type self: WordDictionary
+        @rtype: int
+        """
+        return hash(self.fingerprint)
+
 
 class WordLadderPuzzle(Puzzle):
     """
     A word-ladder puzzle that may be solved, unsolved, or even unsolvable.
     """
 
-    def __init__(self, from_word, to_word, ws):
+    def __init__(self, from_word, to_word, ws, index=None):
         """
         Create a new word-ladder puzzle with the aim of stepping
         from from_word to to_word using words in ws, changing one
         character at each step.
 
+        ws is a WordDictionary, or a set of words to make a new one of
+        with index, its WordIndex if already built.  Pass the same
+        WordDictionary to every puzzle over one word list to build its
+        WordIndex only once.  The dictionary is passed on to every
+        extension.
+
         @type from_word: str
         @type to_word: str
-        @type ws: set[str]
+        @type ws: WordDictionary | set[str]
+        @type index: WordIndex | None
         @rtype: None
         """
-        (self._from_word, self._to_word, self._word_set) = (from_word,
-                                                            to_word, ws)
+        if not isinstance(ws, WordDictionary):
+            ws = WordDictionary(ws, index)
+        (self._from_word, self._to_word, self._dictionary) = (from_word,
+                                                              to_word, ws)
         # set of characters to use for 1-character changes
-        self._chars = "abcdefghijklmnopqrstuvwxyz"
+        self._chars = CHARS
+        # whether fail_fast has already found to_word reachable
+        self._checked = False
 
         # implement __eq__ and __str__
         # __repr__ is up to you
@@ -40,7 +240,48 @@ class WordLadderPuzzle(Puzzle):
         return (type(self) == type(other) and
                 self._from_word == other._from_word and
                 self._to_word == other._to_word and
-                self._word_set == other._word_set)
+                self._dictionary == other._dictionary)
+
+    def __hash__(self):
+        """
+        Return a hash of WordLadderPuzzle self, equal for equal puzzles.
+
+        @type self: WordLadderPuzzle
+        @rtype: int
+        >>> x = WordLadderPuzzle('cat', 'cap', set(['cat','cap','cad']))
+        >>> y = WordLadderPuzzle('cat', 'cap', set(['cad','cap','cat']))
+        >>> hash(x) == hash(y)
+        True
+        >>> len({x, y})
+        1
+        """
+        return hash((self._from_word, self._to_word,
+                     self._dictionary.fingerprint))
+
+    def __copy__(self):
+        """
+        Return a WordLadderPuzzle equal to self, so moves can be applied
+        to either alone.
+
+        @type self: WordLadderPuzzle
+        @rtype: WordLadderPuzzle
+        """
+        return WordLadderPuzzle(self._from_word, self._to_word,
+                                self._dictionary)
+
+    def state_key(self):
+        """
+        Return the current word of WordLadderPuzzle self.
+
+        to_word and the word set are left out, since they never change
+        during a search.
+
+        @type self: WordLadderPuzzle
+        @rtype: str
+        >>> WordLadderPuzzle('cat', 'cap', set(['cat','cap'])).state_key()
+        'cat'
+        """
+        return self._from_word
 
     def __str__(self):
         """
@@ -70,41 +311,166 @@ class WordLadderPuzzle(Puzzle):
         >>> z in w.extensions()
         True
         """
-        wlist = []
-        return_list = []
-        # create a  empty word list
-        for word in self._word_set:
-            # check every word in word list one by one
-            if len(word) == len(self._from_word):
-                index = 0
-                n = 0
-                # n is difference between two words
-                # if length of word is the same with from_word, then we can
-                # check their difference
-                while index < len(self._from_word):
-                    # check every letter one by one
-                    if word[index] in self._chars:
-                        # make sure every letter is legal correct
-                        if word[index] == self._from_word[index]:
-                            index += 1
-                        else:
-                            # if not same, then difference + 1
-                            n += 1
-                            index += 1
-                    # check their difference
-                    else:
-                        index += 1
-                        n = 999
-                    # if contains illegal letter, n = 999, it's not correct
-            else:
-                n = 999
-            if n == 1:
-                wlist.append(word)
-        for i in wlist:
-            return_list.append((WordLadderPuzzle(i, self._to_word,
-                                                 self._word_set)))
-        # create new WordLadderPuzzle using new words
-        return return_list
+        return list(self.iter_extensions())
+
+    def iter_extensions(self):
+        """
+        Yield the extensions of WordLadderPuzzle self one at a time.
+
+        @type self: WordLadderPuzzle
+        @rtype: Iterator[WordLadderPuzzle]
+        """
+        for word in self._dictionary.index.neighbours(self._from_word):
+            extension = WordLadderPuzzle(word, self._to_word,
+                                         self._dictionary)
+            # a step stays in the component, so it needs no second look
+            extension._checked = self._checked
+            yield extension
+
+    def fail_fast(self):
+        """
+        Return True if no ladder can reach to_word from WordLadderPuzzle
+        self: the words differ in length, to_word cannot be stepped onto,
+        or the dictionary's components keep them apart.
+
+        @type self: WordLadderPuzzle
+        @rtype: bool
+        >>> ws = set(["cat", "cot", "dog"])
+        >>> WordLadderPuzzle("cat", "cots", ws).fail_fast()
+        True
+        >>> WordLadderPuzzle("cat", "Cot", ws).fail_fast()
+        True
+        >>> WordLadderPuzzle("cat", "dog", ws).fail_fast()
+        False
+        >>> from word_graph import WordGraph
+        >>> graph = WordGraph.from_words(ws)
+        >>> ws = WordDictionary(graph, graph, graph.fingerprint)
+        >>> WordLadderPuzzle("cat", "dog", ws).fail_fast()
+        True
+        """
+        if not self._checked:
+            self._checked = not self._apart()
+        return not self._checked
+
+    def _apart(self):
+        """
+        Return True if from_word and to_word are shown to have no ladder
+        between them, as fail_fast describes.
+
+        @type self: WordLadderPuzzle
+        @rtype: bool
+        """
+        from_word, to_word = self._from_word, self._to_word
+        dictionary = self._dictionary
+        if from_word == to_word:
+            return False
+        if (len(from_word) != len(to_word) or
+                not all([c in self._chars for c in to_word]) or
+                to_word not in dictionary):
+            return True
+        target = dictionary.component(to_word)
+        if target is None:
+            return False
+        source = dictionary.component(from_word)
+        if source is not None:
+            return source != target
+        # from_word cannot be stepped onto, so look one step on
+        return all(dictionary.component(word) != target
+                   for word in dictionary.index.neighbours(from_word))
+
+    def legal_moves(self):
+        """
+        Return list of moves (from_word, word) stepping from the current
+        word to each word one letter away.
+
+        @type self: WordLadderPuzzle
+        @rtype: list[(str, str)]
+        >>> w = WordLadderPuzzle("cat", "cot", set(["cat", "cot"]))
+        >>> w.legal_moves()
+        [('cat', 'cot')]
+        >>> w.apply(('cat', 'cot'))
+        >>> w.is_solved()
+        True
+        >>> w.undo(('cat', 'cot'))
+        >>> print(w)
+        cat
+        """
+        return [(self._from_word, word)
+                for word in self._dictionary.index.neighbours(self._from_word)]
+
+    def apply(self, move):
+        """
+        Step to the second word of move.
+
+        @type self: WordLadderPuzzle
+        @type move: (str, str)
+        @rtype: None
+        """
+        self._from_word = move[1]
+
+    def undo(self, move):
+        """
+        Step back to the first word of move.
+
+        @type self: WordLadderPuzzle
+        @type move: (str, str)
+        @rtype: None
+        """
+        self._from_word = move[0]
+
+    def goal_state(self):
+        """
+        Return the solved WordLadderPuzzle self is working towards.
+
+        @type self: WordLadderPuzzle
+        @rtype: WordLadderPuzzle
+        >>> w = WordLadderPuzzle("cat", "cot", set(["cat", "cot"]))
+        >>> print(w.goal_state())
+        cot
+        """
+        return WordLadderPuzzle(self._to_word, self._to_word,
+                                self._dictionary)
+
+    def goal_key(self):
+        """
+        Return the word WordLadderPuzzle self is working towards, with
+        the fingerprint of its dictionary.
+
+        @type self: WordLadderPuzzle
+        @rtype: (str, str)
+        """
+        return self._to_word, self._dictionary.fingerprint
+
+    def reverse_extensions(self):
+        """
+        Return list of the WordLadderPuzzles that step onto self.
+
+        Stepping is symmetric, except that only words made of CHARS can
+        be stepped onto.
+
+        @type self: WordLadderPuzzle
+        @rtype: list[WordLadderPuzzle]
+        >>> ws = set(["cat", "Cot", "cot"])
+        >>> WordLadderPuzzle("Cot", "cat", ws).reverse_extensions()
+        []
+        """
+        if not all([c in self._chars for c in self._from_word]):
+            return []
+        return self.extensions()
+
+    def heuristic(self):
+        """
+        Return the number of letters where from_word differs from to_word.
+
+        Each step changes one letter, so this never overestimates.
+
+        @type self: WordLadderPuzzle
+        @rtype: int
+        >>> WordLadderPuzzle("cat", "dog", set(["cat", "dog"])).heuristic()
+        3
+        """
+        return (sum([a != b for a, b in zip(self._from_word, self._to_word)])
+                + abs(len(self._from_word) - len(self._to_word)))
 
         # override is_solved
         # this WordLadderPuzzle is solved when _from_word is the same as
@@ -127,9 +493,7 @@ if __name__ == '__main__':
     doctest.testmod()
     from puzzle_tools import breadth_first_solve, depth_first_solve
     from time import time
-    with open("words.txt", "r") as words:
-        word_set = set(words.read().split())
-    w = WordLadderPuzzle("same", "cost", word_set)
+    w = WordLadderPuzzle("same", "cost", WordDictionary.load("words.txt"))
     start = time()
     sol = breadth_first_solve(w)
     end = time()
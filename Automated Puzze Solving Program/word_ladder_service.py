@@ -0,0 +1,228 @@
+"""
+Answer many word ladder queries against one dictionary.
+
+Each target word gets one breadth-first search outward from it, whose
+parent and distance tables then answer every source word for that
+target by following parent pointers.  The tables of the most recently
+used targets are kept, and the connected components of the dictionary
+come compiled into its word graph, so a pair with no ladder is answered
+at once.
+
+From the command line, with one "from to" pair per line:
+
+    python word_ladder_service.py words.graph < queries.txt
+
+Each line gets one line of answer; a line without exactly two words is
+answered "bad query" and reported on stderr.
+"""
+from array import array
+from collections import OrderedDict, deque
+
+from puzzle_tools import PuzzleNode, find_path
+from word_graph import UNREACHED, WordGraph
+from word_ladder_puzzle import WordDictionary, WordLadderPuzzle
+
+
+class WordLadderService:
+    """
+    Shortest word ladders for any number of (from_word, to_word) queries
+    against one WordDictionary.
+
+    Words are numbered as in the dictionary's WordGraph; a dictionary
+    that is a plain word set gets a graph built in memory.  Only words
+    made of CHARS can be stepped onto, so those are the words given a
+    component; other words can only start a ladder.
+    """
+
+    def __init__(self, dictionary, capacity=32):
+        """
+        Create a WordLadderService self for dictionary that keeps the
+        tables of at most capacity targets.
+
+        @type self: WordLadderService
+        @type dictionary: WordDictionary
+        @type capacity: int
+        @rtype: None
+        """
+        assert capacity > 0
+        self.dictionary, self.capacity = dictionary, capacity
+        self.hits = self.misses = 0
+        if isinstance(dictionary.words, WordGraph):
+            self._graph = dictionary.words
+        else:
+            self._graph = WordGraph.from_words(dictionary.words)
+        self._tables = OrderedDict()
+        self._components = self._graph.components
+
+    def connected(self, from_word, to_word):
+        """
+        Return whether there is a ladder from from_word to to_word.
+
+        @type self: WordLadderService
+        @type from_word: str
+        @type to_word: str
+        @rtype: bool
+
+        >>> ws = WordDictionary({"cat", "cot", "dot", "dog", "emu"})
+        >>> service = WordLadderService(ws)
+        >>> service.connected("cat", "dog"), service.connected("cat", "emu")
+        (True, False)
+        """
+        return (from_word == to_word or
+                bool(self._starts(from_word, to_word)[1]))
+
+    def distance(self, from_word, to_word):
+        """
+        Return the number of steps in a shortest ladder from from_word to
+        to_word, or None if there is none.
+
+        @type self: WordLadderService
+        @type from_word: str
+        @type to_word: str
+        @rtype: int | None
+
+        >>> ws = WordDictionary({"cat", "cot", "dot", "dog"})
+        >>> WordLadderService(ws).distance("cat", "dog")
+        3
+        """
+        if from_word == to_word:
+            return 0
+        stepped, starts = self._starts(from_word, to_word)
+        if not starts:
+            return None
+        distances = self._table(self._graph.find(to_word))[1]
+        return min(distances[i] for i in starts) + stepped
+
+    def ladder(self, from_word, to_word):
+        """
+        Return the words of a shortest ladder from from_word to to_word,
+        both included, or None if there is none.
+
+        @type self: WordLadderService
+        @type from_word: str
+        @type to_word: str
+        @rtype: list[str] | None
+
+        >>> ws = WordDictionary({"cat", "cot", "dot", "dog", "emu"})
+        >>> service = WordLadderService(ws)
+        >>> service.ladder("cat", "dog")
+        ['cat', 'cot', 'dot', 'dog']
+        >>> service.ladder("cut", "dog")
+        ['cut', 'cot', 'dot', 'dog']
+        >>> service.ladder("cat", "emu") is None
+        True
+        >>> service.hits, service.misses
+        (1, 1)
+        """
+        if from_word == to_word:
+            return [from_word]
+        stepped, starts = self._starts(from_word, to_word)
+        if not starts:
+            return None
+        parents, distances = self._table(self._graph.find(to_word))
+        i = min(starts, key=lambda s: distances[s])
+        words = [from_word] if stepped else []
+        words.append(self._graph.word(i))
+        while distances[i]:
+            i = parents[i]
+            words.append(self._graph.word(i))
+        return words
+
+    def solve(self, puzzle):
+        """
+        Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+        a solution, as breadth_first_solve would, or None if this is not
+        possible.  puzzle must use the dictionary of self.
+
+        @type self: WordLadderService
+        @type puzzle: WordLadderPuzzle
+        @rtype: PuzzleNode | None
+
+        >>> ws = WordDictionary({"cat", "cot", "dot", "dog"})
+        >>> path = WordLadderService(ws).solve(
+        ...     WordLadderPuzzle("cat", "dog", ws))
+        >>> print(path.children[0].puzzle)
+        cot
+        """
+        to_word, fingerprint = puzzle.goal_key()
+        assert fingerprint == self.dictionary.fingerprint
+        words = self.ladder(puzzle.state_key(), to_word)
+        if words is None:
+            return None
+        node = PuzzleNode(puzzle)
+        for word in words[1:]:
+            node = PuzzleNode(WordLadderPuzzle(word, to_word,
+                                               self.dictionary),
+                              parent=node)
+        return find_path(node)
+
+    def _starts(self, from_word, to_word):
+        """
+        Return (stepped, numbers): the numbers of the words a ladder from
+        from_word to to_word can start from in to_word's component, and
+        whether from_word comes before them rather than being one.
+
+        @type self: WordLadderService
+        @type from_word: str
+        @type to_word: str
+        @rtype: (bool, list[int])
+        """
+        graph, labels = self._graph, self._components
+        target = graph.find(to_word)
+        if target is None or labels[target] == UNREACHED:
+            return False, []
+        component = labels[target]
+        source = graph.find(from_word)
+        if source is not None and labels[source] != UNREACHED:
+            return False, [source] if labels[source] == component else []
+        # from_word cannot be stepped onto, so a ladder leaves it at once
+        numbers = [graph.find(w) for w in graph.neighbours(from_word)]
+        return True, [i for i in numbers if labels[i] == component]
+
+    def _table(self, target):
+        """
+        Return the parent and distance tables of the search outward from
+        word number target, searching only if they are not kept.
+
+        @type self: WordLadderService
+        @type target: int
+        @rtype: (array[int], array[int])
+        """
+        if target in self._tables:
+            self.hits += 1
+            self._tables.move_to_end(target)
+            return self._tables[target]
+        self.misses += 1
+        graph = self._graph
+        parents = array("i", [UNREACHED]) * len(graph)
+        distances = array("i", [UNREACHED]) * len(graph)
+        parents[target], distances[target] = target, 0
+        queue = deque([target])
+        while queue:
+            i = queue.popleft()
+            # steps between words that can be stepped onto go both ways
+            for j in graph.neighbour_numbers(i):
+                if distances[j] == UNREACHED:
+                    parents[j], distances[j] = i, distances[i] + 1
+                    queue.append(j)
+        self._tables[target] = parents, distances
+        if len(self._tables) > self.capacity:
+            self._tables.popitem(last=False)
+        return parents, distances
+
+
+if __name__ == "__main__":
+    import sys
+    service = WordLadderService(WordDictionary.load(
+        sys.argv[1] if len(sys.argv) > 1 else "words.txt"))
+    for line in sys.stdin:
+        words = line.split()
+        if not words:
+            continue
+        if len(words) != 2:
+            # report the bad line and keep serving the rest
+            sys.stderr.write("expected two words: {}\n".format(line.strip()))
+            print("bad query")
+            continue
+        found = service.ladder(words[0], words[1])
+        print(" ".join(found) if found is not None else "no ladder")